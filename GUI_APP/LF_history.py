@@ -2,51 +2,56 @@ import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox, filedialog
 import sqlite3
 import pandas as pd
-import threading
+from task_runner import TaskRunner
 
-# Function to query the database and get latest entry per LF_ID
-def query_database():
+# Runs on a worker thread (task_runner.py): query the database and get latest entry per LF_ID
+def read_latest(task, lf_ids):
+    conn = sqlite3.connect(r"C:\Users\zbrzyy\Documents\Onsemi VN\XrayDatabase\LF_Info_database.db")
+    task.on_cancel(conn.interrupt)  # Cancel aborts the running query
     try:
-        status_var.set("Querying database...")
-        output_text.delete(1.0, tk.END)
-
-        lf_ids = input_text.get(1.0, tk.END).strip().split('\n')
-        lf_ids = [lf_id.strip() for lf_id in lf_ids if lf_id.strip()]
-
-        if not lf_ids:
-            messagebox.showwarning("Input Error", "Please enter at least one LF_ID.")
-            return
-
-        conn = sqlite3.connect(r"C:\Users\zbrzyy\Documents\Onsemi VN\XrayDatabase\LF_Info_database.db")
         placeholders = ','.join('?' for _ in lf_ids)
         query = f"SELECT * FROM LF_Info WHERE LF_ID IN ({placeholders})"
         df = pd.read_sql_query(query, conn, params=lf_ids)
+    finally:
         conn.close()
 
-        # Convert Date to datetime for sorting
-        df['Date'] = pd.to_datetime(df['Date'], format="%d/%m/%Y %I:%M:%S %p", errors='coerce')
+    # Convert Date to datetime for sorting
+    df['Date'] = pd.to_datetime(df['Date'], format="%d/%m/%Y %I:%M:%S %p", errors='coerce')
 
-        # Drop rows with invalid dates
-        df = df.dropna(subset=['Date'])
+    # Drop rows with invalid dates
+    df = df.dropna(subset=['Date'])
 
-        # Sort and get latest entry per LF_ID
-        df_sorted = df.sort_values('Date', ascending=False)
-        latest_df = df_sorted.groupby('LF_ID', as_index=False).first()
+    # Sort and get latest entry per LF_ID
+    df_sorted = df.sort_values('Date', ascending=False)
+    latest_df = df_sorted.groupby('LF_ID', as_index=False).first()
 
-        # Select only required columns
-        result_df = latest_df[['Date', 'Lotname', 'JIG_ID', 'LF_ID', '2D_RESULT']]
+    # Select only required columns
+    return latest_df[['Date', 'Lotname', 'JIG_ID', 'LF_ID', '2D_RESULT']]
 
-        global final_df
-        final_df = result_df
-        output_text.insert(tk.END, result_df.to_string(index=False))
-        status_var.set("Query completed.")
-    except Exception as e:
-        status_var.set("Error occurred.")
-        messagebox.showerror("Error", str(e))
+def show_result(result_df):
+    global final_df
+    final_df = result_df
+    output_text.insert(tk.END, result_df.to_string(index=False))
+    status_var.set("Query completed.")
+
+def show_error(error):
+    status_var.set("Error occurred.")
+    messagebox.showerror("Error", str(error))
+
+# Query in the background; repeated clicks with the same input join the running query
+def query_database():
+    lf_ids = input_text.get(1.0, tk.END).strip().split('\n')
+    lf_ids = [lf_id.strip() for lf_id in lf_ids if lf_id.strip()]
+
+    if not lf_ids:
+        messagebox.showwarning("Input Error", "Please enter at least one LF_ID.")
+        return
 
-# Threaded query execution
-def threaded_query():
-    threading.Thread(target=query_database).start()
+    status_var.set("Querying database...")
+    output_text.delete(1.0, tk.END)
+    runner.submit(read_latest, lf_ids, key=tuple(lf_ids), group="query",
+                  on_done=show_result, on_error=show_error,
+                  on_cancelled=lambda: status_var.set("Cancelled."))
 
 # Export results to CSV
 def export_to_csv():
@@ -76,6 +81,7 @@ def copy_to_clipboard():
 app = tk.Tk()
 app.title("Leadframe_history")
 app.geometry("800x600")
+runner = TaskRunner(app)
 
 tk.Label(app, text="Enter LF_IDs (one per line):").pack(pady=5)
 input_text = scrolledtext.ScrolledText(app, width=60, height=10)
@@ -86,9 +92,10 @@ tk.Label(app, textvariable=status_var, fg="blue").pack(pady=5)
 
 button_frame = tk.Frame(app)
 button_frame.pack(pady=10)
-tk.Button(button_frame, text="Get Data", command=threaded_query).grid(row=0, column=0, padx=10)
-tk.Button(button_frame, text="Export to CSV", command=export_to_csv).grid(row=0, column=1, padx=10)
-tk.Button(button_frame, text="Copy to Clipboard", command=copy_to_clipboard).grid(row=0, column=2, padx=10)
+tk.Button(button_frame, text="Get Data", command=query_database).grid(row=0, column=0, padx=10)
+tk.Button(button_frame, text="Cancel", command=lambda: runner.cancel(group="query")).grid(row=0, column=1, padx=10)
+tk.Button(button_frame, text="Export to CSV", command=export_to_csv).grid(row=0, column=2, padx=10)
+tk.Button(button_frame, text="Copy to Clipboard", command=copy_to_clipboard).grid(row=0, column=3, padx=10)
 
 output_text = scrolledtext.ScrolledText(app, width=90, height=20)
 output_text.pack(padx=10, pady=5)
@@ -4,9 +4,10 @@ from bs4 import BeautifulSoup
 import pandas as pd
 import tkinter as tk
 from tkinter import filedialog, messagebox, scrolledtext, ttk
-import threading
+from task_runner import TaskRunner
 import bs4
 import time
+from virtual_table import VirtualTable
 
 # Global variables
 session = None
@@ -14,7 +15,6 @@ username = ""
 password = ""
 result_df = pd.DataFrame()
 filtered_df = pd.DataFrame()
-sort_state = []
 filter_entries = {}
 
 process_steps = [
@@ -30,33 +30,30 @@ process_steps = [
 checkbox_vars = {}
 
 def login():
-    global session, username, password
+    global username, password
     username = username_entry.get()
     password = password_entry.get()
     if username and password:
         username = f"ONSEMI\\{username}"
-        session = requests.Session()
-        session.auth = HttpNtlmAuth(username, password)
+        open_session()
     else:
         messagebox.showwarning("Login", "Username or Password cannot be empty.")
 
-def get_lot_history():
-    login()
-    if not session:
-        messagebox.showerror("Error", "Please login first.")
-        return
+def open_session():
+    # Uses the credentials read by login(), so it is safe on the worker thread
+    global session
+    session = requests.Session()
+    session.auth = HttpNtlmAuth(username, password)
 
-    console_output.delete("1.0", tk.END)
-    input_text = lot_input_text.get("1.0", tk.END).strip()
-    lot_ids = input_text.split('\n')
-    all_data = []
+def log(message):
+    console_output.insert(tk.END, message)
 
-    progress["maximum"] = len(lot_ids)
+# Runs on a worker thread (task_runner.py): widgets are only updated through task.post / task.progress
+def get_lot_history(task, lot_ids):
+    all_data = []
 
     for i, lot_id in enumerate(lot_ids, 1):
-        current_status.set(f"Processing LotID: {lot_id}")
-        progress["value"] = i
-        root.update_idletasks()
+        task.progress(i, len(lot_ids), f"Processing LotID: {lot_id}")  # stops here once cancelled
 
         url = f"http://bhvnbiprd/CamstarLotTracking/Forms/ShopOrder/DetailedLotHistory?lotID={lot_id}"
         headers = {"User-Agent": "Edg/137.0.0.0"}
@@ -64,16 +61,13 @@ def get_lot_history():
         try:
             response = session.get(url, headers=headers, timeout=10)
             if response.status_code == 401:
-                console_output.insert(tk.END, f"Session expired. Re-authenticating for LotID: {lot_id}...\n")
-                login()
-                if not session:
-                    console_output.insert(tk.END, "Re-login failed.\n")
-                    continue
+                task.post(log, f"Session expired. Re-authenticating for LotID: {lot_id}...\n")
+                open_session()
                 response = session.get(url, headers=headers, timeout=10)
 
             response.raise_for_status()
         except requests.RequestException as e:
-            console_output.insert(tk.END, f"Error fetching {lot_id}: {e}\n")
+            task.post(log, f"Error fetching {lot_id}: {e}\n")
             continue
 
         time.sleep(0.1)  # Delay to avoid rate-limiting
@@ -97,7 +91,7 @@ def get_lot_history():
                 df = pd.DataFrame(rows)
                 df['LotID'] = lot_id
                 if not isinstance(df, pd.DataFrame):
-                    console_output.insert(tk.END, f"Data extraction error for LotID: {lot_id}\n")
+                    task.post(log, f"Data extraction error for LotID: {lot_id}\n")
                     continue
 
                 filtered = df[df['Transaction'].isin(['CreateFirstInsertion', 'TrackInLot', 'TrackOutLot', 'HoldLot', 'RejectLot'])]
@@ -137,24 +131,43 @@ def get_lot_history():
 
                     all_data.append(pivot)
                 else:
-                    console_output.insert(tk.END, f"No table found for LotID: {lot_id}\n")
+                    task.post(log, f"No table found for LotID: {lot_id}\n")
             else:
-                console_output.insert(tk.END, f"Table structure missing thead or tbody for LotID: {lot_id}\n")
+                task.post(log, f"Table structure missing thead or tbody for LotID: {lot_id}\n")
 
     if all_data:
-        final_df = pd.concat(all_data, ignore_index=True)
-        global result_df, filtered_df
-        result_df = final_df
-        filtered_df = final_df.copy()
-        update_treeview(filtered_df)
-        console_output.insert(tk.END, "Data loaded successfully.\n")
-    else:
-        console_output.insert(tk.END, "No data retrieved.\n")
+        return pd.concat(all_data, ignore_index=True)
+    return None
 
+def show_lot_history(final_df):
+    global result_df, filtered_df
+    if final_df is None:
+        log("No data retrieved.\n")
+        return
+    result_df = final_df
+    filtered_df = final_df.copy()
+    update_treeview(filtered_df)
+    log("Data loaded successfully.\n")
 
+def report_progress(done, total, text):
+    progress["maximum"] = total
+    progress["value"] = done
+    current_status.set(text)
 
 def threaded_get_lot_history():
-    threading.Thread(target=get_lot_history).start()
+    login()
+    if not session:
+        messagebox.showerror("Error", "Please login first.")
+        return
+
+    console_output.delete("1.0", tk.END)
+    input_text = lot_input_text.get("1.0", tk.END).strip()
+    lot_ids = input_text.split('\n')
+    # Same Lot list again while it runs → joins it; a new list cancels the running one
+    runner.submit(get_lot_history, lot_ids, key=tuple(lot_ids), group="history",
+                  on_done=show_lot_history, on_progress=report_progress,
+                  on_error=lambda e: log(f"Error: {e}\n"),
+                  on_cancelled=lambda: current_status.set("Cancelled."))
 
 def export_to_csv():
     if not isinstance(filtered_df, pd.DataFrame) or filtered_df.empty:
@@ -162,113 +175,41 @@ def export_to_csv():
         return
     output_file = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV files", "*.csv")])
     if output_file:
-        filtered_df.to_csv(output_file, index=False)
+        # Rows as shown: the table's own sort and filter
+        filtered_df.iloc[tree.view_indices()].to_csv(output_file, index=False)
         console_output.insert(tk.END, f"\nData exported to: {output_file}\n")
 
 def update_treeview(df):
-    global tree
-
     # Create a copy for display formatting
     display_df = df.copy()
 
     # Replace In_Qty and Out_Qty with Reject_From_Qty and Reject_To_Qty if present
     if 'Reject_From_Qty' in display_df.columns or 'Reject_To_Qty' in display_df.columns:
-        for idx, row in display_df.iterrows():
-            if 'Reject_From_Qty' in display_df.columns and pd.notnull(row.get('Reject_From_Qty')):
-                display_df.at[idx, 'In_Qty'] = row['Reject_From_Qty']
-            if 'Reject_To_Qty' in display_df.columns and pd.notnull(row.get('Reject_To_Qty')):
-                display_df.at[idx, 'Out_Qty'] = row['Reject_To_Qty']
+        if 'Reject_From_Qty' in display_df.columns:
+            reject_from = display_df['Reject_From_Qty']
+            display_df['In_Qty'] = reject_from.where(reject_from.notnull(), display_df.get('In_Qty'))
+        if 'Reject_To_Qty' in display_df.columns:
+            reject_to = display_df['Reject_To_Qty']
+            display_df['Out_Qty'] = reject_to.where(reject_to.notnull(), display_df.get('Out_Qty'))
         # Recalculate Reject_Qty
-        if not isinstance(display_df['In_Qty'], pd.Series):
-            in_qty = pd.Series(display_df['In_Qty'])
-        else:
-            in_qty = display_df['In_Qty']
-        if not isinstance(display_df['Out_Qty'], pd.Series):
-            out_qty = pd.Series(display_df['Out_Qty'])
-        else:
-            out_qty = display_df['Out_Qty']
-        in_qty = pd.to_numeric(in_qty, errors='coerce')
-        if not isinstance(in_qty, pd.Series):
-            in_qty = pd.Series(in_qty)
-        in_qty = in_qty.fillna(0).astype(float)
-        out_qty = pd.to_numeric(out_qty, errors='coerce')
-        if not isinstance(out_qty, pd.Series):
-            out_qty = pd.Series(out_qty)
-        out_qty = out_qty.fillna(0).astype(float)
+        in_qty = pd.to_numeric(display_df['In_Qty'], errors='coerce').fillna(0).astype(float)
+        out_qty = pd.to_numeric(display_df['Out_Qty'], errors='coerce').fillna(0).astype(float)
         display_df['Reject_Qty'] = (in_qty - out_qty).astype(int)
         # Drop the Reject_From_Qty and Reject_To_Qty columns for display
         display_df = display_df.drop(columns=['Reject_From_Qty', 'Reject_To_Qty','TrackOut_machine'], errors='ignore')
 
-    # Format datetime columns for display (you can add more columns if needed)
+    # Format datetime columns for display only; sorting uses the datetimes
     datetime_columns = ['CreateFirstInsertion', 'TrackInLot', 'TrackOutLot']
+    formatters = {}
     for col in datetime_columns:
         if col in display_df.columns and pd.api.types.is_datetime64_any_dtype(display_df[col]):
-            display_df[col] = display_df[col].dt.strftime('%d/%m/%Y %H:%M:%S')
+            formatters[col] = lambda value: '' if pd.isnull(value) else value.strftime('%d/%m/%Y %H:%M:%S')
 
     # Add index as the first column for display
     display_df.insert(0, 'Index', range(1, len(display_df) + 1))
 
-    # Clear existing rows
-    tree.delete(*tree.get_children())
-
-    # Set up columns
-    tree["columns"] = list(display_df.columns)
-    tree["show"] = "headings"
-
-    def sort_column(col):
-        global sort_state, filtered_df
-        existing = next((item for item in sort_state if item[0] == col), None)
-        if existing:
-            sort_state.remove(existing)
-            sort_state.insert(0, (col, not existing[1]))
-        else:
-            sort_state.insert(0, (col, True))
-        sort_by = [col for col, _ in sort_state]
-        ascending = [asc for _, asc in sort_state]
-        if isinstance(filtered_df, pd.DataFrame):
-            filtered_df = filtered_df.sort_values(by=sort_by, ascending=ascending)
-        update_treeview(filtered_df)
-
-    # Set column headers and widths
-    for col in display_df.columns:
-        tree.heading(col, text=col, command=lambda _col=col: sort_column(_col))
-        tree.column(col, width=120, anchor='center')
-
-    # Insert rows
-    for _, row in display_df.iterrows():
-        tree.insert("", "end", values=list(row))
-
-    # After tree is created and before button creation, define copy_selected globally
-
-    def copy_selected(event=None):
-        selected_items = tree.selection()
-        if not selected_items:
-            return
-        headers = [tree.heading(col)["text"] for col in tree["columns"]]
-        rows = ['\t'.join(headers)]
-        for item in selected_items:
-            row = tree.item(item)['values']
-            row_str = [str(cell) if cell is not None else '' for cell in row]
-            rows.append('\t'.join(row_str))
-        root.clipboard_clear()
-        root.clipboard_append('\n'.join(rows))
-
-    def select_all(event=None):
-        tree.selection_set(tree.get_children())
-        return "break"
-
-    # Button beside Clear View
-    # (This replaces the previous lambda: copy_selected())
-    tk.Button(action_frame, text="Copy Selected", command=copy_selected).grid(row=2, column=1, padx=5, pady=5)
-
-    # Key bindings for Ctrl+C
-
-    tree.unbind('<Control-c>')
-    tree.unbind('<Control-C>')
-    tree.bind('<Control-c>', copy_selected)
-    tree.bind('<Control-C>', copy_selected)
-    tree.bind('<Control-a>', select_all)
-    tree.bind('<Control-A>', select_all)
+    # Only the visible rows become Treeview items; heading clicks sort the table model
+    tree.set_dataframe(display_df, formatters)
 
 def apply_filters():
     global filtered_df
@@ -333,6 +274,7 @@ def clear_view():
 # GUI Setup
 root = tk.Tk()
 root.title("Lot History")
+runner = TaskRunner(root)
 root.state('zoomed')  # Open the app in full screen (Windows)
 #root.geometry("1200x800")
 #root.attributes('-fullscreen', True)  # Alternative for true fullscreen (uncomment if needed)
@@ -373,6 +315,8 @@ tk.Button(action_frame, text="Get Lot History", command=threaded_get_lot_history
 tk.Button(action_frame, text="Export to CSV", command=export_to_csv).grid(row=0, column=1, padx=5)
 tk.Button(action_frame, text="Check Current Process", command=check_current_process).grid(row=1, column=0, columnspan=2, pady=5)
 tk.Button(action_frame, text="Clear View", command=clear_view).grid(row=2, column=0, padx=5, pady=5)
+tk.Button(action_frame, text="Copy Selected", command=lambda: tree.copy_selected()).grid(row=2, column=1, padx=5, pady=5)
+tk.Button(action_frame, text="Cancel", command=lambda: runner.cancel(group="history")).grid(row=3, column=0, columnspan=2, pady=5)
 
 console_output = scrolledtext.ScrolledText(left_frame, width=35, height=10)
 console_output.pack(pady=5)
@@ -396,16 +340,9 @@ for step in process_steps:
 tree_frame = tk.Frame(right_frame)
 tree_frame.pack(fill=tk.BOTH, expand=True)
 
-tree = ttk.Treeview(tree_frame)
+tree = VirtualTable(tree_frame)  # Ctrl+C copies the selection, Ctrl+A selects all
 tree.grid(row=0, column=0, sticky="nsew")
 
-vsb = ttk.Scrollbar(tree_frame, orient="vertical", command=tree.yview)
-vsb.grid(row=0, column=1, sticky="ns")
-hsb = ttk.Scrollbar(tree_frame, orient="horizontal", command=tree.xview)
-hsb.grid(row=1, column=0, sticky="ew")
-
-tree.configure(yscrollcommand=vsb.set, xscrollcommand=hsb.set)
-
 tree_frame.rowconfigure(0, weight=1)
 tree_frame.columnconfigure(0, weight=1)
 
@@ -5,7 +5,7 @@ import pandas as pd
 import tkinter as tk
 from tkinter import filedialog, messagebox, scrolledtext, ttk
 import re
-import threading
+from task_runner import TaskRunner
 import sqlite3
 
 def login():
@@ -19,32 +19,32 @@ def login():
     else:
         messagebox.showwarning("Login", "Username or Password cannot be empty.")
 
-def get_data():
-    login()
+def log(message):
+    console_output.insert(tk.END, message)
 
-    if not session:
-        messagebox.showerror("Error", "Please login first.")
-        return
+# Progress of the background tasks, delivered on the Tk thread by the task runner
+def report_progress(done, total, text):
+    progress["maximum"] = total
+    progress["value"] = done
+    current_status.set(text)
 
-    console_output.delete("1.0", tk.END)
-    input_text = lot_input_text.get("1.0", tk.END).strip()
-    lot_ids = input_text.split('\n')
-    global all_filtered_rows
-    all_filtered_rows = []
+def show_error(error):
+    current_status.set("Error occurred.")
+    messagebox.showerror("Error", str(error))
 
-    progress["maximum"] = len(lot_ids)
+# Runs on a worker thread (task_runner.py): widgets are only updated through task.post / task.progress
+def fetch_rejects(task, lot_ids):
+    filtered_rows = []
 
     for i, lot_id in enumerate(lot_ids, 1):
-        current_status.set(f"Processing LotID: {lot_id}")
-        progress["value"] = i
-        root.update_idletasks()
+        task.progress(i, len(lot_ids), f"Processing LotID: {lot_id}")  # stops here once cancelled
 
         url = f"http://bhvnbiprd/CamstarLotTracking/Forms/ShopOrder/DetailedLotHistory?lotID={lot_id}"
         try:
             response = session.get(url, headers={"User-Agent": "Edg/137.0.0.0"}, timeout=10)
             response.raise_for_status()
         except requests.RequestException as e:
-            console_output.insert(tk.END, f"Error fetching {lot_id}: {e}\n")
+            task.post(log, f"Error fetching {lot_id}: {e}\n")
             continue
 
         soup = BeautifulSoup(response.text, 'html.parser')
@@ -82,10 +82,15 @@ def get_data():
 
             if not filtered_df.empty:
                 filtered_df.insert(0, 'LotID', lot_id)
-                all_filtered_rows.append(filtered_df)
+                filtered_rows.append(filtered_df)
         else:
-            console_output.insert(tk.END, f"No table found for LotID: {lot_id}\n")
+            task.post(log, f"No table found for LotID: {lot_id}\n")
+
+    return filtered_rows
 
+def show_rejects(filtered_rows):
+    global all_filtered_rows
+    all_filtered_rows = filtered_rows
     current_status.set("Data fetching complete.")
     console_output.insert(tk.END, "Data fetching complete. You can now export the data.\n")
 
@@ -98,7 +103,19 @@ def get_data():
             console_output.insert(tk.END, f"{i};{total}\n")
 
 def threaded_get_data():
-    threading.Thread(target=get_data).start()
+    login()
+
+    if not session:
+        messagebox.showerror("Error", "Please login first.")
+        return
+
+    console_output.delete("1.0", tk.END)
+    input_text = lot_input_text.get("1.0", tk.END).strip()
+    lot_ids = input_text.split('\n')
+    # Same Lot list again while it runs → joins it; a new list cancels the running one
+    runner.submit(fetch_rejects, lot_ids, key=tuple(lot_ids), group="get_data",
+                  on_done=show_rejects, on_error=show_error, on_progress=report_progress,
+                  on_cancelled=lambda: current_status.set("Cancelled."))
 
 def export_data():
     if not all_filtered_rows:
@@ -130,56 +147,56 @@ def get_strip_ids():
             location_str = ",".join(locations)
             console_output.insert(tk.END, f"{lot_id};{strip_id};{location_str}\n")
 
-def check_brass_jig():
-    def run_check():
-        if not all_filtered_rows:
-            messagebox.showerror("Error", "No data available. Please fetch data first.")
-            return
-
-        #db_path = r"C:\Users\zbrzyy\Documents\Onsemi VN\XrayDatabase\LF_Info_database.db"
-        db_path = r"\\saigon\OSV\Operations\Public_folder\42. Công việc hàng ngày\2. Other data\TRINH CAO\11.Database_Storage\LF_Attach\LF_Info_database.db"
-        final_df = pd.concat(all_filtered_rows, ignore_index=True)
-
-        try:
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-
-            strip_ids = final_df['strip ID'].tolist()
-            jig_ids = []
+# Runs on a worker thread: looks up the JIG_ID of every strip
+def read_jig_ids(task, strip_ids):
+    #db_path = r"C:\Users\zbrzyy\Documents\Onsemi VN\XrayDatabase\LF_Info_database.db"
+    db_path = r"\\saigon\OSV\Operations\Public_folder\42. Công việc hàng ngày\2. Other data\TRINH CAO\11.Database_Storage\LF_Attach\LF_Info_database.db"
+    conn = sqlite3.connect(db_path)
+    task.on_cancel(conn.interrupt)  # Cancel aborts the running query
+    try:
+        cursor = conn.cursor()
+        jig_ids = []
+        for i, strip_id in enumerate(strip_ids, 1):
+            task.progress(i, len(strip_ids), f"Checking Jig for Strip ID: {strip_id}")
+            cursor.execute("SELECT JIG_ID FROM LF_Info WHERE LF_ID = ?", (strip_id,))
+            result = cursor.fetchone()
+            jig_ids.append(result[0] if result else "Not Found")
+        return jig_ids
+    finally:
+        conn.close()
 
-            progress["maximum"] = len(strip_ids)
-
-            for i, strip_id in enumerate(strip_ids, 1):
-                current_status.set(f"Checking Jig for Strip ID: {strip_id}")
-                progress["value"] = i
-                root.update_idletasks()
+def check_brass_jig():
+    if not all_filtered_rows:
+        messagebox.showerror("Error", "No data available. Please fetch data first.")
+        return
 
-                cursor.execute("SELECT JIG_ID FROM LF_Info WHERE LF_ID = ?", (strip_id,))
-                result = cursor.fetchone()
-                jig_ids.append(result[0] if result else "Not Found")
+    final_df = pd.concat(all_filtered_rows, ignore_index=True)
 
-            final_df['JIG_ID'] = jig_ids
+    def show_jig_ids(jig_ids):
+        final_df['JIG_ID'] = jig_ids
 
-            all_filtered_rows.clear()
-            all_filtered_rows.append(final_df)
+        all_filtered_rows.clear()
+        all_filtered_rows.append(final_df)
 
-            console_output.insert(tk.END, "\nBrass Jig Check Results:\n")
-            for _, row in final_df.iterrows():
-                locations = [str(i) for i in range(1, 11) if row.get(f"Count_(1,{i})", 0) > 0]
-                location_str = ",".join(locations)
-                console_output.insert(tk.END, f"{row['LotID']};{row['strip ID']};{row['JIG_ID']};{location_str}\n")
+        console_output.insert(tk.END, "\nBrass Jig Check Results:\n")
+        for _, row in final_df.iterrows():
+            locations = [str(i) for i in range(1, 11) if row.get(f"Count_(1,{i})", 0) > 0]
+            location_str = ",".join(locations)
+            console_output.insert(tk.END, f"{row['LotID']};{row['strip ID']};{row['JIG_ID']};{location_str}\n")
 
-            conn.close()
-            current_status.set("Brass Jig check complete.")
-        except Exception as e:
-            messagebox.showerror("Database Error", f"Failed to query database:\n{e}")
+        current_status.set("Brass Jig check complete.")
 
-    threading.Thread(target=run_check).start()
+    strip_ids = final_df['strip ID'].tolist()
+    runner.submit(read_jig_ids, strip_ids, key=tuple(strip_ids), group="check_jig",
+                  on_done=show_jig_ids, on_progress=report_progress,
+                  on_error=lambda e: messagebox.showerror("Database Error", f"Failed to query database:\n{e}"),
+                  on_cancelled=lambda: current_status.set("Cancelled."))
 
 
 # GUI Setup
 root = tk.Tk()
 root.title("Insufficient Solder on LF Fetcher - Trinh Cao")
+runner = TaskRunner(root)
 
 # Login Panel
 login_frame = tk.Frame(root)
@@ -227,6 +244,9 @@ export_data_button.grid(row=0, column=3, padx=15)
 check_jig_button = tk.Button(action_frame, text="Check Brass Jig", command=check_brass_jig)
 check_jig_button.grid(row=0, column=1, padx=15)
 
+cancel_button = tk.Button(action_frame, text="Cancel", command=lambda: runner.cancel())
+cancel_button.grid(row=0, column=4, padx=15)
+
 # Console Output
 console_output = scrolledtext.ScrolledText(root, width=80, height=20)
 console_output.pack(pady=5)
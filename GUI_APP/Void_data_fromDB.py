@@ -1,59 +1,57 @@
 import pandas as pd
-import sqlite3
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox, filedialog
-import threading
-
-# Process data in batches
-def process_batches(lot_df, void_results_conn):
-    batch_size = 50
-    final_df = pd.DataFrame()
-    num_batches = (len(lot_df) + batch_size - 1) // batch_size
-    
-    progress["maximum"] = num_batches
-
-    for batch_num in range(num_batches):
-        start_idx = batch_num * batch_size
-        end_idx = min((batch_num + 1) * batch_size, len(lot_df))
-        batch = lot_df.iloc[start_idx:end_idx]
-
-        container_names = batch['ContainerName'].tolist()
-        query = f"""
-        SELECT *
-        FROM Void_results
-        WHERE {" OR ".join([f"Lot LIKE '%{name}%'" for name in container_names])}
-        """
-        batch_result = pd.read_sql_query(query, void_results_conn)
-        final_df = pd.concat([final_df, batch_result])
-
-        # Update progress
-        progress["value"] = batch_num + 1
-        current_status.set(f"Processing batch {batch_num + 1}/{num_batches}")
-        root.update_idletasks()
-
-    return final_df
+from lot_lookup import lookup_lots
+from virtual_table import VirtualTable
+from task_runner import TaskRunner
+
+final_df = pd.DataFrame()
+
+# Progress callback for lot_lookup.lookup_lots (delivered on the Tk thread by the task runner)
+def report_progress(done, total, text):
+    progress["maximum"] = total
+    progress["value"] = done
+    current_status.set(text)
+
+# Runs on a worker thread: no widget access here
+def fetch_data(task, db_path, lot_ids):
+    # Exact/prefix matches through the Lot index, one join for all Lots
+    # (a database, a typed database or a partition catalog)
+    # Cancel interrupts the running query instead of waiting for the join to finish
+    df, matches = lookup_lots(db_path, lot_ids, task.progress,
+                              on_connect=lambda conn: task.on_cancel(conn.interrupt))
+    df.drop_duplicates(inplace=True)
+    return df, matches
+
+def show_data(result):
+    global final_df
+    final_df, matches = result
+    not_found = [name for name, lots in matches.items() if not lots]
+    if not_found:
+        console_output.insert(tk.END, f"No data for {len(not_found)} Lot(s): {', '.join(not_found)}\n\n")
+    # Only the visible rows become Treeview items (virtual_table.py)
+    result_table.set_dataframe(final_df)
+    current_status.set(f"Processing completed: {len(final_df)} rows for {len(matches) - len(not_found)} Lot(s).")
+
+def show_error(error):
+    current_status.set("Error occurred.")
+    messagebox.showerror("Error", str(error))
 
 # Get data
 def get_data():
-    try:
-        current_status.set("Processing...")
-        console_output.delete(1.0, tk.END)
+    lot_ids = lot_input_text.get(1.0, tk.END).strip().split('\n')
+    lot_ids = [lot_id.strip() for lot_id in lot_ids if lot_id.strip()]
+    db_path = db_file_path.get()
 
-        lot_ids = lot_input_text.get(1.0, tk.END).strip().split('\n')
-        lot_ids = [lot_id.strip() for lot_id in lot_ids if lot_id.strip()]
-        lot_df = pd.DataFrame(lot_ids, columns=['ContainerName'])
+    current_status.set("Processing...")
+    console_output.delete(1.0, tk.END)
+    # Same request again while it runs → joins it; a different one replaces it
+    runner.submit(fetch_data, db_path, lot_ids, key=(db_path, tuple(lot_ids)), group="get_data",
+                  on_done=show_data, on_error=show_error, on_progress=report_progress,
+                  on_cancelled=lambda: current_status.set("Cancelled."))
 
-        void_results_conn = sqlite3.connect(db_file_path.get())
-        global final_df
-        final_df = process_batches(lot_df, void_results_conn)
-        void_results_conn.close()
-        final_df.drop_duplicates(inplace=True)
-
-        console_output.insert(tk.END, final_df.to_string())
-        current_status.set("Processing completed.")
-    except Exception as e:
-        current_status.set("Error occurred.")
-        messagebox.showerror("Error", str(e))
+def cancel_data():
+    runner.cancel(group="get_data")
 
 # Export to CSV
 def export_data():
@@ -73,10 +71,6 @@ def copy_to_clipboard():
     except Exception as e:
         messagebox.showerror("Error", str(e))
 
-# Threaded data fetch
-def threaded_get_data():
-    threading.Thread(target=get_data).start()
-
 # Update Lot ID count
 def update_lot_count(event=None):
     lot_ids = lot_input_text.get(1.0, tk.END).strip().split('\n')
@@ -87,16 +81,15 @@ def update_lot_count(event=None):
 root = tk.Tk()
 root.title("Data Processing App")
 root.geometry("900x700")
+runner = TaskRunner(root)
 root.grid_rowconfigure(0, weight=1)
 root.grid_columnconfigure(0, weight=1)
 
 main_frame = tk.Frame(root)
 main_frame.grid(sticky="nsew")
-main_frame.grid_rowconfigure(9, weight=1)
+main_frame.grid_rowconfigure(9, weight=1) # row 9 is the result table
 main_frame.grid_columnconfigure(0, weight=1)
 
-main_frame.grid_rowconfigure(8, weight=1) # row 8 is the console_output
-
 
 tk.Label(main_frame, text="Enter Lot IDs (one per line):").grid(row=0, column=0, padx=10, pady=5, sticky="w")
 lot_input_text = scrolledtext.ScrolledText(main_frame, width=50, height=10)
@@ -120,11 +113,15 @@ progress.grid(row=6, column=0, padx=10, pady=5, sticky="ew")
 action_frame = tk.Frame(main_frame)
 action_frame.grid(row=7, column=0, padx=10, pady=10, sticky="ew")
 
-tk.Button(action_frame, text="Get Data", command=threaded_get_data).grid(row=0, column=0, padx=15)
-tk.Button(action_frame, text="Export Data", command=export_data).grid(row=0, column=1, padx=15)
-tk.Button(action_frame, text="Copy to Clipboard", command=copy_to_clipboard).grid(row=0, column=2, padx=15)
+tk.Button(action_frame, text="Get Data", command=get_data).grid(row=0, column=0, padx=15)
+tk.Button(action_frame, text="Cancel", command=cancel_data).grid(row=0, column=1, padx=15)
+tk.Button(action_frame, text="Export Data", command=export_data).grid(row=0, column=2, padx=15)
+tk.Button(action_frame, text="Copy to Clipboard", command=copy_to_clipboard).grid(row=0, column=3, padx=15)
 
-console_output = scrolledtext.ScrolledText(main_frame, width=80, height=10)
+console_output = scrolledtext.ScrolledText(main_frame, width=80, height=4)
 console_output.grid(row=8, column=0, padx=10, pady=5, sticky="nsew")
 
+result_table = VirtualTable(main_frame)
+result_table.grid(row=9, column=0, padx=10, pady=5, sticky="nsew")
+
 root.mainloop()
@@ -0,0 +1,185 @@
+"""
+Indexed Lot lookup for Void_results.
+
+A pasted list of Lot names is resolved in two steps:
+  1. each name is matched against the distinct Lot values: exactly first,
+     then as a prefix (both are index range scans), and only names still
+     unmatched fall back to a substring search over the distinct values;
+  2. the rows of all matched Lots are read with one join against a temp
+     table of those values, through the index on Lot.
+
+Works on a plain Void_results table (the idx_void_lot index is created if
+missing), on the typed layout (dict_lot lookup table) and on a partition
+catalog (void_catalog.db). Can be used without the GUI:
+
+    df, matches = lookup_lots(db_path, ['LVT31A06J', 'LVT31A07K'])
+"""
+import os
+import sqlite3
+import logging
+import pandas as pd
+
+HIGHEST_CHAR = '\U0010ffff'  # sorts after every character (upper bound of a prefix range)
+
+logger = logging.getLogger()
+
+
+def normalize_lot(name):
+    """Lot key as it is stored: surrounding blanks and quotes removed, upper case."""
+    return name.strip().strip('"\'').strip().upper()
+
+
+def _has_table(conn, name, schema='main'):
+    row = conn.execute(f"SELECT type FROM {schema}.sqlite_master WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else None
+
+
+def ensure_lot_index(conn, schema='main'):
+    """Creates the Lot index on a plain Void_results table (one-time cost; skipped when read-only)."""
+    if _has_table(conn, 'Void_results', schema) != 'table':
+        return
+    try:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_void_lot ON Void_results(Lot)")
+        conn.commit()
+    except sqlite3.OperationalError as e:
+        if str(e) == 'interrupted':
+            raise  # cancelled through conn.interrupt, not a read-only database
+        logger.warning(f"Could not create the Lot index ({e}); lookups will scan Void_results")
+
+
+class _LotSource:
+    """Distinct Lot values of one database: dict_lot, partition_lots or the indexed Lot column."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        if _has_table(conn, 'partition_lots'):
+            self.table, self.column = 'partition_lots', 'Lot'
+        elif _has_table(conn, 'dict_lot'):
+            self.table, self.column = 'dict_lot', 'value'
+        else:
+            ensure_lot_index(conn)
+            self.table, self.column = 'Void_results', 'Lot'
+
+    def exact(self, key):
+        return [row[0] for row in self.conn.execute(
+            f"SELECT DISTINCT {self.column} FROM {self.table} WHERE {self.column} = ?", (key,))]
+
+    def prefix(self, key):
+        return [row[0] for row in self.conn.execute(
+            f"SELECT DISTINCT {self.column} FROM {self.table} WHERE {self.column} >= ? AND {self.column} < ?",
+            (key, key + HIGHEST_CHAR))]
+
+    def all_values(self):
+        """Every distinct Lot, skipping from one value to the next through the index."""
+        if self.table == 'Void_results' and _has_table(self.conn, 'idx_void_lot') != 'index':
+            return [row[0] for row in self.conn.execute("SELECT DISTINCT Lot FROM Void_results WHERE Lot IS NOT NULL")]
+        values = []
+        query = f"SELECT MIN({self.column}) FROM {self.table} WHERE {self.column} > ?"
+        value = self.conn.execute(f"SELECT MIN({self.column}) FROM {self.table}").fetchone()[0]
+        while value is not None:
+            values.append(value)
+            value = self.conn.execute(query, (value,)).fetchone()[0]
+        return values
+
+
+def resolve_lots(conn, names):
+    """
+    Maps each input name to the Lot values it matches: exact, else prefix,
+    else substring (case-insensitive). Returns {name: [Lot, ...]} in input
+    order; names without a match map to [].
+    """
+    source = _LotSource(conn)
+    matches = {}
+    unmatched = []
+    for name in names:
+        key = normalize_lot(name)
+        if not key or name in matches:
+            continue
+        found = source.exact(key) or (source.exact(name.strip()) if name.strip() != key else [])
+        found = found or source.prefix(key)
+        matches[name] = found
+        if not found:
+            unmatched.append(name)
+
+    if unmatched:
+        values = source.all_values()
+        upper_values = [(str(value).upper(), value) for value in values]
+        for name in unmatched:
+            key = normalize_lot(name)
+            matches[name] = [value for upper, value in upper_values if key in upper]
+    return matches
+
+
+def _load_lot_table(conn, lots):
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS lookup_lots (Lot TEXT PRIMARY KEY)")
+    conn.execute("DELETE FROM temp.lookup_lots")
+    conn.executemany("INSERT OR IGNORE INTO temp.lookup_lots VALUES (?)", [(lot,) for lot in lots])
+
+
+def _read_rows(conn, schema='main'):
+    """Rows of the Lots in temp.lookup_lots from <schema>.Void_results."""
+    if _has_table(conn, 'dict_lot', schema):
+        # Typed layout: a filter on the view's Lot column is applied after a full
+        # scan, so the view's own SELECT is run with a filter on the Lot_id index
+        view_sql = conn.execute(f"SELECT sql FROM {schema}.sqlite_master WHERE name = 'Void_results'").fetchone()[0]
+        select = view_sql[view_sql.upper().index(' AS SELECT ') + len(' AS '):]
+        if schema != 'main':
+            select = select.replace(' FROM ', f' FROM {schema}.', 1).replace(' JOIN ', f' JOIN {schema}.')
+        query = (f"{select} WHERE v.Lot_id IN (SELECT d.id FROM {schema}.dict_lot d "
+                 f"JOIN temp.lookup_lots l ON l.Lot = d.value)")
+    else:
+        query = (f"SELECT v.* FROM temp.lookup_lots l CROSS JOIN {schema}.Void_results v ON v.Lot = l.Lot")
+    return pd.read_sql_query(query, conn)
+
+
+def _partition_paths(catalog_conn, catalog_path):
+    catalog_dir = os.path.dirname(os.path.abspath(catalog_path))
+    rows = catalog_conn.execute("""
+        SELECT DISTINCT p.path FROM temp.lookup_lots l
+        JOIN partition_lots pl ON pl.Lot = l.Lot
+        JOIN partitions p ON p.name = pl.partition
+        ORDER BY p.name
+    """).fetchall()
+    return [path if os.path.isabs(path) else os.path.join(catalog_dir, path) for (path,) in rows]
+
+
+def lookup_lots(db_path, names, progress=None, on_connect=None):
+    """
+    Void_results rows of the Lots matching the input names, as one DataFrame,
+    plus the {name: [matched Lots]} mapping (see resolve_lots).
+    progress(done, total, text) is called as partitions are read.
+    on_connect(conn) is called before the first query, e.g. to keep
+    conn.interrupt for cancelling a long join from another thread.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        if on_connect:
+            on_connect(conn)
+        matches = resolve_lots(conn, names)
+        lots = sorted({lot for found in matches.values() for lot in found})
+        frames = []
+        if lots:
+            _load_lot_table(conn, lots)
+            if _has_table(conn, 'partition_lots'):
+                paths = _partition_paths(conn, db_path)
+                for i, path in enumerate(paths, 1):
+                    if progress:
+                        progress(i - 1, len(paths), f"Reading partition {i}/{len(paths)}")
+                    conn.execute("ATTACH DATABASE ? AS part", (path,))
+                    try:
+                        ensure_lot_index(conn, 'part')
+                        frames.append(_read_rows(conn, 'part'))
+                    finally:
+                        conn.execute("DETACH DATABASE part")
+            else:
+                if progress:
+                    progress(0, 1, f"Reading {len(lots)} Lots")
+                frames.append(_read_rows(conn))
+        if progress:
+            progress(1, 1, "Done")
+    finally:
+        conn.close()
+
+    if not frames:
+        return pd.DataFrame(), matches
+    return pd.concat(frames, ignore_index=True), matches
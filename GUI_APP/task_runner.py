@@ -0,0 +1,210 @@
+"""
+Background tasks for the Tk tools, without touching widgets off the Tk thread.
+
+Work runs on a small thread pool (max_workers: concurrent scans of the same
+database are limited). Progress, results and errors go through a queue
+that the Tk main loop drains with after() polling, so callbacks always run
+on the Tk thread:
+
+    runner = TaskRunner(root)
+
+    def work(task, db_path, names):           # worker thread: no widget access
+        conn = sqlite3.connect(db_path)
+        task.on_cancel(conn.interrupt)        # Cancel aborts the running statement
+        for i, name in enumerate(names, 1):
+            task.progress(i, len(names), f"Lot {name}")   # raises TaskCancelled once cancelled
+            ...
+        return df
+
+    runner.submit(work, db_path, names, key=('lots', db_path, tuple(names)), group='lots',
+                  on_done=show, on_error=report, on_progress=update_bar)
+
+A request with the same key as a task still running joins that task instead
+of starting another scan (repeated clicks). With a group, a new request
+cancels the older tasks of that group that are still running (the latest
+input wins).
+"""
+import queue
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+POLL_MS = 50        # how often the Tk loop drains the queue while tasks run
+MAX_WORKERS = 2     # concurrent tasks per runner
+
+
+class TaskCancelled(Exception):
+    """Raised inside a task (by progress() / check()) once it has been cancelled."""
+
+
+class Task:
+    """Handle of one submitted job; passed to the job function as its first argument."""
+
+    def __init__(self, runner, key, group):
+        self.key = key
+        self.group = group
+        self._runner = runner
+        self._cancelled = threading.Event()
+        self._cancel_hooks = []
+        self._lock = threading.Lock()
+        self.callbacks = {'done': [], 'error': [], 'progress': [], 'cancelled': []}
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def check(self):
+        """Raises TaskCancelled if the task was cancelled (call between steps)."""
+        if self._cancelled.is_set():
+            raise TaskCancelled()
+
+    def progress(self, done, total, text=""):
+        """Reports progress to the on_progress callbacks (Tk thread); also a cancellation point."""
+        self.check()
+        self._runner._queue.put(('progress', self, (done, total, text)))
+
+    def post(self, func, *args):
+        """Runs func(*args) on the Tk thread, e.g. to append a line to a log widget."""
+        self._runner._queue.put(('call', self, (func, args)))
+
+    def on_cancel(self, hook):
+        """Registers hook() to run when the task is cancelled, e.g. sqlite3 Connection.interrupt."""
+        with self._lock:
+            if not self._cancelled.is_set():
+                self._cancel_hooks.append(hook)
+                return
+        hook()
+
+    def cancel(self):
+        with self._lock:
+            if self._cancelled.is_set():
+                return
+            self._cancelled.set()
+            hooks, self._cancel_hooks = self._cancel_hooks, []
+        for hook in hooks:
+            try:
+                hook()
+            except Exception:
+                pass
+
+
+class TaskRunner:
+    """Thread pool whose results and progress are delivered to the Tk main loop."""
+
+    def __init__(self, root, max_workers=MAX_WORKERS, poll_ms=POLL_MS):
+        self.root = root
+        self.poll_ms = poll_ms
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gui-task")
+        self._queue = queue.Queue()
+        self._tasks = []        # tasks submitted and not finished yet (Tk thread only)
+        self._polling = False
+
+    @property
+    def busy(self):
+        return bool(self._tasks)
+
+    def submit(self, func, *args, key=None, group=None, on_done=None, on_error=None,
+               on_progress=None, on_cancelled=None, **kwargs):
+        """
+        Runs func(task, *args, **kwargs) on a worker thread; call from the Tk thread.
+        Returns the Task (an already running one when key matches).
+        """
+        task = None
+        if key is not None:
+            task = next((t for t in self._tasks if t.key == key and not t.cancelled), None)
+        if group is not None:
+            for other in self._tasks:
+                if other.group == group and other is not task:
+                    other.cancel()
+
+        joined = task is not None
+        if not joined:
+            task = Task(self, key, group)
+        for name, callback in (('done', on_done), ('error', on_error),
+                               ('progress', on_progress), ('cancelled', on_cancelled)):
+            if callback is not None and callback not in task.callbacks[name]:
+                task.callbacks[name].append(callback)
+        if joined:
+            return task
+
+        self._tasks.append(task)
+        self._executor.submit(self._run, task, func, args, kwargs)
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.poll_ms, self._poll)
+        return task
+
+    def cancel(self, key=None, group=None):
+        """Cancels the running tasks with this key or group (all tasks when neither is given)."""
+        for task in list(self._tasks):
+            if (key is None and group is None) or task.key == key or (group is not None and task.group == group):
+                task.cancel()
+
+    def shutdown(self):
+        """Cancels everything and stops the workers without waiting (e.g. on window close)."""
+        self.cancel()
+        self._executor.shutdown(wait=False)
+
+    def _run(self, task, func, args, kwargs):
+        # Worker thread: only the queue is touched here
+        try:
+            task.check()
+            result = func(task, *args, **kwargs)
+            if task.cancelled:
+                self._queue.put(('cancelled', task, None))
+            else:
+                self._queue.put(('done', task, result))
+        except TaskCancelled:
+            self._queue.put(('cancelled', task, None))
+        except Exception as e:
+            if task.cancelled:  # e.g. "interrupted" from Connection.interrupt
+                self._queue.put(('cancelled', task, None))
+            else:
+                e.traceback_text = traceback.format_exc()
+                self._queue.put(('error', task, e))
+
+    def _poll(self):
+        # Tk thread: deliver everything queued since the last poll
+        latest_progress = {}
+        while True:
+            try:
+                kind, task, payload = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'progress':
+                latest_progress[task] = payload  # only the newest progress per task is shown
+                continue
+            if kind == 'call':
+                func, args = payload
+                self._safe_call(func, *args)
+                continue
+            if task in latest_progress:
+                self._deliver(task, 'progress', *latest_progress.pop(task))
+            if task in self._tasks:
+                self._tasks.remove(task)
+            if kind == 'done':
+                self._deliver(task, 'done', payload)
+            elif kind == 'error':
+                if not task.callbacks['error']:
+                    print(payload.traceback_text)
+                self._deliver(task, 'error', payload)
+            else:
+                self._deliver(task, 'cancelled')
+        for task, payload in latest_progress.items():
+            if not task.cancelled:
+                self._deliver(task, 'progress', *payload)
+
+        if self._tasks or not self._queue.empty():
+            self.root.after(self.poll_ms, self._poll)
+        else:
+            self._polling = False
+
+    def _deliver(self, task, name, *args):
+        for callback in task.callbacks[name]:
+            self._safe_call(callback, *args)
+
+    def _safe_call(self, func, *args):
+        try:
+            func(*args)
+        except Exception:
+            traceback.print_exc()  # a failing callback must not stop the polling loop
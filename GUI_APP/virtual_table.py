@@ -0,0 +1,403 @@
+"""
+Virtual result grid for the Tk tools.
+
+A ttk.Treeview that only holds as many items as fit on screen. Scrolling
+re-fills those items from the backing rows, so 100k+ rows open instantly
+and cost no Tk items. Sorting, filtering and selection work on row indices
+of the data model, never on widget items:
+
+    table = VirtualTable(frame)
+    table.pack(fill=tk.BOTH, expand=True)
+    table.set_dataframe(df)                           # or set_rows(columns, rows)
+    table.set_rows(columns, cursor)                   # sqlite3 cursor / iterator: fetched as you scroll
+
+Clicking a heading sorts by that column, and earlier sort columns become
+secondary keys. The filter bar keeps rows whose column (or any column)
+contains the text, case-insensitive. Ctrl+C copies the selected rows as
+TSV and Ctrl+A selects all.
+"""
+import tkinter as tk
+from tkinter import ttk
+from itertools import islice
+
+FETCH_ROWS = 5000          # rows read from a cursor / iterator at a time
+FILTER_DELAY_MS = 300      # typing pause before the filter is applied
+ALL_COLUMNS = "(all columns)"
+
+
+def _is_missing(value):
+    """None, NaN, NaT and pd.NA."""
+    if value is None:
+        return True
+    try:
+        return bool(value != value)
+    except TypeError:
+        return True
+
+
+class FrameRows:
+    """Row access over a DataFrame's column arrays, without copying it into tuples."""
+
+    def __init__(self, df):
+        self._df = df
+        self._arrays = [df.iloc[:, c].array for c in range(df.shape[1])]
+        self._lists = {}  # column -> Python list, built on the first sort / filter of that column
+
+    def __len__(self):
+        return len(self._df)
+
+    def __getitem__(self, i):
+        return tuple(array[i] for array in self._arrays)
+
+    def column(self, c):
+        if c not in self._lists:
+            self._lists[c] = self._df.iloc[:, c].tolist()
+        return self._lists[c]
+
+
+def format_value(value):
+    """Default cell text: missing values blank, everything else str()."""
+    return "" if _is_missing(value) else str(value)
+
+
+class VirtualTable(tk.Frame):
+    """Treeview with a fixed pool of items over an in-memory or cursor-backed row model."""
+
+    def __init__(self, master, filter_bar=True, column_width=120, **kwargs):
+        super().__init__(master, **kwargs)
+        self.columns = []
+        self.column_width = column_width
+        self._rows = []         # backing rows (sequences), never reordered
+        self._source = None     # unread rest of a cursor / iterator
+        self._view = []         # indices into _rows after filter + sort
+        self._formatters = []   # one callable per column
+        self._sort = []         # [(column, ascending)], primary key first
+        self._filters = {}      # column (ALL_COLUMNS for any) -> lower-case text
+        self._selected = set()  # selected row indices (survive sorting / filtering)
+        self._anchor = None     # view position of the last click (Shift+click ranges)
+        self._top = 0           # view position shown in the first item
+        self._items = []        # the Treeview item pool
+        self._filter_job = None
+
+        if filter_bar:
+            bar = tk.Frame(self)
+            bar.pack(side=tk.TOP, fill=tk.X, pady=(0, 3))
+            tk.Label(bar, text="Filter:").pack(side=tk.LEFT)
+            self._filter_column = ttk.Combobox(bar, values=[ALL_COLUMNS], state="readonly", width=22)
+            self._filter_column.set(ALL_COLUMNS)
+            self._filter_column.pack(side=tk.LEFT, padx=5)
+            self._filter_column.bind("<<ComboboxSelected>>", self._on_filter_column)
+            self._filter_entry = tk.Entry(bar, width=30)
+            self._filter_entry.pack(side=tk.LEFT, padx=5)
+            self._filter_entry.bind("<KeyRelease>", self._on_filter_typed)
+            tk.Button(bar, text="Clear Filter/Sort", command=self.clear_view).pack(side=tk.LEFT, padx=5)
+            self._count_label = tk.Label(bar, text="", fg="purple")
+            self._count_label.pack(side=tk.LEFT, padx=10)
+        else:
+            self._filter_column = self._filter_entry = self._count_label = None
+
+        body = tk.Frame(self)
+        body.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+        self.tree = ttk.Treeview(body, show="headings", selectmode="extended")
+        self.vsb = ttk.Scrollbar(body, orient="vertical", command=self._on_scrollbar)
+        self.hsb = ttk.Scrollbar(body, orient="horizontal", command=self.tree.xview)
+        self.tree.configure(xscrollcommand=self.hsb.set)
+        self.tree.grid(row=0, column=0, sticky="nsew")
+        self.vsb.grid(row=0, column=1, sticky="ns")
+        self.hsb.grid(row=1, column=0, sticky="ew")
+        body.rowconfigure(0, weight=1)
+        body.columnconfigure(0, weight=1)
+
+        self.tree.bind("<Configure>", lambda e: self._resize(e.height))
+        self.tree.bind("<Button-1>", self._on_click)
+        self.tree.bind("<MouseWheel>", lambda e: self.scroll(-3 if e.delta > 0 else 3))
+        self.tree.bind("<Button-4>", lambda e: self.scroll(-3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll(3))
+        self.tree.bind("<Up>", lambda e: self._move_cursor(-1))
+        self.tree.bind("<Down>", lambda e: self._move_cursor(1))
+        self.tree.bind("<Prior>", lambda e: self.scroll(-len(self._items)) or "break")
+        self.tree.bind("<Next>", lambda e: self.scroll(len(self._items)) or "break")
+        self.tree.bind("<Home>", lambda e: self.scroll(-len(self._view)) or "break")
+        self.tree.bind("<End>", lambda e: self._scroll_to_end() or "break")
+        for key in ("<Control-c>", "<Control-C>"):
+            self.tree.bind(key, lambda e: self.copy_selected() or "break")
+        for key in ("<Control-a>", "<Control-A>"):
+            self.tree.bind(key, lambda e: self.select_all() or "break")
+
+    # ---------- data ----------
+
+    def set_rows(self, columns, rows, formatters=None):
+        """
+        Shows `rows` under `columns`. A sequence (list of tuples, etc.) is used
+        as-is; any other iterable (sqlite3 cursor, generator) is read
+        FETCH_ROWS at a time as the user scrolls. formatters maps a column
+        name to a callable producing its cell text (default format_value).
+        """
+        self.columns = list(columns)
+        formatters = formatters or {}
+        self._formatters = [formatters.get(col, format_value) for col in self.columns]
+        if hasattr(rows, "__len__") and hasattr(rows, "__getitem__"):
+            self._rows, self._source = rows, None
+        else:
+            self._rows, self._source = [], iter(rows)
+            self._fetch(FETCH_ROWS)
+        self._sort = []
+        self._filters = {}
+        self._selected = set()
+        self._anchor = None
+        self._top = 0
+
+        self.tree["columns"] = self.columns
+        for col in self.columns:
+            self.tree.heading(col, text=col, command=lambda c=col: self.sort_by(c))
+            self.tree.column(col, width=self.column_width, stretch=True)
+        if self._filter_column is not None:
+            self._filter_column["values"] = [ALL_COLUMNS] + self.columns
+            self._filter_column.set(ALL_COLUMNS)
+            self._filter_entry.delete(0, tk.END)
+        self._view = list(range(len(self._rows)))
+        self._refresh()
+
+    def set_dataframe(self, df, formatters=None):
+        """Shows a DataFrame (its index is not shown)."""
+        self.set_rows([str(col) for col in df.columns], FrameRows(df), formatters)
+
+    def clear(self):
+        self.set_rows(self.columns, [])
+
+    def _fetch(self, count):
+        """Reads up to count more rows from the cursor / iterator; returns how many."""
+        if self._source is None:
+            return 0
+        batch = list(islice(self._source, count))
+        if len(batch) < count:
+            self._source = None
+        start = len(self._rows)
+        self._rows.extend(batch)
+        if not self._filters and not self._sort:
+            self._view.extend(range(start, len(self._rows)))
+        return len(batch)
+
+    def _fetch_all(self):
+        while self._source is not None:
+            self._fetch(FETCH_ROWS * 10)
+
+    @property
+    def row_count(self):
+        """Rows currently shown (after filtering)."""
+        return len(self._view)
+
+    def view_indices(self):
+        """Backing-row indices in display order (filtered and sorted), e.g. for df.iloc[...] exports."""
+        self._fetch_all()
+        return list(self._view)
+
+    # ---------- sort / filter ----------
+
+    def sort_by(self, column, ascending=None):
+        """Sorts by column (toggling its direction when it is already the primary key)."""
+        current = next((item for item in self._sort if item[0] == column), None)
+        if ascending is None:
+            ascending = not current[1] if current and self._sort[0] == current else True
+        if current:
+            self._sort.remove(current)
+        self._sort.insert(0, (column, ascending))
+        self._apply()
+
+    def set_filter(self, column, text):
+        """Keeps rows whose column (ALL_COLUMNS: any column) contains text; empty text removes the filter."""
+        text = (text or "").strip().lower()
+        if text:
+            self._filters[column] = text
+        else:
+            self._filters.pop(column, None)
+        self._apply()
+
+    def clear_view(self):
+        """Drops all filters and the sort order."""
+        self._filters = {}
+        self._sort = []
+        if self._filter_entry is not None:
+            self._filter_entry.delete(0, tk.END)
+        self._apply()
+
+    def _column(self, c):
+        """Values of column c, indexable by row index."""
+        if isinstance(self._rows, FrameRows):
+            return self._rows.column(c)
+        return [row[c] for row in self._rows]
+
+    def _apply(self):
+        self._fetch_all()
+        view = range(len(self._rows))
+        for column, text in self._filters.items():
+            if column == ALL_COLUMNS:
+                targets = range(len(self.columns))
+            elif column in self.columns:
+                targets = [self.columns.index(column)]
+            else:
+                continue
+            texts = [(self._formatters[c], self._column(c)) for c in targets]
+            view = [i for i in view if any(text in fmt(values[i]).lower() for fmt, values in texts)]
+        view = list(view)
+
+        # Stable sorts from the last key to the primary one; missing values always last
+        for column, ascending in reversed(self._sort):
+            values = self._column(self.columns.index(column))
+            present = [i for i in view if not _is_missing(values[i])]
+            missing = [i for i in view if _is_missing(values[i])]
+            try:
+                present.sort(key=values.__getitem__, reverse=not ascending)
+            except TypeError:  # mixed types in one column
+                present.sort(key=lambda i: str(values[i]), reverse=not ascending)
+            view = present + missing
+
+        self._view = view
+        self._top = 0
+        for col in self.columns:
+            arrow = ""
+            if self._sort and self._sort[0][0] == col:
+                arrow = " ▲" if self._sort[0][1] else " ▼"
+            self.tree.heading(col, text=col + arrow)
+        self._refresh()
+
+    def _on_filter_column(self, event=None):
+        self._filter_entry.delete(0, tk.END)
+        self._filter_entry.insert(0, self._filters.get(self._filter_column.get(), ""))
+
+    def _on_filter_typed(self, event=None):
+        if self._filter_job is not None:
+            self.after_cancel(self._filter_job)
+        self._filter_job = self.after(FILTER_DELAY_MS, self._filter_from_bar)
+
+    def _filter_from_bar(self):
+        self._filter_job = None
+        self.set_filter(self._filter_column.get(), self._filter_entry.get())
+
+    # ---------- window ----------
+
+    def _row_height(self):
+        height = ttk.Style().lookup("Treeview", "rowheight")
+        try:
+            return int(height) if height else 20
+        except (TypeError, ValueError):
+            return 20
+
+    def _resize(self, pixel_height):
+        """Keeps one item per visible row."""
+        header = 25
+        if self._items:
+            box = self.tree.bbox(self._items[0])
+            if box:
+                header = box[1]
+        count = max(1, (pixel_height - header) // self._row_height())
+        while len(self._items) < count:
+            self._items.append(self.tree.insert("", tk.END, values=()))
+        if len(self._items) > count:
+            self.tree.delete(*self._items[count:])
+            del self._items[count:]
+        self._refresh()
+
+    def scroll(self, rows):
+        self._scroll_to(self._top + rows)
+
+    def _scroll_to_end(self):
+        self._fetch_all()
+        self._scroll_to(len(self._view))
+
+    def _scroll_to(self, top):
+        # Read further from a cursor before the window reaches the end of what is loaded
+        while self._source is not None and top + 2 * len(self._items) >= len(self._view):
+            if not self._fetch(FETCH_ROWS):
+                break
+        self._top = max(0, min(top, len(self._view) - len(self._items)))
+        self._refresh()
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self._scroll_to(int(float(amount) * len(self._view)))
+        elif unit == "pages":
+            self.scroll(int(amount) * len(self._items))
+        else:
+            self.scroll(int(amount))
+
+    def _refresh(self):
+        """Fills the item pool from the view window; only these items ever exist."""
+        shown = []
+        for offset, iid in enumerate(self._items):
+            pos = self._top + offset
+            if pos >= len(self._view):
+                break
+            row = self._rows[self._view[pos]]
+            self.tree.item(iid, values=[fmt(v) for fmt, v in zip(self._formatters, row)])
+            shown.append(iid)
+        self.tree.set_children("", *shown)
+        self.tree.selection_set([iid for offset, iid in enumerate(shown)
+                                 if self._view[self._top + offset] in self._selected])
+
+        total = len(self._view)
+        if total:
+            self.vsb.set(self._top / total, min(1.0, (self._top + len(shown)) / total))
+        else:
+            self.vsb.set(0.0, 1.0)
+        if self._count_label is not None:
+            loaded = len(self._rows) if self._source is None else f"{len(self._rows)}+"
+            self._count_label.config(text=f"{total} / {loaded} rows")
+
+    # ---------- selection ----------
+
+    def _on_click(self, event):
+        if self.tree.identify_region(event.x, event.y) not in ("cell", "tree"):
+            return None  # headings, separators: default handling
+        iid = self.tree.identify_row(event.y)
+        self.tree.focus_set()
+        if not iid or iid not in self._items:
+            return "break"
+        pos = self._top + self._items.index(iid)
+        if pos >= len(self._view):
+            return "break"
+        if event.state & 0x0001 and self._anchor is not None:  # Shift: range from the last click
+            low, high = sorted((self._anchor, pos))
+            self._selected = set(self._view[low:high + 1])
+        elif event.state & 0x0004:  # Control: toggle
+            self._selected ^= {self._view[pos]}
+            self._anchor = pos
+        else:
+            self._selected = {self._view[pos]}
+            self._anchor = pos
+        self._refresh()
+        return "break"
+
+    def _move_cursor(self, step):
+        if not self._view:
+            return "break"
+        pos = 0 if self._anchor is None else max(0, min(len(self._view) - 1, self._anchor + step))
+        self._anchor = pos
+        self._selected = {self._view[pos]}
+        if pos < self._top:
+            self._scroll_to(pos)
+        elif pos >= self._top + len(self._items):
+            self._scroll_to(pos - len(self._items) + 1)
+        else:
+            self._refresh()
+        return "break"
+
+    def select_all(self):
+        self._fetch_all()
+        self._selected = set(self._view)
+        self._refresh()
+
+    def selected_rows(self):
+        """Selected backing rows, in display order."""
+        return [self._rows[i] for i in self._view if i in self._selected]
+
+    def copy_selected(self):
+        """Copies the header and the selected rows as tab-separated text."""
+        rows = self.selected_rows()
+        if not rows:
+            return
+        lines = ["\t".join(self.columns)]
+        for row in rows:
+            lines.append("\t".join(fmt(v) for fmt, v in zip(self._formatters, row)))
+        self.clipboard_clear()
+        self.clipboard_append("\n".join(lines))
@@ -1,10 +1,10 @@
 import os
 import time
 import shutil
+import threading
 import concurrent.futures
 import sqlite3
 import logging
-from functools import lru_cache
 
 # Configuration
 source_1 = [r'\\10.240.39.111\mips\Lot-Export', r'\\10.240.39.195\mips\Lot-Export']
@@ -13,6 +13,14 @@ dest_1 = r'C:\Users\zbrzyy\Documents\Onsemi VN\XrayDatabase\Lot_Info'
 dest_2 = r'C:\Users\zbrzyy\Documents\Onsemi VN\XrayDatabase\Void_results'
 DB_PATH = r'C:\Users\zbrzyy\Documents\Onsemi VN\XrayDatabase\file_tracker.db'
 
+# Copy engine
+WORKERS_PER_HOST = 4  # concurrent copies per source machine
+MAX_BYTES_PER_SECOND_PER_HOST = 20 * 1024 * 1024  # read ceiling per machine (0 = unlimited)
+COPY_CHUNK_SIZE = 1024 * 1024
+RESUME_MIN_SIZE = 8 * 1024 * 1024  # larger files keep their '.part' file to resume an interrupted copy
+STATE_COMMIT_FILES = 200  # file_meta updates written per transaction
+PROGRESS_EVERY_SECONDS = 10
+
 # Initialize logging
 logging.basicConfig(
     filename=f'copy_log_{time.strftime("%Y%m%d")}.log',
@@ -35,119 +43,264 @@ def init_database():
         ''')
         conn.commit()
 
-def get_file_state(src_path):
-    """Retrieve file state from database"""
-    with sqlite3.connect(DB_PATH) as conn:
-        cursor = conn.execute('''
-        SELECT mtime, size, dest_path 
-        FROM file_meta 
-        WHERE src_path = ?
-        ''', (src_path,))
-        return cursor.fetchone()
-
-def update_file_state(src_path, dest_path, mtime, size):
-    """Update file state in database"""
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.execute('''
-        INSERT OR REPLACE INTO file_meta 
-            (src_path, dest_path, mtime, size, last_updated)
-        VALUES (?, ?, ?, ?, ?)
-        ''', (src_path, dest_path, mtime, size, time.time()))
-        conn.commit()
+def load_file_states(conn):
+    """Load the whole copy state in one query: src_path -> (mtime, size, dest_path)"""
+    cursor = conn.execute('SELECT src_path, mtime, size, dest_path FROM file_meta')
+    return {row[0]: row[1:] for row in cursor}
+
+def update_file_states(conn, states):
+    """Write a batch of (src_path, dest_path, mtime, size) in one transaction"""
+    now = time.time()
+    conn.executemany('''
+    INSERT OR REPLACE INTO file_meta
+        (src_path, dest_path, mtime, size, last_updated)
+    VALUES (?, ?, ?, ?, ?)
+    ''', [(src, dest, mtime, size, now) for src, dest, mtime, size in states])
+    conn.commit()
+
+def source_host(path):
+    """Machine a source path lives on ('\\\\10.240.39.111\\mips\\...' -> '10.240.39.111')"""
+    normalized = path.replace('/', '\\')
+    if normalized.startswith('\\\\'):
+        return normalized[2:].split('\\', 1)[0].lower()
+    return 'local'
+
+
+class RateLimiter:
+    """Token bucket shared by all copy threads reading from one host"""
+
+    def __init__(self, bytes_per_second):
+        self.rate = bytes_per_second
+        self.allowance = float(bytes_per_second)
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def consume(self, nbytes):
+        if not self.rate:
+            return
+        with self.lock:
+            now = time.monotonic()
+            self.allowance = min(self.rate, self.allowance + (now - self.last) * self.rate)
+            self.last = now
+            self.allowance -= nbytes
+            delay = -self.allowance / self.rate if self.allowance < 0 else 0.0
+        if delay > 0:
+            time.sleep(delay)
+
+
+class CopyStats:
+    """Thread-safe totals for MB/s and files/s reporting"""
+
+    def __init__(self):
+        self.files = 0
+        self.bytes = 0
+        self.resumed_bytes = 0
+        self.failed = 0
+        self.start_time = time.time()
+        self.lock = threading.Lock()
+
+    def add_bytes(self, nbytes):
+        with self.lock:
+            self.bytes += nbytes
+
+    def add_file(self, resumed_bytes=0):
+        with self.lock:
+            self.files += 1
+            self.resumed_bytes += resumed_bytes
+
+    def add_failure(self):
+        with self.lock:
+            self.failed += 1
+
+    def summary(self):
+        elapsed = max(time.time() - self.start_time, 1e-6)
+        return (f"{self.files} files, {self.bytes / 1e6:.1f} MB in {elapsed:.1f}s "
+                f"({self.bytes / 1e6 / elapsed:.2f} MB/s, {self.files / elapsed:.2f} files/s, "
+                f"{self.resumed_bytes / 1e6:.1f} MB resumed, {self.failed} failed)")
+
+
+def copy_file(src_file, dest_file, src_mtime, src_size, limiter, stats):
+    """
+    Copy one file through '<dest>.part' and rename it into place when complete.
+    A '.part' left by an interrupted copy of a large file is resumed when it is
+    newer than the source (the source has not changed since it was written).
+    Returns the number of bytes that were already present from the resume.
+    """
+    part_file = dest_file + '.part'
+    offset = 0
+    if src_size >= RESUME_MIN_SIZE and os.path.exists(part_file):
+        part_stat = os.stat(part_file)
+        if part_stat.st_size <= src_size and part_stat.st_mtime >= src_mtime:
+            offset = part_stat.st_size
 
-def copy_file(src_file, dest_file, src_dir):
-    """Copy file using database state tracking"""
     try:
-        src_path = os.path.normpath(src_file)
-        src_stat = os.stat(src_file)
-        src_mtime = src_stat.st_mtime
-        src_size = src_stat.st_size
-
-        # Check database for existing state
-        db_state = get_file_state(src_path)
-        if db_state:
-            db_mtime, db_size, db_dest = db_state
-            if src_mtime == db_mtime and src_size == db_size:
-                if os.path.exists(db_dest):
-                    logger.debug(f'Skipped (no changes): {os.path.basename(src_file)}')
-                    return
-                else:
-                    logger.info(f'Re-copying missing file: {os.path.basename(src_file)}')
-
-        # Perform file copy
-        shutil.copy2(src_file, dest_file)
-        print(f"Copied: {os.path.basename(src_file)}")
+        with open(src_file, 'rb') as src, open(part_file, 'r+b' if offset else 'wb') as dst:
+            if offset:
+                src.seek(offset)
+                dst.seek(offset)
+                logger.info(f'Resuming {os.path.basename(src_file)} at {offset} bytes')
+            while True:
+                chunk = src.read(COPY_CHUNK_SIZE)
+                if not chunk:
+                    break
+                limiter.consume(len(chunk))
+                dst.write(chunk)
+                stats.add_bytes(len(chunk))
+            dst.truncate()
 
         # Verify destination
-        dest_stat = os.stat(dest_file)
-        if dest_stat.st_size != src_size:
-            raise IOError(f"Size mismatch after copy: {src_size} vs {dest_stat.st_size}")
+        copied_size = os.path.getsize(part_file)
+        if copied_size != src_size:
+            os.remove(part_file)
+            raise IOError(f"Size mismatch after copy: {src_size} vs {copied_size}")
+        shutil.copystat(src_file, part_file)
+        os.replace(part_file, dest_file)
+    except OSError:
+        # Only large files keep their '.part' to resume; small ones start over next run
+        if src_size < RESUME_MIN_SIZE:
+            try:
+                os.remove(part_file)
+            except OSError:
+                pass
+        raise
+    return offset
 
-        # Update database
-        update_file_state(src_path, dest_file, src_mtime, src_size)
-        logger.info(f'Copied: {os.path.basename(src_file)}')
 
-    except Exception as e:
-        logger.error(f"Failed {os.path.basename(src_file)}: {str(e)}")
-        print(f"Failed to copy: {os.path.basename(src_file)}")
+def list_destination_files(dest_dir):
+    """Destination file names, listed fresh for every run"""
+    with os.scandir(dest_dir) as entries:
+        return {entry.name for entry in entries if entry.is_file()}
 
+def collect_copy_tasks(source_dirs, dest_dir, file_extension, states, dest_files):
+    """Compare each source listing with the stored state; returns {host: [(src, dest, mtime, size)]}"""
+    tasks = {}
+    for src_dir in source_dirs:
+        print(f"Processing directory: {src_dir}")
+        if not os.path.exists(src_dir):
+            logger.warning(f"Source missing: {src_dir}")
+            continue
 
-@lru_cache(maxsize=1)
-def list_destination_files(dest_dir):
-    """Cache destination file list to reduce I/O"""
-    return {f for f in os.listdir(dest_dir) if os.path.isfile(os.path.join(dest_dir, f))}
+        host = source_host(src_dir)
+        try:
+            # A share dropping mid-listing only skips the rest of this directory
+            with os.scandir(src_dir) as entries:
+                for entry in entries:
+                    task = _copy_task(entry, dest_dir, file_extension, states, dest_files)
+                    if task:
+                        tasks.setdefault(host, []).append(task)
+        except OSError as e:
+            logger.error(f"Cannot list {src_dir}: {str(e)}")
+            print(f"Error listing directory: {src_dir}")
+    return tasks
+
+def _copy_task(entry, dest_dir, file_extension, states, dest_files):
+    """(src, dest, mtime, size) when the entry needs copying, else None"""
+    fname = entry.name
+    try:
+        if not fname.endswith(file_extension) or not entry.is_file():
+            return None
+        # The listing already carries mtime and size (no extra round trip on Windows)
+        stat = entry.stat()
+    except OSError as e:
+        logger.error(f"Error reading {fname}: {str(e)}")
+        return None
+    src_path = os.path.normpath(entry.path)
+    dest_file = os.path.join(dest_dir, fname)
+
+    db_state = states.get(src_path)
+    if db_state:
+        db_mtime, db_size, db_dest = db_state
+        if stat.st_mtime == db_mtime and stat.st_size == db_size:
+            if db_dest == dest_file:
+                exists = fname in dest_files
+            else:
+                exists = os.path.exists(db_dest)
+            if exists:
+                logger.debug(f'Skipped (no changes): {fname}')
+                return None
+            logger.info(f'Re-copying missing file: {fname}')
+    elif fname in dest_files:
+        # Skip if destination exists and not in database
+        logger.debug(f'Skipped (existing): {fname}')
+        return None
+
+    return (src_path, dest_file, stat.st_mtime, stat.st_size)
 
 def process_files(source_dirs, dest_dir, file_extension):
-    """Process files with thread pooling and batched operations"""
-    dest_files = list_destination_files(dest_dir)
+    """
+    Copy new and changed files with a bounded pool and a bandwidth ceiling per
+    source host, committing the copy state in batches.
+    """
     os.makedirs(dest_dir, exist_ok=True)
-    
-    
-
-    
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        for src_dir in source_dirs:
-            print(f"Processing directory: {src_dir}")
-            if not os.path.exists(src_dir):
-                logger.warning(f"Source missing: {src_dir}")
-                continue
-
-            futures = []
-            for fname in os.listdir(src_dir):
-                if not fname.endswith(file_extension):
-                    continue
-                    
-                src_file = os.path.join(src_dir, fname)
-                dest_file = os.path.join(dest_dir, fname)
-                
-                # Skip if destination exists and not in database
-                if fname in dest_files and not get_file_state(src_file):
-                    logger.debug(f'Skipped (existing): {fname}')
-                    continue
-                
-                futures.append(executor.submit(
-                    copy_file, src_file, dest_file, src_dir
-                ))
+    dest_files = list_destination_files(dest_dir)
+    stats = CopyStats()
+
+    with sqlite3.connect(DB_PATH) as conn:
+        states = load_file_states(conn)
+        tasks = collect_copy_tasks(source_dirs, dest_dir, file_extension, states, dest_files)
+        total = sum(len(host_tasks) for host_tasks in tasks.values())
+        if not total:
+            print(f"No new or changed {file_extension} files.")
+            return stats
+        print(f"Copying {total} {file_extension} files from {len(tasks)} host(s)...")
+
+        executors = {}
+        futures = {}
+        try:
+            for host, host_tasks in tasks.items():
+                executors[host] = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=WORKERS_PER_HOST, thread_name_prefix=f'copy-{host}')
+                limiter = RateLimiter(MAX_BYTES_PER_SECOND_PER_HOST)
+                for task in host_tasks:
+                    future = executors[host].submit(copy_file, *task, limiter, stats)
+                    futures[future] = task
 
-            # Handle task exceptions
+            pending_states = []
+            last_progress = time.time()
             for future in concurrent.futures.as_completed(futures):
-                if future.exception():
-                    logger.error(f"Thread error: {future.exception()}")
+                src_path, dest_file, mtime, size = futures[future]
+                fname = os.path.basename(src_path)
+                try:
+                    resumed = future.result()
+                except Exception as e:
+                    stats.add_failure()
+                    logger.error(f"Failed {fname}: {str(e)}")
+                    print(f"Failed to copy: {fname}")
+                    continue
+                stats.add_file(resumed)
+                dest_files.add(fname)
+                pending_states.append((src_path, dest_file, mtime, size))
+                print(f"Copied: {fname}")
+                logger.info(f'Copied: {fname}')
+                if len(pending_states) >= STATE_COMMIT_FILES:
+                    update_file_states(conn, pending_states)
+                    pending_states = []
+                if time.time() - last_progress >= PROGRESS_EVERY_SECONDS:
+                    print(f"  {stats.summary()}")
+                    last_progress = time.time()
+            if pending_states:
+                update_file_states(conn, pending_states)
+        finally:
+            for executor in executors.values():
+                executor.shutdown(wait=True)
+
+    print(f"Copied {file_extension}: {stats.summary()}")
+    logger.info(f"Copied {file_extension}: {stats.summary()}")
+    return stats
 
 def main():
     init_database()
     logger.info("===== Starting file sync =====")
     print("Starting file synchronization...")
 
-    
+
     start_time = time.time()
     process_files(source_1, dest_1, '.lotx')
     process_files(source_2, dest_2, '.csv')
-    
+
     logger.info(f"Completed in {time.time()-start_time:.2f} seconds")
-    print(f"Synchronization completed in {time.time()-start_time:.2f} seconds.")    
+    print(f"Synchronization completed in {time.time()-start_time:.2f} seconds.")
     logger.info("===== Synchronization finished =====\n")
 
 if __name__ == "__main__":
     main()
-    
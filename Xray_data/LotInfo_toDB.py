@@ -1,14 +1,23 @@
+import io
 import os
-import fnmatch
+import sys
 import sqlite3
-import xml.etree.ElementTree as ET
 from tqdm import tqdm  # For progress tracking
+from lotx_parser import read_lotx_rows
+from raw_cache import RawFileCache, scan_share_files
 
 # Configuration
 lotx_folder = r'C:\Users\zbrzyy\Documents\Onsemi VN\XrayDatabase\Lot_Info'
 db_path = r'C:\Users\zbrzyy\Documents\Onsemi VN\XrayDatabase\Lot_Info_database.db'
 batch_size = 100  # Process files in batches for better performance
 
+# Direct-from-share mode (--from-share): parse the MIPS exports in one pass,
+# without the AutoCopy.py step and its local copy
+share_folders = [r'\\10.240.39.111\mips\Lot-Export', r'\\10.240.39.195\mips\Lot-Export']
+raw_cache_dir = r'C:\Users\zbrzyy\Documents\Onsemi VN\XrayDatabase\raw_cache\Lot_Info'
+raw_cache_max_bytes = 0  # default: no local copy, each file is read once and never written to disk
+raw_cache_opt_in_bytes = 2 * 1024 ** 3  # with --raw-cache: keep raw files for re-processing, LRU-evicted
+
 def setup_database(conn):
     """Initialize database structure with tracking system"""
     conn.execute("PRAGMA journal_mode = WAL")  # Better concurrency
@@ -33,94 +42,39 @@ def setup_database(conn):
 
 def process_xml_file(file_path, conn):
     """Process single XML file and return data batch"""
-    tree = ET.parse(file_path)
-    root = tree.getroot()
-    
-    # Extract common lot information
-    lot_attrs = {
-        'lot_id': root.attrib.get('Id'),
-        'recipe': root.attrib.get('Recipe'),
-        'allow_size_null': root.attrib.get('AllowSizeNull'),
-        'count_unique_barcodes_only': root.attrib.get('CountUniqueBarcodesOnly'),
-        'size': int(root.attrib.get('Size', 0)),
-        'carrier_index': int(root.attrib.get('CarrierIndex', 0))
-    }
-    
-    batch = []
-    # Extract tray and unit information
-    trays = root.find('Trays')
-    if trays is None:
-        trays = []
-    
-    for tray in trays:
-        tray_attrs = {
-            'tray_id': tray.attrib.get('Id'),
-            'tray_state': int(tray.attrib.get('State', 0)),
-            'tray_code': tray.attrib.get('Code')
-        }
-        
-        units = tray.find('Units')
-        if units is None:
-            units = []
-        for unit in units:
-            unit_attrs = {
-                'unit_id': unit.attrib.get('Id'),
-                'unit_state': int(unit.attrib.get('State', 0)),
-                'unit_code': unit.attrib.get('Code'),
-                'unit_idx': int(unit.attrib.get('Idx', 0))
-            }
-            
-            # Combine all attributes into a single record
-            record = (
-                lot_attrs['lot_id'],
-                lot_attrs['recipe'],
-                lot_attrs['allow_size_null'],
-                lot_attrs['count_unique_barcodes_only'],
-                lot_attrs['size'],
-                lot_attrs['carrier_index'],
-                tray_attrs['tray_id'],
-                tray_attrs['tray_state'],
-                tray_attrs['tray_code'],
-                unit_attrs['unit_id'],
-                unit_attrs['unit_state'],
-                unit_attrs['unit_code'],
-                unit_attrs['unit_idx']
-            )
-            batch.append(record)
-    
-    return batch
+    # Streams tray/unit records without building the whole XML tree
+    return read_lotx_rows(file_path)
 
-def process_lotx_files():
-    """Main processing function with restart capability"""
+def process_lotx_files(from_share=False, raw_cache=False):
+    """
+    Main processing function with restart capability.
+    from_share=True reads the files straight from share_folders, each
+    network read going directly to the parser; raw_cache=True also keeps
+    a local copy of each file (raw_cache_opt_in_bytes).
+    """
+    cache_bytes = raw_cache_opt_in_bytes if raw_cache else raw_cache_max_bytes
+    cache = RawFileCache(raw_cache_dir, cache_bytes) if from_share else None
     with sqlite3.connect(db_path) as conn:
         setup_database(conn)
         
-        # Get already processed files
-        processed_files = set()
+        # Get already processed files with their modification times
+        processed_files = {}
         try:
-            processed_files = set(row[0] for row in 
-                conn.execute("SELECT filename FROM processed_files").fetchall())
+            processed_files = dict(conn.execute("SELECT filename, last_modified FROM processed_files").fetchall())
         except sqlite3.OperationalError:
             pass  # Table doesn't exist yet
             
         # Find all candidate files with their modification times
+        if from_share:
+            candidates = scan_share_files(share_folders, '*.lotx')
+        else:
+            candidates = scan_share_files([lotx_folder], '*.lotx')
         all_files = []
-        for filename in os.listdir(lotx_folder):
-            if fnmatch.fnmatch(filename, '*.lotx'):
-                file_path = os.path.join(lotx_folder, filename)
-                mtime = os.path.getmtime(file_path)
-                
-                # Check if needs processing
-                if filename not in processed_files:
-                    all_files.append((filename, file_path, mtime))
-                else:
-                    # Check if file has been modified since last processing
-                    stored_mtime = conn.execute(
-                        "SELECT last_modified FROM processed_files WHERE filename=?",
-                        (filename,)
-                    ).fetchone()
-                    if stored_mtime and stored_mtime[0] < mtime:
-                        all_files.append((filename, file_path, mtime))
+        for filename, file_path, mtime, size in candidates:
+            # Needs processing when new or modified since last processing
+            stored_mtime = processed_files.get(filename)
+            if filename not in processed_files or (stored_mtime is not None and stored_mtime < mtime):
+                all_files.append((filename, file_path, mtime, size))
 
         with tqdm(total=len(all_files), desc="Processing files") as pbar:
             for i in range(0, len(all_files), batch_size):
@@ -128,9 +82,17 @@ def process_lotx_files():
                 all_records = []
                 file_metadata = []
 
+                if cache:
+                    reads = cache.read_many(batch_files)
+                else:
+                    reads = ((entry, None, None) for entry in batch_files)
+
                 try:
-                    for filename, file_path, mtime in batch_files:
-                        records = process_xml_file(file_path, conn)
+                    for (filename, file_path, mtime, size), data, error in reads:
+                        if error:
+                            print(f"Cannot read {filename} from share: {error}")
+                            continue
+                        records = process_xml_file(io.BytesIO(data) if data is not None else file_path, conn)
                         if records:
                             all_records.extend(records)
                             file_metadata.append((filename, mtime))
@@ -160,5 +122,9 @@ def process_lotx_files():
                     print(f"Error processing batch {i//batch_size}: {str(e)}")
                     # Consider adding retry logic here
 
+    if cache:
+        cache.close()
+        print(cache.report())
+
 if __name__ == "__main__":
-    process_lotx_files()
+    process_lotx_files(from_share='--from-share' in sys.argv, raw_cache='--raw-cache' in sys.argv)
@@ -1,8 +1,8 @@
+import io
 import os
+import sys
 import time
 import sqlite3
-import xml.etree.ElementTree as ET
-import pandas as pd
 import concurrent.futures
 import logging
 from datetime import datetime, timedelta
@@ -13,6 +13,14 @@ import threading
 import queue
 from functools import lru_cache
 
+# Shared X-ray helpers live one level up in Xray_data/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from file_fingerprint import ContentDeduper, ensure_fingerprint_table
+from ingest_metrics import IngestMetrics, ThreadProfiles
+from lotx_parser import read_lotx_rows
+from void_csv_loader import load_void_rows
+from void_schema import is_typed
+
 # Configuration
 CONFIG = {
     # Source paths
@@ -29,8 +37,11 @@ CONFIG = {
     'tracker_db': r'C:\Users\zbrzyy\Documents\Onsemi VN\XrayDatabase\file_tracker.db',
     
     # Processing parameters
-    'max_workers': 8,
-    'batch_size': 500,
+    'max_workers': 8,       # network read threads
+    'parse_workers': 4,     # parse threads (expat/pandas do the heavy lifting in C)
+    'queue_size': 64,       # max items waiting between two stages
+    'commit_rows': 50000,   # insert stage commits after this many rows (or when idle)
+    'metrics_file': os.path.join('Logs', f'ingest_metrics_{time.strftime("%Y%m%d")}.jsonl'),
     'hours_lookback': 60,  # Only process files modified in last 24 hours for first run
     'priority_hours': 60,   # Process files from last 2 hours first
     
@@ -56,6 +67,19 @@ logging.basicConfig(
 )
 logger = logging.getLogger()
 
+LOT_INFO_INSERT = '''INSERT OR REPLACE INTO Lot_info
+    (LotId, Recipe, AllowSizeNull, CountUniqueBarcodesOnly,
+     Size, CarrierIndex, TrayId, TrayState, TrayCode,
+     UnitId, UnitState, UnitCode, UnitIdx)
+    VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)'''
+VOID_RESULTS_COLUMNS = CONFIG['standard_header'] + ['source_filename']
+VOID_RESULTS_INSERT = (
+    f"INSERT OR IGNORE INTO Void_results ({','.join(VOID_RESULTS_COLUMNS)}) "
+    f"VALUES ({','.join(['?'] * len(VOID_RESULTS_COLUMNS))})"
+)
+# End-of-input marker passed between pipeline stages
+PIPELINE_STOP = object()
+
 
 class DatabaseManager:
     """Centralized database operations"""
@@ -75,6 +99,7 @@ class DatabaseManager:
                 file_size INTEGER,
                 status TEXT DEFAULT 'processed'
             )''')
+            ensure_fingerprint_table(conn)
             conn.commit()
         
         # Lot info database
@@ -100,32 +125,37 @@ class DatabaseManager:
                 processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 UNIQUE(BoardBarcode, ModuleIndex, JointType, Pin)
             )''')
+            # A migrated (typed) Void_results is a view, indexed on Void_results_data instead
+            if not is_typed(conn):
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_void_lot ON Void_results(Lot)")
             conn.commit()
     
-    def is_file_processed(self, file_path, file_type, current_mtime):
-        """Check if file needs processing"""
+    def load_tracker_index(self, file_type, since_mtime=0):
+        """Load {file_path: last_modified} for one file type in a single query"""
         with sqlite3.connect(CONFIG['tracker_db']) as conn:
-            cursor = conn.execute(
-                'SELECT last_modified FROM file_tracker WHERE file_path = ? AND file_type = ?',
-                (file_path, file_type)
-            )
-            result = cursor.fetchone()
-            return result and result[0] >= current_mtime
-    
-    def mark_file_processed(self, file_path, file_type, mtime, file_size):
-        """Mark file as processed"""
+            return dict(conn.execute(
+                'SELECT file_path, last_modified FROM file_tracker WHERE file_type = ? AND last_modified >= ?',
+                (file_type, since_mtime)
+            ))
+    
+    def mark_files_processed(self, file_infos, status='processed'):
+        """Mark many files as processed in one transaction"""
+        if not file_infos:
+            return
+        now = time.time()
         with sqlite3.connect(CONFIG['tracker_db']) as conn:
-            conn.execute('''INSERT OR REPLACE INTO file_tracker
-                (file_path, file_type, last_modified, processed_at, file_size)
-                VALUES (?, ?, ?, ?, ?)''',
-                (file_path, file_type, mtime, time.time(), file_size))
+            conn.executemany('''INSERT OR REPLACE INTO file_tracker
+                (file_path, file_type, last_modified, processed_at, file_size, status)
+                VALUES (?, ?, ?, ?, ?, ?)''',
+                [(f['path'], f['type'], f['mtime'], now, f['size'], status) for f in file_infos])
             conn.commit()
 
 class SmartFileScanner:
     """Intelligent file scanning with priority processing"""
     
-    def __init__(self, db_manager):
+    def __init__(self, db_manager, metrics):
         self.db_manager = db_manager
+        self.metrics = metrics
     
     def scan_files(self, source_dirs, file_pattern, file_type):
         """Scan files with smart prioritization"""
@@ -133,6 +163,14 @@ class SmartFileScanner:
         priority_cutoff = now - (CONFIG['priority_hours'] * 3600)
         lookback_cutoff = now - (CONFIG['hours_lookback'] * 3600)
         
+        if isinstance(file_pattern, str):
+            file_pattern = [file_pattern]
+        
+        # One query per scan instead of one connection per file
+        lookup_started = time.perf_counter()
+        processed = self.db_manager.load_tracker_index(file_type, lookback_cutoff)
+        self.metrics.record('lookup', time.perf_counter() - lookup_started, file_type, files=len(processed))
+        
         priority_files = []
         regular_files = []
         
@@ -144,44 +182,54 @@ class SmartFileScanner:
             logger.info(f"Scanning {source_dir} for {file_pattern}")
             
             try:
-                for filename in os.listdir(source_dir):
-                    if not any(fnmatch.fnmatch(filename, pattern) for pattern in file_pattern):
+                with self.metrics.timer('list', file_type) as sample:
+                    entries = list(os.scandir(source_dir))
+                    sample['files'] = len(entries)
+            except OSError:
+                logger.error(f"Cannot access directory: {source_dir}")
+                continue
+            
+            stat_seconds = 0.0
+            stat_calls = 0
+            for entry in entries:
+                if not any(fnmatch.fnmatch(entry.name, pattern) for pattern in file_pattern):
+                    continue
+                
+                file_path = entry.path
+                try:
+                    # Stat data comes with the directory listing on Windows
+                    stat_started = time.perf_counter()
+                    stat = entry.stat()
+                    stat_seconds += time.perf_counter() - stat_started
+                    stat_calls += 1
+                    mtime = stat.st_mtime
+                    
+                    # Skip very old files on first run
+                    if mtime < lookback_cutoff:
                         continue
                     
-                    file_path = os.path.join(source_dir, filename)
-                    try:
-                        stat = os.stat(file_path)
-                        mtime = stat.st_mtime
-                        
-                        # Skip very old files on first run
-                        if mtime < lookback_cutoff:
-                            continue
-                        
-                        # Skip if already processed
-                        if self.db_manager.is_file_processed(file_path, file_type, mtime):
-                            continue
-                        
-                        file_info = {
-                            'path': file_path,
-                            'mtime': mtime,
-                            'size': stat.st_size,
-                            'type': file_type
-                        }
-                        
-                        # Prioritize recent files
-                        if mtime > priority_cutoff:
-                            priority_files.append(file_info)
-                        else:
-                            regular_files.append(file_info)
-                            
-                    except OSError:
-                        logger.warning(f"Cannot access file: {file_path}")
+                    # Skip if already processed
+                    if processed.get(file_path, -1) >= mtime:
                         continue
+                    
+                    file_info = {
+                        'path': file_path,
+                        'mtime': mtime,
+                        'size': stat.st_size,
+                        'type': file_type
+                    }
+                    
+                    # Prioritize recent files
+                    if mtime > priority_cutoff:
+                        priority_files.append(file_info)
+                    else:
+                        regular_files.append(file_info)
                         
-            except OSError:
-                logger.error(f"Cannot access directory: {source_dir}")
-                continue
-        
+                except OSError:
+                    logger.warning(f"Cannot access file: {file_path}")
+                    continue
+            self.metrics.record('stat', stat_seconds, file_type, files=stat_calls)
+    
         # Sort by modification time (newest first)
         priority_files.sort(key=lambda x: x['mtime'], reverse=True)
         regular_files.sort(key=lambda x: x['mtime'], reverse=True)
@@ -194,210 +242,295 @@ class StreamProcessor:
     def __init__(self, db_manager):
         self.db_manager = db_manager
     
-    def process_lotx_file(self, file_info):
-        """Process single LOTX file"""
+    def read_file(self, file_info):
+        """Read a whole file in one pass (one network round-trip per file)"""
+        with open(file_info['path'], 'rb') as f:
+            return f.read()
+    
+    def process_lotx_file(self, file_info, data=None):
+        """Process single LOTX file (from its bytes when already read)"""
         try:
-            tree = ET.parse(file_info['path'])
-            root = tree.getroot()
-            
-            # Extract lot information
-            lot_attrs = {
-                'lot_id': root.attrib.get('Id'),
-                'recipe': root.attrib.get('Recipe'),
-                'allow_size_null': root.attrib.get('AllowSizeNull'),
-                'count_unique_barcodes_only': root.attrib.get('CountUniqueBarcodesOnly'),
-                'size': int(root.attrib.get('Size', 0)),
-                'carrier_index': int(root.attrib.get('CarrierIndex', 0))
-            }
-            
-            records = []
-            trays = root.find('Trays')
-            if trays is not None:
-                for tray in trays:
-                    tray_attrs = {
-                        'tray_id': tray.attrib.get('Id'),
-                        'tray_state': int(tray.attrib.get('State', 0)),
-                        'tray_code': tray.attrib.get('Code')
-                    }
-                    
-                    units = tray.find('Units')
-                    if units is not None:
-                        for unit in units:
-                            unit_attrs = {
-                                'unit_id': unit.attrib.get('Id'),
-                                'unit_state': int(unit.attrib.get('State', 0)),
-                                'unit_code': unit.attrib.get('Code'),
-                                'unit_idx': int(unit.attrib.get('Idx', 0))
-                            }
-                            
-                            record = (
-                                lot_attrs['lot_id'], lot_attrs['recipe'],
-                                lot_attrs['allow_size_null'], lot_attrs['count_unique_barcodes_only'],
-                                lot_attrs['size'], lot_attrs['carrier_index'],
-                                tray_attrs['tray_id'], tray_attrs['tray_state'], tray_attrs['tray_code'],
-                                unit_attrs['unit_id'], unit_attrs['unit_state'], unit_attrs['unit_code'], unit_attrs['unit_idx']
-                            )
-                            records.append(record)
-            
-            return records
+            return read_lotx_rows(io.BytesIO(data) if data is not None else file_info['path'])
             
         except Exception as e:
             logger.error(f"Error processing {file_info['path']}: {str(e)}")
             return []
     
-    def process_csv_file(self, file_info):
-        """Process single CSV file"""
+    def process_csv_file(self, file_info, data=None):
+        """Process single CSV file (from its bytes when already read)"""
         try:
-            df = pd.read_csv(file_info['path'], low_memory=False)
-            
-            if df.empty:
-                return []
-            
-            # Check for required columns
-            if not set(df.columns).intersection(set(CONFIG['standard_header'])):
-                logger.warning(f"No standard columns found in {file_info['path']}")
-                return []
-            
-            # Add missing columns and reorder
-            missing_cols = set(CONFIG['standard_header']) - set(df.columns)
-            for col in missing_cols:
-                df[col] = None
-            
-            df = df[CONFIG['standard_header']]
-            df = df.where(pd.notnull(df), None)
-            
-            # Add filename to each record
+            # Column-wise load of the standard columns, tagged with the filename
             filename = os.path.basename(file_info['path'])
-            records = []
-            for row in df.values:
-                record = tuple(row) + (filename,)
-                records.append(record)
-            
-            return records
+            return load_void_rows(data if data is not None else file_info['path'], filename) or []
             
         except Exception as e:
             logger.error(f"Error processing {file_info['path']}: {str(e)}")
             return []
 
+class PipelineStage:
+    """
+    Pool of worker threads between two bounded queues.
+    
+    handler(item) returns the items to pass downstream; finish() (optional)
+    runs once after the last input and may return final items. A full
+    outbox blocks the workers, so a slow stage throttles everything upstream.
+    """
+    
+    def __init__(self, name, handler, inbox, outbox=None, workers=1, finish=None, profiles=None):
+        self.name = name
+        self.handler = handler
+        self.finish = finish
+        self.inbox = inbox
+        self.outbox = outbox
+        self.workers = workers
+        self.profiles = profiles  # ThreadProfiles when the run is profiled
+        self.next_stage = None
+        self.processed = 0
+        self.emitted = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+        self._running = workers
+        self._started = None
+        self._threads = []
+    
+    def start(self):
+        self._started = time.time()
+        for i in range(self.workers):
+            target = self.profiles.wrap(self._work) if self.profiles is not None else self._work
+            thread = threading.Thread(target=target, name=f'{self.name}-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+    
+    def join(self, timeout=None):
+        for thread in self._threads:
+            thread.join(timeout)
+    
+    def is_running(self):
+        return any(thread.is_alive() for thread in self._threads)
+    
+    def _emit(self, items):
+        for item in items or ():
+            self.outbox.put(item)
+            self.emitted += 1
+    
+    def _work(self):
+        while True:
+            item = self.inbox.get()
+            if item is PIPELINE_STOP:
+                break
+            started = time.time()
+            try:
+                outputs = self.handler(item)
+                if self.outbox is not None:
+                    self._emit(outputs)
+            except Exception as e:
+                logger.error(f"{self.name} stage error: {str(e)}")
+                with self._lock:
+                    self.errors += 1
+            with self._lock:
+                self.processed += 1
+                self.busy_seconds += time.time() - started
+        
+        with self._lock:
+            self._running -= 1
+            last = self._running == 0
+        if last:
+            if self.finish is not None and self.outbox is not None:
+                self._emit(self.finish())
+            # Hand one stop marker to each downstream worker
+            if self.next_stage is not None:
+                for _ in range(self.next_stage.workers):
+                    self.outbox.put(PIPELINE_STOP)
+    
+    def snapshot(self):
+        """Queue depth and throughput counters of this stage"""
+        elapsed = time.time() - self._started if self._started else 0.0
+        return {
+            'stage': self.name,
+            'queued': self.inbox.qsize(),
+            'processed': self.processed,
+            'errors': self.errors,
+            'per_second': self.processed / elapsed if elapsed > 0 else 0.0,
+            'busy_seconds': round(self.busy_seconds, 2),
+        }
+
 class UnifiedPipeline:
     """Main pipeline orchestrator"""
     
-    def __init__(self):
+    def __init__(self, profile=False):
         self.db_manager = DatabaseManager()
-        self.file_scanner = SmartFileScanner(self.db_manager)
+        self.metrics = IngestMetrics('option1_combinefile')
+        self.profiles = ThreadProfiles() if profile else None
+        self.file_scanner = SmartFileScanner(self.db_manager, self.metrics)
         self.stream_processor = StreamProcessor(self.db_manager)
+        self.deduper = ContentDeduper()
         self.stats = {
             'lotx_processed': 0,
             'csv_processed': 0,
             'lotx_records': 0,
             'csv_records': 0,
+            'duplicates': 0,
             'errors': 0
         }
+        self.stats_lock = threading.Lock()
+        self.scanned = 0
+        self.marked = 0
+        self.marked_paths = set()
     
-    def process_lotx_batch(self, files):
-        """Process batch of LOTX files"""
-        all_records = []
-        processed_files = []
+    def skip_duplicates(self, files):
+        """Drop byte-identical copies of already ingested files before parsing"""
+        with sqlite3.connect(CONFIG['tracker_db']) as conn:
+            unique, duplicates = self.deduper.filter(conn, files, key=lambda f: (f['path'], f['size']))
         
-        for file_info in files:
-            records = self.stream_processor.process_lotx_file(file_info)
-            if records:
-                all_records.extend(records)
-                processed_files.append(file_info)
-                self.stats['lotx_records'] += len(records)
-            else:
+        for file_info, original in duplicates:
+            logger.debug(f"Duplicate of {original}: {file_info['path']}")
+        self.db_manager.mark_files_processed(
+            [f for f, original in duplicates if original != f['path']], status='duplicate')
+        self.db_manager.mark_files_processed(
+            [f for f, original in duplicates if original == f['path']], status='unchanged')
+        self.stats['duplicates'] += len(duplicates)
+        return unique
+    
+    # --- Stage handlers: scan -> read -> parse -> insert -> mark ---
+    
+    def scan_stage(self, job):
+        """Scan one source group and queue its new files (priority files first)"""
+        source_dirs, pattern, file_type = job
+        files = self.file_scanner.scan_files(source_dirs, pattern, file_type)
+        files = self.skip_duplicates(files)
+        self.scanned += len(files)
+        logger.info(f"Queued {len(files)} {file_type} files")
+        return files
+    
+    def read_stage(self, file_info):
+        """Pull the raw bytes from the network share"""
+        try:
+            with self.metrics.timer('read', file_info['type'], nbytes=file_info['size']):
+                data = self.stream_processor.read_file(file_info)
+            return [(file_info, data)]
+        except OSError as e:
+            logger.error(f"Error reading {file_info['path']}: {str(e)}")
+            with self.stats_lock:
                 self.stats['errors'] += 1
-        
-        # Bulk insert
-        if all_records:
-            with sqlite3.connect(CONFIG['lot_info_db']) as conn:
-                conn.executemany('''INSERT OR REPLACE INTO Lot_info
-                    (LotId, Recipe, AllowSizeNull, CountUniqueBarcodesOnly,
-                     Size, CarrierIndex, TrayId, TrayState, TrayCode,
-                     UnitId, UnitState, UnitCode, UnitIdx)
-                    VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)''', all_records)
-                conn.commit()
-        
-        # Mark files as processed
-        for file_info in processed_files:
-            self.db_manager.mark_file_processed(
-                file_info['path'], file_info['type'], file_info['mtime'], file_info['size']
-            )
-            self.stats['lotx_processed'] += 1
-    
-    def process_csv_batch(self, files):
-        """Process batch of CSV files"""
-        all_records = []
-        processed_files = []
-        
-        for file_info in files:
-            records = self.stream_processor.process_csv_file(file_info)
-            if records:
-                all_records.extend(records)
-                processed_files.append(file_info)
-                self.stats['csv_records'] += len(records)
+            return []
+    
+    def parse_stage(self, item):
+        """Parse file bytes into row tuples"""
+        file_info, data = item
+        with self.metrics.timer('parse', file_info['type'], nbytes=len(data)) as sample:
+            if file_info['type'] == 'lotx':
+                records = self.stream_processor.process_lotx_file(file_info, data)
             else:
+                records = self.stream_processor.process_csv_file(file_info, data)
+            sample['rows'] = len(records)
+        if not records:
+            with self.stats_lock:
                 self.stats['errors'] += 1
+            return []
+        return [(file_info, records)]
+    
+    def insert_stage(self, item):
+        """Insert rows on long-lived connections; pass files on once committed"""
+        file_info, records = item
+        with self.metrics.timer('insert', file_info['type'], rows=len(records)):
+            if file_info['type'] == 'lotx':
+                self.lot_conn.executemany(LOT_INFO_INSERT, records)
+                self.stats['lotx_records'] += len(records)
+            else:
+                self.void_conn.executemany(VOID_RESULTS_INSERT, records)
+                self.stats['csv_records'] += len(records)
+        self.uncommitted.append(file_info)
+        self.uncommitted_rows += len(records)
         
-        # Bulk insert
-        if all_records:
-            columns = CONFIG['standard_header'] + ['source_filename']
-            placeholders = ','.join(['?'] * len(columns))
-            with sqlite3.connect(CONFIG['void_results_db']) as conn:
-                conn.executemany(
-                    f"INSERT OR IGNORE INTO Void_results ({','.join(columns)}) VALUES ({placeholders})",
-                    all_records
-                )
-                conn.commit()
+        # Commit once enough is pending, or whenever the stage catches up
+        if self.uncommitted_rows >= CONFIG['commit_rows'] or self.insert_queue.empty():
+            return self.commit_inserts()
+        return []
+    
+    def commit_inserts(self):
+        """Commit both databases and release the committed files for marking"""
+        if not self.uncommitted:
+            return []
+        with self.metrics.timer('commit', files=len(self.uncommitted), rows=self.uncommitted_rows):
+            self.lot_conn.commit()
+            self.void_conn.commit()
+        committed, self.uncommitted, self.uncommitted_rows = self.uncommitted, [], 0
+        return [committed]
+    
+    def mark_stage(self, file_infos):
+        """Record a committed group of files as processed, in one transaction"""
+        with self.metrics.timer('mark', files=len(file_infos)):
+            self.db_manager.mark_files_processed(file_infos)
+        for file_info in file_infos:
+            self.stats[f"{file_info['type']}_processed"] += 1
+            self.marked_paths.add(file_info['path'])
+        self.marked += len(file_infos)
+        return []
+    
+    def build_stages(self):
+        """Wire the stages together with bounded queues"""
+        size = CONFIG['queue_size']
+        scan_queue = queue.Queue()
+        read_queue = queue.Queue(maxsize=size)
+        parse_queue = queue.Queue(maxsize=size)
+        self.insert_queue = queue.Queue(maxsize=size)
+        mark_queue = queue.Queue(maxsize=size)
         
-        # Mark files as processed
-        for file_info in processed_files:
-            self.db_manager.mark_file_processed(
-                file_info['path'], file_info['type'], file_info['mtime'], file_info['size']
-            )
-            self.stats['csv_processed'] += 1
+        profiles = self.profiles
+        stages = [
+            PipelineStage('scan', self.scan_stage, scan_queue, read_queue, profiles=profiles),
+            PipelineStage('read', self.read_stage, read_queue, parse_queue, workers=CONFIG['max_workers'],
+                          profiles=profiles),
+            PipelineStage('parse', self.parse_stage, parse_queue, self.insert_queue, workers=CONFIG['parse_workers'],
+                          profiles=profiles),
+            PipelineStage('insert', self.insert_stage, self.insert_queue, mark_queue, finish=self.commit_inserts,
+                          profiles=profiles),
+            PipelineStage('mark', self.mark_stage, mark_queue, profiles=profiles),
+        ]
+        for upstream, downstream in zip(stages, stages[1:]):
+            upstream.next_stage = downstream
+        
+        scan_queue.put((CONFIG['source_1'], '*.lotx', 'lotx'))
+        scan_queue.put((CONFIG['source_2'], CONFIG['csv_pattern'], 'csv'))
+        scan_queue.put(PIPELINE_STOP)
+        return stages
     
     def run_pipeline(self):
         """Execute the complete pipeline"""
         start_time = time.time()
         logger.info("Starting unified pipeline...")
         
-        # Phase 1: Process LOTX files
-        logger.info("Phase 1: Processing LOTX files...")
-        lotx_files = self.file_scanner.scan_files(CONFIG['source_1'], '*.lotx', 'lotx')
+        self.lot_conn = sqlite3.connect(CONFIG['lot_info_db'], timeout=60, check_same_thread=False)
+        self.void_conn = sqlite3.connect(CONFIG['void_results_db'], timeout=60, check_same_thread=False)
+        self.uncommitted, self.uncommitted_rows = [], 0
+        
+        stages = self.build_stages()
+        for stage in stages:
+            stage.start()
         
-        if lotx_files:
-            with tqdm(total=len(lotx_files), desc="Processing LOTX files") as pbar:
-                for i in range(0, len(lotx_files), CONFIG['batch_size']):
-                    batch = lotx_files[i:i+CONFIG['batch_size']]
-                    try:
-                        self.process_lotx_batch(batch)
-                        pbar.update(len(batch))
-                    except Exception as e:
-                        logger.error(f"Error processing LOTX batch: {str(e)}")
-                        self.stats['errors'] += len(batch)
-                        pbar.update(len(batch))
+        # Follow the mark stage; queue depths show where the pipeline is waiting
+        with tqdm(total=0, desc="Processing files") as pbar:
+            while stages[-1].is_running():
+                stages[-1].join(timeout=0.5)
+                pbar.total = self.scanned
+                pbar.n = self.marked + self.stats['errors']
+                pbar.set_postfix({stage.name: stage.inbox.qsize() for stage in stages[1:]}, refresh=True)
         
-        # Phase 2: Process CSV files
-        logger.info("Phase 2: Processing CSV files...")
-        csv_files = self.file_scanner.scan_files(CONFIG['source_2'], CONFIG['csv_pattern'], 'csv')
+        for stage in stages:
+            stage.join()
+        self.lot_conn.close()
+        self.void_conn.close()
         
-        if csv_files:
-            with tqdm(total=len(csv_files), desc="Processing CSV files") as pbar:
-                for i in range(0, len(csv_files), CONFIG['batch_size']):
-                    batch = csv_files[i:i+CONFIG['batch_size']]
-                    try:
-                        self.process_csv_batch(batch)
-                        pbar.update(len(batch))
-                    except Exception as e:
-                        logger.error(f"Error processing CSV batch: {str(e)}")
-                        self.stats['errors'] += len(batch)
-                        pbar.update(len(batch))
+        # Remember the content of the files ingested in this run (failed ones are retried next run)
+        with sqlite3.connect(CONFIG['tracker_db']) as conn:
+            self.deduper.commit(conn, self.marked_paths)
         
         # Report results
         duration = time.time() - start_time
         logger.info(f"Pipeline completed in {duration:.2f} seconds")
         logger.info(f"Statistics: {self.stats}")
+        logger.info(self.deduper.report())
         
         print(f"\n=== Pipeline Summary ===")
         print(f"Duration: {duration:.2f} seconds")
@@ -405,12 +538,26 @@ class UnifiedPipeline:
         print(f"CSV files processed: {self.stats['csv_processed']}")
         print(f"LOTX records: {self.stats['lotx_records']}")
         print(f"CSV records: {self.stats['csv_records']}")
+        print(f"Duplicates skipped: {self.stats['duplicates']}")
         print(f"Errors: {self.stats['errors']}")
+        print(f"\n=== Stage Throughput ===")
+        for stage in stages:
+            snap = stage.snapshot()
+            logger.info(f"Stage {snap}")
+            print(f"{snap['stage']:<7} {snap['processed']:>7} items  {snap['per_second']:>8.1f}/s  "
+                  f"busy {snap['busy_seconds']:>7.2f}s  errors {snap['errors']}")
+        
+        print(f"\n=== Ingest Metrics ===")
+        print(self.metrics.report())
+        self.metrics.write_jsonl(CONFIG['metrics_file'])
+        if self.profiles is not None:
+            self.profiles.dump('option1_combinefile', 'Logs')
 
 def main():
     """Main execution function"""
     try:
-        pipeline = UnifiedPipeline()
+        # --profile: cProfile every stage thread, merged into Logs/profile_*.prof
+        pipeline = UnifiedPipeline(profile='--profile' in sys.argv)
         pipeline.run_pipeline()
     except KeyboardInterrupt:
         logger.info("Pipeline interrupted by user")
@@ -3,11 +3,21 @@ import sys
 import time
 import sqlite3
 import xml.etree.ElementTree as ET
-import pandas as pd
 import concurrent.futures
 import logging
+import queue
+import threading
 from tqdm import tqdm
-from pandas.errors import EmptyDataError
+
+# Shared X-ray helpers live one level up in Xray_data/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dir_scanner import SnapshotScanner, ensure_snapshot_table, filter_processed
+from file_fingerprint import ContentDeduper, ensure_fingerprint_table
+from file_watcher import DirectoryWatcher
+from ingest_metrics import IngestMetrics, profile_run
+from lotx_parser import read_lotx_rows
+from void_csv_loader import load_void_rows
+from void_schema import TypedVoidInserter, is_typed, migrate_database, VOID_TABLE, VOID_DATA_TABLE
 
 # --- UNIFIED CONFIGURATION ---
 # Source directories on the network
@@ -21,12 +31,53 @@ LOG_FILE = f'pipeline_log_{time.strftime("%Y%m%d")}.log'
 # Processing parameters
 BATCH_SIZE_LOTX = 100
 BATCH_SIZE_CSV = 5000
+# Number of parse worker processes (override with --workers N)
+PARSE_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+PARSE_CHUNKSIZE = 16  # files handed to a worker per round-trip
+# Writer transaction grouping: commit after this many rows or milliseconds
+WRITER_COMMIT_ROWS = 50000
+WRITER_COMMIT_MS = 2000
+WRITER_QUEUE_SIZE = 64  # max pending batches before producers block
+# --watch: batches up to this many files are parsed in-process (no pool start-up cost)
+WATCH_INLINE_FILES = 8
 CSV_STANDARD_HEADER = [
     'BoardBarcode', 'ModuleIndex', 'JointType', 'Pin', 'TotalVoidRatio', 
     'LargestVoidRatio', 'SpreadX', 'SpreadY', 'GVMean', 'DefectCode', 
     'SystemDefect', 'PinStatus', 'Lot', 'ModuleStatus', 'DeviceStatus'
 ]
 
+LOT_INFO_COLUMNS = [
+    'LotId', 'Recipe', 'AllowSizeNull', 'CountUniqueBarcodesOnly', 'Size', 'CarrierIndex', 'TrayId',
+    'TrayState', 'TrayCode', 'UnitId', 'UnitState', 'UnitCode', 'UnitIdx', 'source_filename'
+]
+VOID_RESULTS_COLUMNS = CSV_STANDARD_HEADER + ['source_filename']
+
+LOT_INFO_QUERY = f"INSERT OR IGNORE INTO Lot_info VALUES ({','.join(['?']*14)})"
+VOID_RESULTS_QUERY = f"INSERT OR IGNORE INTO Void_results VALUES ({','.join(['?']*(len(CSV_STANDARD_HEADER)+1))})"
+PROCESSED_FILES_QUERY = "INSERT OR REPLACE INTO processed_files (filepath, mtime, size, status) VALUES (?, ?, ?, ?)"
+
+# --migrate --bulk: rows are appended to constraint-free staging tables in a
+# separate, unjournaled file, then merged with one sorted, set-based
+# statement per table; secondary indexes are rebuilt once at the end
+BULK_CACHE_KIB = 512 * 1024
+BULK_FETCH_ROWS = 50000
+BULK_TABLES = {
+    'Lot_info': (LOT_INFO_COLUMNS, ('LotId', 'TrayId', 'UnitIdx')),
+    'Void_results': (VOID_RESULTS_COLUMNS, ('BoardBarcode', 'ModuleIndex', 'JointType', 'Pin')),
+}
+STAGING_QUERIES = {
+    LOT_INFO_QUERY: f"INSERT INTO staging.Lot_info VALUES ({','.join(['?']*len(LOT_INFO_COLUMNS))})",
+    VOID_RESULTS_QUERY: f"INSERT INTO staging.Void_results VALUES ({','.join(['?']*len(VOID_RESULTS_COLUMNS))})",
+}
+STAGING_PROCESSED_FILES_QUERY = "INSERT INTO staging.processed_files VALUES (?, ?, ?, ?)"
+
+# file_type -> (insert query, rows per flush)
+PIPELINES = {
+    'lotx': (LOT_INFO_QUERY, BATCH_SIZE_LOTX),
+    'csv': (VOID_RESULTS_QUERY, BATCH_SIZE_CSV),
+}
+QUERY_FILE_TYPES = {query: file_type for file_type, (query, _) in PIPELINES.items()}
+
 # --- LOGGING SETUP ---
 logging.basicConfig(
     filename=LOG_FILE,
@@ -59,6 +110,9 @@ def setup_database():
             source_filename TEXT,
             UNIQUE(BoardBarcode, ModuleIndex, JointType, Pin)
         )""")
+        # Lot lookups (GUI_APP/lot_lookup.py) join on this index; the typed layout has its own
+        if not is_typed(conn):
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_void_lot ON Void_results(Lot)")
         
         # Unified table to track all processed files
         conn.execute("""
@@ -69,139 +123,382 @@ def setup_database():
             status TEXT NOT NULL, -- e.g., 'SUCCESS', 'ERROR'
             processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )""")
+
+        # Per-directory scan snapshots for incremental scanning
+        ensure_snapshot_table(conn)
+        # Content fingerprints of ingested files, to skip byte-identical copies
+        ensure_fingerprint_table(conn)
         conn.commit()
     logger.info("Database setup complete.")
 
 # --- FILE SCANNING ---
-def get_files_to_process(conn, source_dirs, extension):
-    """Scans source directories and identifies new or modified files."""
-    files_to_process = []
-    processed_files = {row[0]: (row[1], row[2]) for row in conn.execute("SELECT filepath, mtime, size FROM processed_files").fetchall()}
-    
-    for src_dir in source_dirs:
-        if not os.path.exists(src_dir):
-            logger.warning(f"Source directory not found: {src_dir}")
-            continue
-        
-        for filename in os.listdir(src_dir):
-            if filename.endswith(extension):
-                file_path = os.path.join(src_dir, filename)
-                try:
-                    stat = os.stat(file_path)
-                    mtime = stat.st_mtime
-                    size = stat.st_size
-                    
-                    if file_path not in processed_files or processed_files[file_path] != (mtime, size):
-                        files_to_process.append((file_path, mtime, size))
-                except FileNotFoundError:
-                    logger.warning(f"File not found during scan: {file_path}")
-                    continue
-    return files_to_process
+def get_files_to_process(conn, scanner):
+    """Scans the LOTX and CSV source directories for new or modified files."""
+    lotx_files = scanner.scan(conn, SOURCE_LOT_INFO_DIRS, '.lotx')
+    csv_files = scanner.scan(conn, SOURCE_VOID_RESULTS_DIRS, '.csv')
+    return lotx_files, csv_files
+
+def skip_duplicates(conn, deduper, lotx_files, csv_files):
+    """
+    Drops files whose content was already ingested (e.g. the same export on both
+    X-ray machines, or a re-export with a new mtime). Returns the remaining lists
+    plus processed_files rows for the skipped files: 'DUPLICATE' for copies of
+    another file, 'UNCHANGED' for files whose own content is already ingested.
+    """
+    lotx_files, lotx_dups = deduper.filter(conn, lotx_files)
+    csv_files, csv_dups = deduper.filter(conn, csv_files)
+    duplicates = [
+        item + ('UNCHANGED' if original == item[0] else 'DUPLICATE',)
+        for item, original in lotx_dups + csv_dups
+    ]
+    if duplicates:
+        print(f"Skipping {len(lotx_dups)} duplicate .lotx and {len(csv_dups)} duplicate .csv files.")
+    logger.info(deduper.report())
+    return lotx_files, csv_files, duplicates
 
 # --- LOTX (.xml) PROCESSING LOGIC ---
 def process_lotx_file(file_path):
     """Parses a single .lotx XML file and returns a list of records."""
     try:
-        tree = ET.parse(file_path)
-        root = tree.getroot()
-        
-        lot_attrs = {
-            'lot_id': root.attrib.get('Id'), 'recipe': root.attrib.get('Recipe'),
-            'allow_size_null': root.attrib.get('AllowSizeNull'),
-            'count_unique_barcodes_only': root.attrib.get('CountUniqueBarcodesOnly'),
-            'size': int(root.attrib.get('Size', 0)), 'carrier_index': int(root.attrib.get('CarrierIndex', 0))
-        }
-        
-        batch = []
-        trays = root.find('Trays') or []
-        for tray in trays:
-            tray_attrs = {'tray_id': tray.attrib.get('Id'), 'tray_state': int(tray.attrib.get('State', 0)), 'tray_code': tray.attrib.get('Code')}
-            units = tray.find('Units') or []
-            for unit in units:
-                unit_attrs = {'unit_id': unit.attrib.get('Id'), 'unit_state': int(unit.attrib.get('State', 0)), 'unit_code': unit.attrib.get('Code'), 'unit_idx': int(unit.attrib.get('Idx', 0))}
-                record = (
-                    lot_attrs['lot_id'], lot_attrs['recipe'], lot_attrs['allow_size_null'], lot_attrs['count_unique_barcodes_only'],
-                    lot_attrs['size'], lot_attrs['carrier_index'], tray_attrs['tray_id'], tray_attrs['tray_state'], tray_attrs['tray_code'],
-                    unit_attrs['unit_id'], unit_attrs['unit_state'], unit_attrs['unit_code'], unit_attrs['unit_idx']
-                )
-                batch.append(record)
-        return batch
+        return read_lotx_rows(file_path)
     except ET.ParseError as e:
         logger.error(f"XML Parse Error in {os.path.basename(file_path)}: {e}")
         return None
 
 # --- CSV PROCESSING LOGIC ---
 def process_csv_file(file_path):
-    """Parses a single .csv file and returns a pandas DataFrame."""
+    """Parses a single .csv file and returns Void_results row tuples (with source_filename)."""
     try:
-        df = pd.read_csv(file_path, low_memory=False)
-        if df.empty:
+        rows = load_void_rows(file_path, os.path.basename(file_path))
+        if rows is None:
             logger.info(f"Skipping empty file: {os.path.basename(file_path)}")
-            return None
-        
-        missing_cols = set(CSV_STANDARD_HEADER) - set(df.columns)
-        for col in missing_cols:
-            df[col] = None
-        df = df[CSV_STANDARD_HEADER]
-        df = df.where(pd.notnull(df), None)
-        return df
-    except EmptyDataError:
-        logger.info(f"Skipping empty file with EmptyDataError: {os.path.basename(file_path)}")
-        return None
+        return rows
     except Exception as e:
         logger.error(f"Error processing CSV {os.path.basename(file_path)}: {e}")
         return None
 
+# --- DATABASE WRITER ---
+class SQLiteWriter(threading.Thread):
+    """
+    Dedicated writer thread that owns the only SQLite connection used for inserts.
+    Producers put (insert_query, rows, processed_files) messages on a bounded queue;
+    several messages are grouped into one transaction, committed once
+    commit_rows rows are pending or commit_ms milliseconds have passed.
+    With an IngestMetrics, inserts, processed_files updates and commits are
+    recorded as the insert/mark/commit stages. Paths committed with status
+    SUCCESS are collected in succeeded (for ContentDeduper.commit).
+    """
+
+    def __init__(self, db_path, commit_rows=WRITER_COMMIT_ROWS, commit_ms=WRITER_COMMIT_MS, queue_size=WRITER_QUEUE_SIZE,
+                 staging_path=None, metrics=None):
+        super().__init__(name='sqlite-writer', daemon=True)
+        self.db_path = db_path
+        self.staging_path = staging_path  # bulk load: write to the staging tables (create_staging)
+        self.metrics = metrics
+        self.commit_rows = commit_rows
+        self.commit_ms = commit_ms
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.error = None
+        self.stats = {'rows': 0, 'files': 0, 'commits': 0, 'seconds': 0.0}
+        self.succeeded = set()
+        self._txn_succeeded = []
+
+    def put(self, insert_query, rows, processed_files=()):
+        """Queues a batch for writing; blocks while the queue is full."""
+        self.queue.put((insert_query, rows, processed_files))
+
+    def flush(self):
+        """Blocks until everything queued so far is committed."""
+        done = threading.Event()
+        self.queue.put(done)
+        done.wait()
+        if self.error is not None:
+            raise self.error
+
+    def close(self):
+        """Flushes everything still queued, commits and stops the thread."""
+        self.queue.put(None)
+        self.join()
+        if self.error is not None:
+            raise self.error
+
+    def rows_per_second(self):
+        seconds = self.stats['seconds']
+        return self.stats['rows'] / seconds if seconds > 0 else 0.0
+
+    def run(self):
+        conn = sqlite3.connect(self.db_path, timeout=60)
+        encoders = {}
+        queries = {}
+        processed_query = PROCESSED_FILES_QUERY
+        if self.staging_path:
+            conn.execute("ATTACH DATABASE ? AS staging", (self.staging_path,))
+            conn.execute("PRAGMA synchronous = OFF;")
+            conn.execute("PRAGMA staging.journal_mode = OFF;")
+            conn.execute(f"PRAGMA staging.cache_size = -{BULK_CACHE_KIB};")
+            queries = STAGING_QUERIES
+            processed_query = STAGING_PROCESSED_FILES_QUERY
+        else:
+            conn.execute("PRAGMA synchronous = NORMAL;")
+            # With the typed schema, Void_results rows skip the view trigger and are encoded here
+            if is_typed(conn):
+                encoders[VOID_RESULTS_QUERY] = TypedVoidInserter(VOID_RESULTS_COLUMNS)
+        started = time.time()
+        pending_rows = 0
+        txn_started = None
+        try:
+            while True:
+                timeout = None
+                if txn_started is not None:
+                    timeout = max(0.0, self.commit_ms / 1000 - (time.time() - txn_started))
+                try:
+                    message = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    message = ()  # commit interval elapsed
+
+                if isinstance(message, threading.Event):
+                    if txn_started is not None and self.error is None:
+                        self._commit(conn, pending_rows)
+                        pending_rows, txn_started = 0, None
+                    message.set()
+                    continue
+
+                if message is None or not message:
+                    if txn_started is not None:
+                        self._commit(conn, pending_rows)
+                        pending_rows, txn_started = 0, None
+                    if message is None:
+                        break
+                    continue
+
+                if self.error is not None:
+                    continue  # drain so producers never block on a dead writer
+
+                insert_query, rows, processed_files = message
+                try:
+                    if txn_started is None:
+                        txn_started = time.time()
+                    if rows:
+                        insert_started = time.perf_counter()
+                        encoder = encoders.get(insert_query)
+                        if encoder is not None:
+                            encoder.insert(conn, rows)
+                        else:
+                            conn.executemany(queries.get(insert_query, insert_query), rows)
+                        self._record('insert', insert_started, QUERY_FILE_TYPES.get(insert_query), rows=len(rows))
+                    if processed_files:
+                        mark_started = time.perf_counter()
+                        conn.executemany(processed_query, processed_files)
+                        self._txn_succeeded.extend(f[0] for f in processed_files if f[3] == 'SUCCESS')
+                        self._record('mark', mark_started, QUERY_FILE_TYPES.get(insert_query), files=len(processed_files))
+                    pending_rows += len(rows)
+                    self.stats['rows'] += len(rows)
+                    self.stats['files'] += len(processed_files)
+                    if pending_rows >= self.commit_rows:
+                        self._commit(conn, pending_rows)
+                        pending_rows, txn_started = 0, None
+                except Exception as e:
+                    logger.error(f"Writer failed, discarding remaining batches: {e}")
+                    conn.rollback()
+                    self._txn_succeeded = []
+                    self.error = e
+                    pending_rows, txn_started = 0, None
+        finally:
+            conn.close()
+            self.stats['seconds'] = time.time() - started
+
+    def _record(self, stage, started, file_type=None, files=0, rows=0):
+        if self.metrics is not None:
+            self.metrics.record(stage, time.perf_counter() - started, file_type, files=files, rows=rows)
+
+    def _commit(self, conn, pending_rows=0):
+        commit_started = time.perf_counter()
+        conn.commit()
+        self.succeeded.update(self._txn_succeeded)
+        self._txn_succeeded = []
+        self.stats['commits'] += 1
+        self._record('commit', commit_started, rows=pending_rows)
+
+# --- PARSE WORKER ---
+def parse_file(task):
+    """
+    Worker entry point. Parses one file and returns a compact row batch
+    (file_type, processed_files metadata, rows, parse seconds) for the single DB writer.
+    """
+    file_type, file_path, mtime, size = task
+    filename = os.path.basename(file_path)
+    started = time.perf_counter()
+    rows = []
+    try:
+        if file_type == 'lotx':
+            records = process_lotx_file(file_path)
+            if records:
+                rows = [r + (filename,) for r in records]
+        else:
+            rows = process_csv_file(file_path) or []
+        status = 'SUCCESS' if rows else 'ERROR_EMPTY'
+    except Exception as e:
+        logger.error(f"Failed to process {filename}: {e}")
+        rows, status = [], 'ERROR_PROCESS'
+    return file_type, (file_path, mtime, size, status), rows, time.perf_counter() - started
+
 # --- MAIN ORCHESTRATOR ---
-def run_pipeline(files, process_func, insert_query, batch_size, desc):
-    """Generic function to run a processing pipeline for a list of files."""
-    all_records = []
-    processed_metadata = []
-    
-    with tqdm(total=len(files), desc=desc) as pbar:
-        for file_path, mtime, size in files:
-            try:
-                records = process_func(file_path)
-                filename = os.path.basename(file_path)
-                if records is not None and not records.empty if isinstance(records, pd.DataFrame) else records:
-                    if isinstance(records, pd.DataFrame):
-                        records['source_filename'] = filename
-                        all_records.extend(records.to_records(index=False).tolist())
-                    else:
-                        # Add filename to each record tuple
-                        all_records.extend([r + (filename,) for r in records])
-                    processed_metadata.append((file_path, mtime, size, 'SUCCESS'))
-                else:
-                    # Mark as error if processing returns None or empty
-                    processed_metadata.append((file_path, mtime, size, 'ERROR_EMPTY'))
-
-            except Exception as e:
-                logger.error(f"Failed to process {os.path.basename(file_path)}: {e}")
-                processed_metadata.append((file_path, mtime, size, 'ERROR_PROCESS'))
-            
-            pbar.update(1)
-
-            # Insert in batches
-            if len(all_records) >= batch_size:
-                with sqlite3.connect(DB_PATH) as conn:
-                    conn.executemany(insert_query, all_records)
-                    conn.executemany("INSERT OR REPLACE INTO processed_files (filepath, mtime, size, status) VALUES (?, ?, ?, ?)", processed_metadata)
-                    conn.commit()
-                all_records.clear()
-                processed_metadata.clear()
-
-    # Insert any remaining records
-    if all_records:
-        with sqlite3.connect(DB_PATH) as conn:
-            conn.executemany(insert_query, all_records)
-            conn.executemany("INSERT OR REPLACE INTO processed_files (filepath, mtime, size, status) VALUES (?, ?, ?, ?)", processed_metadata)
-            conn.commit()
+def run_pipeline(lotx_files, csv_files, desc, writer, workers=PARSE_WORKERS, metrics=None):
+    """
+    Parses LOTX and CSV files on a process pool and hands the returned
+    row batches to the single SQLiteWriter. Per-file parse times (measured
+    in the workers) are recorded in metrics as the parse stage.
+    """
+    tasks = [('lotx',) + f for f in lotx_files] + [('csv',) + f for f in csv_files]
+    if not tasks:
+        return
+
+    pending = {file_type: ([], []) for file_type in PIPELINES}
+    start_time = time.time()
+
+    def flush(file_type):
+        records, metadata = pending[file_type]
+        if records or metadata:
+            writer.put(PIPELINES[file_type][0], records, metadata)
+            pending[file_type] = ([], [])
+
+    with tqdm(total=len(tasks), desc=desc) as pbar:
+        if workers > 1:
+            pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+            results = pool.map(parse_file, tasks, chunksize=PARSE_CHUNKSIZE)
+        else:
+            pool = None
+            results = map(parse_file, tasks)
+
+        try:
+            for file_type, meta, rows, parse_seconds in results:
+                if metrics is not None:
+                    metrics.record('parse', parse_seconds, file_type, files=1, rows=len(rows), nbytes=meta[2])
+                records, metadata = pending[file_type]
+                records.extend(rows)
+                metadata.append(meta)
+                pbar.update(1)
+
+                # Hand off in batches
+                if len(records) >= PIPELINES[file_type][1]:
+                    flush(file_type)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        # Hand off any remaining records
+        for file_type in PIPELINES:
+            flush(file_type)
+
+    duration = time.time() - start_time
+    rate = len(tasks) / duration if duration > 0 else 0.0
+    print(f"{desc}: parsed {len(tasks)} files with {workers} worker(s) at {rate:.1f} files/s")
+    logger.info(f"{desc}: {len(tasks)} files, {workers} worker(s), {rate:.1f} files/s")
+
+
+def report_writer(writer):
+    """Prints and logs the throughput sustained by the writer thread."""
+    stats = writer.stats
+    msg = (f"Writer: {stats['rows']} rows, {stats['files']} files, {stats['commits']} commits "
+           f"in {stats['seconds']:.2f}s ({writer.rows_per_second():.0f} rows/s)")
+    print(msg)
+    logger.info(msg)
+
+
+def save_metrics(metrics):
+    """Prints the per-stage summary and appends it to the ingest_metrics table of DB_PATH."""
+    report = metrics.report()
+    print(report)
+    logger.info(f"Ingest metrics:\n{report}")
+    with sqlite3.connect(DB_PATH, timeout=60) as conn:
+        metrics.write_table(conn)
+
+# --- BULK LOAD ---
+def create_staging(db_path):
+    """Creates an empty staging database (no constraints, no indexes, no journal) next to db_path."""
+    staging_path = db_path + '.staging'
+    if os.path.exists(staging_path):
+        os.remove(staging_path)  # left over from an interrupted bulk load
+    conn = sqlite3.connect(staging_path)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF;")
+        for table, (columns, _) in BULK_TABLES.items():
+            conn.execute(f"CREATE TABLE {table} ({', '.join(columns)})")
+        conn.execute("CREATE TABLE processed_files (filepath, mtime, size, status)")
+        conn.commit()
+    finally:
+        conn.close()
+    return staging_path
+
+def finalize_bulk_load(db_path, staging_path):
+    """
+    Merges the staged rows into the real tables in one transaction:
+    secondary indexes are dropped, each table is filled by a single
+    INSERT OR IGNORE ... SELECT ordered by its UNIQUE key (so the unique
+    index is appended to in order instead of probed at random, and the
+    first staged copy of a key wins, as with row-by-row inserts), then the
+    indexes are rebuilt once. processed_files is copied in the same
+    transaction. Returns (rows staged, rows added, seconds).
+    """
+    start_time = time.time()
+    conn = sqlite3.connect(db_path, timeout=60)
+    staged = added = 0
+    try:
+        conn.execute(f"PRAGMA cache_size = -{BULK_CACHE_KIB};")
+        conn.execute("ATTACH DATABASE ? AS staging", (staging_path,))
+        typed = is_typed(conn)
+        conn.execute("BEGIN")
+        for table, (columns, key) in BULK_TABLES.items():
+            count = conn.execute(f"SELECT COUNT(*) FROM staging.{table}").fetchone()[0]
+            if not count:
+                continue
+            index_table = VOID_DATA_TABLE if typed and table == VOID_TABLE else table
+            indexes = conn.execute(
+                "SELECT name, sql FROM main.sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+                (index_table,)
+            ).fetchall()
+            for name, _ in indexes:
+                conn.execute(f"DROP INDEX main.{name}")
+
+            before = conn.execute(f"SELECT COUNT(*) FROM main.{index_table}").fetchone()[0]
+            col_list = ', '.join(columns)
+            select = f"SELECT {col_list} FROM staging.{table} ORDER BY {', '.join(key)}, rowid"
+            if index_table != table:
+                # Typed layout: encode in sorted chunks instead of one view-trigger call per row
+                encoder = TypedVoidInserter(columns)
+                cursor = conn.cursor().execute(select)
+                while True:
+                    rows = cursor.fetchmany(BULK_FETCH_ROWS)
+                    if not rows:
+                        break
+                    encoder.insert(conn, rows)
+            else:
+                conn.execute(f"INSERT OR IGNORE INTO main.{table} ({col_list}) {select}")
+            added += conn.execute(f"SELECT COUNT(*) FROM main.{index_table}").fetchone()[0] - before
+            staged += count
+
+            for _, sql in indexes:
+                conn.execute(sql)
+        conn.execute(
+            "INSERT OR REPLACE INTO main.processed_files (filepath, mtime, size, status) "
+            "SELECT filepath, mtime, size, status FROM staging.processed_files ORDER BY rowid"
+        )
+        conn.commit()
+        conn.execute("DETACH DATABASE staging")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    os.remove(staging_path)
+    return staged, added, time.time() - start_time
 
 # --- MIGRATION OF OLD DATA ---
-def migrate_old_data():
+def migrate_old_data(workers=PARSE_WORKERS, bulk=False):
     """
     One-time migration function to process files from the old local folders
     and populate the new unified database. This ensures historical data is not lost.
+    bulk=True stages all rows first and merges them at the end (finalize_bulk_load).
     """
     print("Starting one-time migration of existing local data...")
     logger.info("===== Starting Migration =====")
@@ -210,28 +507,133 @@ def migrate_old_data():
     OLD_CSV_FOLDER = r'C:\Users\zbrzyy\Documents\Onsemi VN\XrayDatabase\Void_results'
 
     # Use the same file scanning logic, but on local folders
+    metrics = IngestMetrics('unified_pipeline --migrate' + (' --bulk' if bulk else ''))
+    scanner = SnapshotScanner(metrics=metrics)
+    deduper = ContentDeduper()
     with sqlite3.connect(DB_PATH) as conn:
-        lotx_files = get_files_to_process(conn, [OLD_LOTX_FOLDER], '.lotx')
-        csv_files = get_files_to_process(conn, [OLD_CSV_FOLDER], '.csv')
+        lotx_files = scanner.scan(conn, [OLD_LOTX_FOLDER], '.lotx')
+        csv_files = scanner.scan(conn, [OLD_CSV_FOLDER], '.csv')
+        lotx_files, csv_files, duplicates = skip_duplicates(conn, deduper, lotx_files, csv_files)
 
-    if not lotx_files and not csv_files:
+    if not lotx_files and not csv_files and not duplicates:
         print("Migration check complete. No new local files found to migrate.")
         logger.info("Migration check complete. No new local files found.")
         return
 
     print(f"Found {len(lotx_files)} local .lotx files and {len(csv_files)} local .csv files to migrate.")
-    
-    lot_info_query = f"INSERT OR IGNORE INTO Lot_info VALUES ({','.join(['?']*14)})"
-    void_results_query = f"INSERT OR IGNORE INTO Void_results VALUES ({','.join(['?']*(len(CSV_STANDARD_HEADER)+1))})"
 
     # Run migration
-    run_pipeline(lotx_files, process_lotx_file, lot_info_query, BATCH_SIZE_LOTX, "Migrating LOTX")
-    run_pipeline(csv_files, process_csv_file, void_results_query, BATCH_SIZE_CSV, "Migrating CSV")
+    start_time = time.time()
+    staging_path = create_staging(DB_PATH) if bulk else None
+    writer = SQLiteWriter(DB_PATH, staging_path=staging_path, metrics=metrics)
+    writer.start()
+    try:
+        if duplicates:
+            writer.put(None, [], duplicates)
+        run_pipeline(lotx_files, csv_files, "Migrating", writer, workers, metrics)
+    finally:
+        writer.close()
+        report_writer(writer)
+
+    if bulk:
+        print("Merging staged rows...")
+        staged, added, seconds = finalize_bulk_load(DB_PATH, staging_path)
+        metrics.record('merge', seconds, rows=staged)
+        msg = f"Bulk merge: {staged} staged rows, {added} new after de-duplication, indexed in {seconds:.2f}s"
+        print(msg)
+        logger.info(msg)
+    duration = time.time() - start_time
+    rows = writer.stats['rows']
+    msg = (f"Migration throughput: {rows} rows in {duration:.2f}s "
+           f"({rows / duration if duration > 0 else 0:.0f} rows/s, {'bulk' if bulk else 'row-by-row'} load)")
+    print(msg)
+    logger.info(msg)
+
+    with sqlite3.connect(DB_PATH) as conn:
+        scanner.commit(conn)
+        deduper.commit(conn, writer.succeeded)
+    save_metrics(metrics)
     
     print("Data migration complete.")
     logger.info("===== Migration Finished =====")
 
 
+# --- WATCH MODE ---
+def stat_files(paths):
+    """Returns (file_path, mtime, size) for the paths that still exist."""
+    files = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        files.append((path, stat.st_mtime, stat.st_size))
+    return files
+
+
+def watch(workers=PARSE_WORKERS):
+    """
+    Keeps running and ingests files shortly after they are written. Changes
+    come from filesystem notifications (watchdog) or adaptive polling with
+    incremental scans; every batch is committed before the next wait.
+    """
+    watcher = DirectoryWatcher({'.lotx': SOURCE_LOT_INFO_DIRS, '.csv': SOURCE_VOID_RESULTS_DIRS})
+    metrics = IngestMetrics('unified_pipeline --watch')
+    scanner = SnapshotScanner(metrics=metrics)
+    deduper = ContentDeduper()
+    writer = SQLiteWriter(DB_PATH, metrics=metrics)
+    writer.start()
+    conn = sqlite3.connect(DB_PATH, timeout=60)
+    watcher.start()
+    print(f"Watching for new files ({watcher.backend}). Press Ctrl+C to stop.")
+    logger.info(f"===== Watch mode started ({watcher.backend}) =====")
+
+    try:
+        while True:
+            if watcher.scan_due():
+                lotx_files, csv_files = get_files_to_process(conn, scanner)
+                watcher.record_scan(lotx_files + csv_files)
+
+            ready = watcher.wait()
+            if not ready:
+                continue
+
+            files = filter_processed(conn, stat_files(ready))
+            lotx_files = [f for f in files if f[0].endswith('.lotx')]
+            csv_files = [f for f in files if f[0].endswith('.csv')]
+            lotx_files, csv_files, duplicates = skip_duplicates(conn, deduper, lotx_files, csv_files)
+            if duplicates:
+                writer.put(None, [], duplicates)
+            batch_workers = workers if len(lotx_files) + len(csv_files) > WATCH_INLINE_FILES else 1
+            run_pipeline(lotx_files, csv_files, "Ingesting", writer, batch_workers, metrics)
+
+            # Make the batch visible, then advance snapshots and fingerprints
+            writer.flush()
+            scanner.commit(conn)
+            deduper.commit(conn, writer.succeeded)
+            writer.succeeded.clear()
+    except KeyboardInterrupt:
+        print("\nStopping watch mode...")
+        logger.info("Watch mode interrupted by user")
+    finally:
+        watcher.stop()
+        conn.close()
+        writer.close()
+        report_writer(writer)
+        save_metrics(metrics)
+
+
+def get_workers_arg():
+    """Reads the parse worker count from '--workers N', defaulting to PARSE_WORKERS."""
+    if '--workers' in sys.argv:
+        idx = sys.argv.index('--workers')
+        try:
+            return max(1, int(sys.argv[idx + 1]))
+        except (IndexError, ValueError):
+            print(f"Invalid --workers value, using default of {PARSE_WORKERS}.")
+    return PARSE_WORKERS
+
+
 def main():
     """Main function to orchestrate the entire unified pipeline."""
     start_time = time.time()
@@ -239,22 +641,36 @@ def main():
     logger.info("===== Starting Unified Pipeline =====")
     
     setup_database()
+    workers = get_workers_arg()
+
+    # One-time conversion of Void_results to the typed, dictionary-encoded layout
+    if '--migrate-schema' in sys.argv:
+        migrate_database(DB_PATH)
+        print("Schema migration finished. The script will now exit.")
+        return
     
     # Check for a command-line flag to run the migration.
     # The migration should typically only be run once.
     if '--migrate' in sys.argv:
-        migrate_old_data()
+        migrate_old_data(workers, bulk='--bulk' in sys.argv)
         print("\nMigration finished. The script will now exit.")
         print("Run the script without the --migrate flag to process new network files.")
         logger.info("Migration flag detected. Script will exit after migration.")
         return # Exit after migration is complete
 
+    if '--watch' in sys.argv:
+        watch(workers)
+        return
+
     print("\nStarting continuous pipeline for new files from network...")
-    print("(To migrate old local data, run with the --migrate flag)")
+    print("(To migrate old local data, run with the --migrate [--bulk] flag; to keep running, use --watch)")
     
+    metrics = IngestMetrics('unified_pipeline')
+    scanner = SnapshotScanner(metrics=metrics)
+    deduper = ContentDeduper()
     with sqlite3.connect(DB_PATH) as conn:
-        lotx_files = get_files_to_process(conn, SOURCE_LOT_INFO_DIRS, '.lotx')
-        csv_files = get_files_to_process(conn, SOURCE_VOID_RESULTS_DIRS, '.csv')
+        lotx_files, csv_files = get_files_to_process(conn, scanner)
+        lotx_files, csv_files, duplicates = skip_duplicates(conn, deduper, lotx_files, csv_files)
 
     if not lotx_files and not csv_files:
         print("No new network files found to process.")
@@ -263,25 +679,28 @@ def main():
         print(f"Found {len(lotx_files)} new/modified .lotx files on the network.")
         print(f"Found {len(csv_files)} new/modified .csv files on the network.")
 
-    lot_info_query = f"INSERT OR IGNORE INTO Lot_info VALUES ({','.join(['?']*14)})"
-    void_results_query = f"INSERT OR IGNORE INTO Void_results VALUES ({','.join(['?']*(len(CSV_STANDARD_HEADER)+1))})"
-
-    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
-        future_lotx = executor.submit(run_pipeline, lotx_files, process_lotx_file, lot_info_query, BATCH_SIZE_LOTX, "Processing LOTX")
-        future_csv = executor.submit(run_pipeline, csv_files, process_csv_file, void_results_query, BATCH_SIZE_CSV, "Processing CSV")
-        
-        # Wait for both pipelines to complete
-        concurrent.futures.wait([future_lotx, future_csv])
+    writer = SQLiteWriter(DB_PATH, metrics=metrics)
+    writer.start()
+    try:
+        if duplicates:
+            writer.put(None, [], duplicates)
+        run_pipeline(lotx_files, csv_files, "Processing", writer, workers, metrics)
+    finally:
+        writer.close()
+        report_writer(writer)
+    print(deduper.report())
 
-        # Check for exceptions
-        if future_lotx.exception():
-            logger.error(f"LOTX pipeline failed: {future_lotx.exception()}")
-        if future_csv.exception():
-            logger.error(f"CSV pipeline failed: {future_csv.exception()}")
+    # Only advance the scan snapshots and fingerprints once the files are safely written
+    with sqlite3.connect(DB_PATH) as conn:
+        scanner.commit(conn)
+        deduper.commit(conn, writer.succeeded)
+    save_metrics(metrics)
 
     duration = time.time() - start_time
     print(f"\nPipeline finished in {duration:.2f} seconds.")
     logger.info(f"===== Pipeline finished in {duration:.2f} seconds =====\n")
 
 if __name__ == "__main__":
-    main()
+    # --profile: profile the run (main process only; add --workers 1 to include parsing)
+    with profile_run('unified_pipeline', '--profile' in sys.argv):
+        main()
@@ -0,0 +1,121 @@
+"""
+Consistent online snapshots of a live (WAL-mode) SQLite database.
+
+Uses the SQLite backup API in steps of SNAPSHOT_STEP_PAGES pages, so the
+ingest process keeps writing while the copy runs, or VACUUM INTO for a
+compacted copy. The snapshot is written to '<dest>.part' and renamed when
+complete, so a reader never sees a half-written file.
+
+    python db_snapshot.py <source.db> <snapshot.db> [--compact]
+"""
+import os
+import sys
+import time
+import sqlite3
+import logging
+
+SNAPSHOT_STEP_PAGES = 1024  # pages copied per backup step (4 MB with 4 KB pages)
+SNAPSHOT_STEP_SLEEP = 0.005  # pause between steps so writers get the lock
+# A write from another connection restarts the paged copy; after this many
+# restarts the rest is copied in one step (in WAL mode that still does not
+# block writers, it only pins one read snapshot)
+MAX_RESTARTS = 5
+
+logger = logging.getLogger()
+
+
+def print_progress(copied, total, pages_per_second):
+    """Default progress callback: one updating console line."""
+    percent = 100.0 * copied / total if total else 100.0
+    print(f"\rSnapshot: {copied}/{total} pages ({percent:.0f}%), {pages_per_second:.0f} pages/s", end='', flush=True)
+
+
+def snapshot_database(source_path, dest_path, compact=False, step_pages=SNAPSHOT_STEP_PAGES,
+                      step_sleep=SNAPSHOT_STEP_SLEEP, progress=print_progress):
+    """
+    Writes a consistent copy of source_path to dest_path while it stays in use.
+    compact=True uses VACUUM INTO, which also drops free pages and defragments.
+    progress(copied_pages, total_pages, pages_per_second) is called per step.
+    Returns a dict with pages, seconds, pages_per_second, bytes and restarts.
+    """
+    tmp_path = dest_path + '.part'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    start_time = time.time()
+    src = sqlite3.connect(source_path, timeout=60)
+    restarts = 0
+    try:
+        total_pages = src.execute("PRAGMA page_count").fetchone()[0]
+        if compact:
+            src.execute("VACUUM INTO ?", (tmp_path,))
+            pages = os.path.getsize(tmp_path) // src.execute("PRAGMA page_size").fetchone()[0]
+            if progress:
+                elapsed = time.time() - start_time
+                progress(total_pages, total_pages, total_pages / elapsed if elapsed > 0 else 0.0)
+        else:
+            dst = sqlite3.connect(tmp_path)
+            state = {'remaining': None}
+
+            def on_step(status, remaining, total):
+                nonlocal restarts
+                if state['remaining'] is not None and remaining > state['remaining']:
+                    restarts += 1
+                    if restarts >= MAX_RESTARTS:
+                        raise _RestartLimit()
+                state['remaining'] = remaining
+                if progress:
+                    elapsed = time.time() - start_time
+                    copied = total - remaining
+                    progress(copied, total, copied / elapsed if elapsed > 0 else 0.0)
+
+            try:
+                try:
+                    src.backup(dst, pages=step_pages, progress=on_step, sleep=step_sleep)
+                except _RestartLimit:
+                    logger.info(f"Snapshot restarted {restarts} times under write load; finishing in one step")
+                    src.backup(dst, pages=-1)
+                pages = dst.execute("PRAGMA page_count").fetchone()[0]
+                # The snapshot is shipped as a single file
+                dst.execute("PRAGMA journal_mode = DELETE")
+            finally:
+                dst.close()
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    finally:
+        src.close()
+
+    os.replace(tmp_path, dest_path)
+    seconds = time.time() - start_time
+    result = {
+        'pages': pages,
+        'seconds': seconds,
+        'pages_per_second': pages / seconds if seconds > 0 else 0.0,
+        'bytes': os.path.getsize(dest_path),
+        'restarts': restarts,
+    }
+    if progress is print_progress:
+        print()
+    logger.info(f"Snapshot of {source_path} -> {dest_path}: {result}")
+    return result
+
+
+class _RestartLimit(Exception):
+    """Raised from the progress callback to abort a paged backup that keeps restarting."""
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    if len(args) != 2:
+        print("Usage: python db_snapshot.py <source.db> <snapshot.db> [--compact]")
+        return
+    result = snapshot_database(args[0], args[1], compact='--compact' in sys.argv)
+    print(f"Snapshot written: {result['bytes'] / 1e6:.1f} MB, {result['pages']} pages in "
+          f"{result['seconds']:.2f}s ({result['pages_per_second']:.0f} pages/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,19 @@
 import os
+import sys
 import shutil
 import time
 import logging
 
+# Shared X-ray helpers: deploy them next to this script or one level up (Xray_data/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from delta_sync import apply_deltas, mark_snapshot_applied
+
 # --- DATABASE SYNCHRONIZER CONFIGURATION ---
 
-# Path to the database on the X-ray machine (as seen from your laptop's network)
-# IMPORTANT: You must ensure the folder containing the DB on the X-ray machine is a shared folder.
-# Example: \\XRAY-MACHINE-IP\shared_folder\local_xray_data.db
-SOURCE_DB_PATH = r'\\XRAY-MACHINE-IP\path\to\shared\folder\local_xray_data.db'
+# Sync folder the edge processor writes delta packages to (as seen from your laptop's network)
+# IMPORTANT: You must ensure this folder on the X-ray machine is a shared folder.
+# Example: \\XRAY-MACHINE-IP\shared_folder\sync
+SOURCE_SYNC_DIR = r'\\XRAY-MACHINE-IP\path\to\shared\folder\sync'
 
 # Path where you want to save the database on your local laptop
 DESTINATION_DB_PATH = r'C:\Users\zbrzyy\Documents\Onsemi VN\XrayDatabase\synced_xray_data.db'
@@ -24,38 +29,69 @@ logging.basicConfig(
 logger = logging.getLogger()
 
 def sync_database():
-    """Copies the database from the source to the destination."""
-    print(f"Attempting to sync database from: {SOURCE_DB_PATH}")
-    logger.info(f"Starting sync from {SOURCE_DB_PATH} to {DESTINATION_DB_PATH}")
+    """Applies the delta packages exported by the edge processor since the last sync."""
+    print(f"Attempting to sync database from: {SOURCE_SYNC_DIR}")
+    logger.info(f"Starting sync from {SOURCE_SYNC_DIR} to {DESTINATION_DB_PATH}")
 
-    # --- 1. Check if source database exists ---
-    if not os.path.exists(SOURCE_DB_PATH):
-        error_msg = f"Source database not found at {SOURCE_DB_PATH}. Please check the network path and ensure the folder is shared."
+    # --- 1. Check if the sync folder exists ---
+    if not os.path.isdir(SOURCE_SYNC_DIR):
+        error_msg = f"Sync folder not found at {SOURCE_SYNC_DIR}. Please check the network path and ensure the folder is shared."
         print(f"ERROR: {error_msg}")
         logger.error(error_msg)
         return
 
     # --- 2. Check if destination directory exists ---
     dest_dir = os.path.dirname(DESTINATION_DB_PATH)
-    if not os.path.exists(dest_dir):
+    if dest_dir and not os.path.exists(dest_dir):
         os.makedirs(dest_dir)
         print(f"Created destination directory: {dest_dir}")
         logger.info(f"Created destination directory: {dest_dir}")
 
-    # --- 3. Perform the copy ---
+    # --- 3. Apply new packages and acknowledge them ---
     try:
-        shutil.copy2(SOURCE_DB_PATH, DESTINATION_DB_PATH)
-        success_msg = f"Successfully synced database to: {DESTINATION_DB_PATH}"
+        packages, rows, size = apply_deltas(SOURCE_SYNC_DIR, DESTINATION_DB_PATH)
+        if packages:
+            success_msg = f"Applied {packages} delta package(s): {rows} rows, {size / 1e6:.2f} MB transferred."
+        else:
+            success_msg = "Already up to date. No new delta packages."
         print(success_msg)
         logger.info(success_msg)
     except Exception as e:
-        error_msg = f"Failed to copy database: {e}"
+        error_msg = f"Failed to apply delta packages: {e}"
         print(f"ERROR: {error_msg}")
         logger.error(error_msg)
 
+def sync_full_snapshot():
+    """
+    Replaces the local synced database with the newest snapshot the edge
+    processor wrote (edge_processor.py --snapshot). Snapshots are complete,
+    static files, so a plain file copy is safe; delta packages newer than
+    the snapshot are applied on top by the next sync.
+    """
+    snapshots = sorted(
+        name for name in os.listdir(SOURCE_SYNC_DIR)
+        if name.startswith('snapshot_') and name.endswith('.db')
+    )
+    if not snapshots:
+        print("ERROR: No snapshot found in the sync folder. Run 'edge_processor.py --snapshot' on the X-ray machine first.")
+        logger.error("Full sync requested but no snapshot found.")
+        return
+    source_path = os.path.join(SOURCE_SYNC_DIR, snapshots[-1])
+    tmp_path = DESTINATION_DB_PATH + '.part'
+    shutil.copy2(source_path, tmp_path)
+    os.replace(tmp_path, DESTINATION_DB_PATH)
+    # Packages exported before the snapshot are already in it; sync continues after them
+    seq = mark_snapshot_applied(DESTINATION_DB_PATH)
+    msg = (f"Restored {snapshots[-1]} ({os.path.getsize(DESTINATION_DB_PATH) / 1e6:.1f} MB) to {DESTINATION_DB_PATH}, "
+           f"up to delta {seq}")
+    print(msg)
+    logger.info(msg)
+
 def main():
     """Main function to run the synchronizer."""
     start_time = time.time()
+    if '--full' in sys.argv:
+        sync_full_snapshot()
     sync_database()
     duration = time.time() - start_time
     print(f"Synchronization process finished in {duration:.2f} seconds.")
@@ -0,0 +1,315 @@
+"""
+Changeset-based sync between the edge database and the laptop.
+
+Edge side (export_delta): rows added since the last exported package are
+written to the sync folder as a gzip'd JSON-lines package
+(a {table, columns} header line, then one JSON array per row)
+plus a manifest (tables, rowid ranges, row counts, size, sha256). The
+manifest is written last, so its presence means the package is complete.
+Packages form a chain (base_seq = the previous package) and stay in the
+folder until the laptop acknowledges them.
+
+Laptop side (apply_deltas): verifies each new package against its manifest,
+applies it with INSERT OR IGNORE, then acknowledges it by rewriting
+sync_ack.json in the sync folder. A package that fails verification or
+does not follow the last applied one is reported as lost_seq in the ack;
+only then does the edge supersede the unacknowledged packages with one
+rebuilt from the acknowledged rowids.
+"""
+import os
+import gzip
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+
+from void_schema import VOID_TABLE, VOID_DATA_TABLE, UNIQUE_KEY, is_typed, view_columns, decoded_select
+
+SYNC_TABLES = ['Lot_info', 'Void_results']
+ACK_FILE = 'sync_ack.json'
+EXPORT_FETCH_ROWS = 5000
+APPLY_BATCH_ROWS = 5000
+
+logger = logging.getLogger()
+
+
+def _manifest_name(seq):
+    return f"delta_{seq:06d}.json"
+
+
+def _package_name(seq):
+    return f"delta_{seq:06d}.jsonl.gz"
+
+
+def _write_json_atomic(path, obj):
+    tmp_path = path + '.part'
+    with open(tmp_path, 'w') as f:
+        json.dump(obj, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def read_ack(sync_dir):
+    """
+    Returns (last sequence number acknowledged by the laptop, sequence number
+    it reported as lost or None); (0, None) if nothing was acknowledged yet.
+    """
+    try:
+        with open(os.path.join(sync_dir, ACK_FILE)) as f:
+            ack = json.load(f)
+        return int(ack.get('seq', 0)), ack.get('lost_seq')
+    except (FileNotFoundError, ValueError):
+        return 0, None
+
+
+def _remove_package(sync_dir, seq):
+    for name in (_manifest_name(seq), _package_name(seq)):
+        try:
+            os.remove(os.path.join(sync_dir, name))
+        except FileNotFoundError:
+            pass
+
+
+# --- EDGE SIDE ---
+def _ensure_export_table(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS sync_exports (
+        seq INTEGER PRIMARY KEY,
+        created_at REAL NOT NULL,
+        watermarks TEXT NOT NULL,
+        status TEXT NOT NULL
+    )""")
+
+
+def _row_source(conn, table):
+    """
+    (rowid table, SELECT of the rows in a rowid range, CREATE TABLE for the
+    laptop) for one synced table, or None when it cannot be exported. A typed
+    Void_results (void_schema.py) is read decoded through its view query,
+    by Void_results_data rowid, and arrives on the laptop as plain columns.
+    """
+    row = conn.execute("SELECT type, sql FROM sqlite_master WHERE name = ? COLLATE NOCASE AND type IN ('table', 'view')", (table,)).fetchone()
+    if row is None:
+        return None
+    if row[0] == 'table':
+        return table, f"SELECT * FROM {table} WHERE rowid > ? AND rowid <= ?", row[1]
+    if table == VOID_TABLE and is_typed(conn):
+        columns = ', '.join(f'{col} TEXT' for col in view_columns(conn))
+        create_sql = f"CREATE TABLE {VOID_TABLE} ({columns}, UNIQUE({', '.join(UNIQUE_KEY)}))"
+        return VOID_DATA_TABLE, f"{decoded_select(conn)} WHERE v.rowid > ? AND v.rowid <= ?", create_sql
+    logger.error(f"Cannot sync {table}: it is a view, its rows are not exported")
+    return None
+
+
+def export_delta(db_path, sync_dir, tables=SYNC_TABLES):
+    """
+    Writes a package with the rows added since the last exported package.
+    Returns the manifest dict, or None when there is nothing new to send.
+    """
+    os.makedirs(sync_dir, exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=60)
+    try:
+        _ensure_export_table(conn)
+        acked, lost_seq = read_ack(sync_dir)
+
+        # Packages up to the ack have been applied and are no longer needed
+        for (old_seq,) in conn.execute("SELECT seq FROM sync_exports WHERE seq <= ? AND status = 'pending'", (acked,)).fetchall():
+            _remove_package(sync_dir, old_seq)
+        conn.execute("UPDATE sync_exports SET status = 'acked' WHERE seq <= ? AND status = 'pending'", (acked,))
+        conn.commit()
+
+        # Unacknowledged packages are kept (the laptop may be reading them) unless
+        # one of them was reported lost or has gone missing from the sync folder
+        pending = [seq for (seq,) in conn.execute("SELECT seq FROM sync_exports WHERE status = 'pending' ORDER BY seq")]
+        lost = [seq for seq in pending if seq == lost_seq or not (
+            os.path.exists(os.path.join(sync_dir, _manifest_name(seq)))
+            and os.path.exists(os.path.join(sync_dir, _package_name(seq))))]
+        if lost:
+            logger.warning(f"Delta {lost[0]} was lost; rebuilding from acknowledged delta {acked}")
+            for old_seq in pending:
+                _remove_package(sync_dir, old_seq)
+            conn.executemany("UPDATE sync_exports SET status = 'superseded' WHERE seq = ?", [(q,) for q in pending])
+            conn.commit()
+            pending = []
+        base_seq = pending[-1] if pending else acked
+
+        row = conn.execute("SELECT watermarks FROM sync_exports WHERE seq = ?", (base_seq,)).fetchone()
+        start = json.loads(row[0]) if row else {}
+        seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM sync_exports").fetchone()[0] + 1
+
+        # Watermarks are kept per rowid table (Void_results_data once migrated)
+        ranges = {}
+        for table in tables:
+            source = _row_source(conn, table)
+            if source is None:
+                continue
+            rowid_table, query, create_sql = source
+            max_rowid = conn.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {rowid_table}").fetchone()[0]
+            from_rowid = start.get(rowid_table, 0)
+            if from_rowid > max_rowid:
+                from_rowid = 0  # the table was recreated
+            ranges[table] = (rowid_table, from_rowid, max_rowid, query, create_sql)
+
+        watermarks = {r[0]: r[2] for r in ranges.values()}
+        if all(r[1] == r[2] for r in ranges.values()):
+            return None  # the previous package already covers everything
+
+        package_path = os.path.join(sync_dir, _package_name(seq))
+        manifest = {'seq': seq, 'created_at': time.time(), 'base_seq': base_seq, 'tables': {}}
+        with gzip.open(package_path + '.part', 'wt', encoding='utf-8', compresslevel=6) as out:
+            for table, (rowid_table, from_rowid, to_rowid, query, create_sql) in ranges.items():
+                cursor = conn.execute(query, (from_rowid, to_rowid))
+                columns = [d[0] for d in cursor.description]
+                out.write(json.dumps({'table': table, 'columns': columns}) + '\n')
+                count = 0
+                while True:
+                    rows = cursor.fetchmany(EXPORT_FETCH_ROWS)
+                    if not rows:
+                        break
+                    out.writelines(json.dumps(r, separators=(',', ':')) + '\n' for r in rows)
+                    count += len(rows)
+                manifest['tables'][table] = {
+                    'columns': columns, 'create_sql': create_sql,
+                    'from_rowid': from_rowid, 'to_rowid': to_rowid, 'rows': count,
+                }
+        os.replace(package_path + '.part', package_path)
+
+        manifest['package'] = _package_name(seq)
+        manifest['bytes'] = os.path.getsize(package_path)
+        manifest['sha256'] = _sha256(package_path)
+        conn.execute(
+            "INSERT INTO sync_exports (seq, created_at, watermarks, status) VALUES (?, ?, ?, 'pending')",
+            (seq, manifest['created_at'], json.dumps(watermarks))
+        )
+        conn.commit()
+        _write_json_atomic(os.path.join(sync_dir, _manifest_name(seq)), manifest)
+
+        total_rows = sum(t['rows'] for t in manifest['tables'].values())
+        logger.info(f"Exported delta {seq}: {total_rows} rows, {manifest['bytes']} bytes")
+        return manifest
+    finally:
+        conn.close()
+
+
+# --- LAPTOP SIDE ---
+def _ensure_applied_table(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS sync_applied (
+        seq INTEGER PRIMARY KEY,
+        applied_at REAL NOT NULL,
+        rows INTEGER NOT NULL
+    )""")
+
+
+def mark_snapshot_applied(db_path):
+    """
+    Seeds sync_applied in a database restored from an edge snapshot: the
+    snapshot carries the edge's sync_exports table, and every package listed
+    there is already contained in its rows. Returns the seeded sequence number.
+    """
+    conn = sqlite3.connect(db_path, timeout=60)
+    try:
+        _ensure_applied_table(conn)
+        exported = conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'sync_exports'").fetchone()
+        seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM sync_exports").fetchone()[0] if exported else 0
+        if seq:
+            conn.execute("INSERT OR REPLACE INTO sync_applied (seq, applied_at, rows) VALUES (?, ?, 0)", (seq, time.time()))
+        conn.commit()
+        return seq
+    finally:
+        conn.close()
+
+
+def _apply_package(conn, sync_dir, manifest):
+    """Verifies and applies one package in a single transaction; returns rows read."""
+    package_path = os.path.join(sync_dir, manifest['package'])
+    if os.path.getsize(package_path) != manifest['bytes'] or _sha256(package_path) != manifest['sha256']:
+        raise ValueError(f"Package {manifest['package']} does not match its manifest")
+
+    for table, info in manifest['tables'].items():
+        # sqlite_master keeps the plain CREATE TABLE text
+        conn.execute(info['create_sql'].replace('CREATE TABLE', 'CREATE TABLE IF NOT EXISTS', 1))
+
+    rows_read = 0
+    query, batch = None, []
+    with gzip.open(package_path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            row = json.loads(line)
+            if isinstance(row, dict):  # start of the next table's rows
+                if batch:
+                    conn.executemany(query, batch)
+                    batch = []
+                table, columns = row['table'], row['columns']
+                query = (f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) "
+                         f"VALUES ({', '.join('?' * len(columns))})")
+                continue
+            batch.append(row)
+            rows_read += 1
+            if len(batch) >= APPLY_BATCH_ROWS:
+                conn.executemany(query, batch)
+                batch = []
+    if batch:
+        conn.executemany(query, batch)
+    conn.execute("INSERT OR REPLACE INTO sync_applied (seq, applied_at, rows) VALUES (?, ?, ?)",
+                 (manifest['seq'], time.time(), rows_read))
+    conn.commit()
+    return rows_read
+
+
+def apply_deltas(sync_dir, db_path):
+    """
+    Applies every complete package newer than the last applied one, then
+    acknowledges the newest. A package that is corrupt, or whose base is a
+    package this side never applied, is reported back as lost so the edge
+    rebuilds it. Returns (packages applied, rows read, bytes read).
+    """
+    conn = sqlite3.connect(db_path, timeout=60)
+    applied = rows = size = 0
+    lost_seq = None
+    try:
+        _ensure_applied_table(conn)
+        last = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM sync_applied").fetchone()[0]
+        manifests = sorted(
+            name for name in os.listdir(sync_dir)
+            if name.startswith('delta_') and name.endswith('.json')
+        )
+        for name in manifests:
+            with open(os.path.join(sync_dir, name)) as f:
+                manifest = json.load(f)
+            if manifest['seq'] <= last:
+                continue
+            try:
+                if manifest.get('base_seq', 0) > last:
+                    raise ValueError(f"Package {manifest['package']} follows delta {manifest['base_seq']}, "
+                                     f"last applied is {last}")
+                rows += _apply_package(conn, sync_dir, manifest)
+            except (FileNotFoundError, ValueError) as e:
+                conn.rollback()
+                logger.error(f"Lost {name}: {e}")
+                lost_seq = manifest['seq']
+                break
+            except OSError as e:
+                conn.rollback()
+                logger.error(f"Could not apply {name}: {e}")
+                break  # keep the order; retry on the next run
+            applied += 1
+            size += manifest['bytes']
+            last = manifest['seq']
+            logger.info(f"Applied delta {manifest['seq']} ({manifest['bytes']} bytes)")
+    finally:
+        conn.close()
+
+    if applied or lost_seq is not None:
+        ack = {'seq': last, 'acked_at': time.time()}
+        if lost_seq is not None:
+            ack['lost_seq'] = lost_seq
+        _write_json_atomic(os.path.join(sync_dir, ACK_FILE), ack)
+    return applied, rows, size
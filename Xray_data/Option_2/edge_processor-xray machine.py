@@ -7,8 +7,6 @@ Processes files immediately after creation and maintains local database
 import os
 import time
 import sqlite3
-import xml.etree.ElementTree as ET
-import pandas as pd
 import fnmatch
 import logging
 import threading
@@ -20,6 +18,11 @@ import json
 import hashlib
 import gzip
 from contextlib import contextmanager
+from lotx_parser import iter_lotx_rows  # shared helpers, deploy next to this script
+from void_csv_loader import load_void_rows
+from delta_sync import export_delta
+from db_snapshot import snapshot_database
+from ingest_metrics import IngestMetrics
 
 # Configuration
 
@@ -221,6 +224,7 @@ class FileProcessor:
 ```
 def __init__(self, db_manager):
     self.db_manager = db_manager
+    self.metrics = IngestMetrics('edge_processor')  # swapped for a fresh one by periodic_tasks
     self.standard_void_headers = [
         'BoardBarcode', 'ModuleIndex', 'JointType', 'Pin', 'TotalVoidRatio',
         'LargestVoidRatio', 'SpreadX', 'SpreadY', 'GVMean', 'DefectCode',
@@ -238,60 +242,13 @@ def calculate_file_hash(self, file_path):
 def process_lotx_file(self, file_path):
     """Process .lotx (XML) file"""
     try:
-        tree = ET.parse(file_path)
-        root = tree.getroot()
-        
-        # Extract lot attributes
-        lot_attrs = {
-            'lot_id': root.attrib.get('Id', ''),
-            'recipe': root.attrib.get('Recipe', ''),
-            'allow_size_null': root.attrib.get('AllowSizeNull', ''),
-            'count_unique_barcodes_only': root.attrib.get('CountUniqueBarcodesOnly', ''),
-            'size': int(root.attrib.get('Size', 0)),
-            'carrier_index': int(root.attrib.get('CarrierIndex', 0))
-        }
-        
-        records = []
-        trays = root.find('Trays')
-        if trays is not None:
-            for tray in trays:
-                tray_attrs = {
-                    'tray_id': tray.attrib.get('Id', ''),
-                    'tray_state': int(tray.attrib.get('State', 0)),
-                    'tray_code': tray.attrib.get('Code', '')
-                }
-                
-                units = tray.find('Units')
-                if units is not None:
-                    for unit in units:
-                        unit_attrs = {
-                            'unit_id': unit.attrib.get('Id', ''),
-                            'unit_state': int(unit.attrib.get('State', 0)),
-                            'unit_code': unit.attrib.get('Code', ''),
-                            'unit_idx': int(unit.attrib.get('Idx', 0))
-                        }
-                        
-                        record = (
-                            lot_attrs['lot_id'],
-                            lot_attrs['recipe'],
-                            lot_attrs['allow_size_null'],
-                            lot_attrs['count_unique_barcodes_only'],
-                            lot_attrs['size'],
-                            lot_attrs['carrier_index'],
-                            tray_attrs['tray_id'],
-                            tray_attrs['tray_state'],
-                            tray_attrs['tray_code'],
-                            unit_attrs['unit_id'],
-                            unit_attrs['unit_state'],
-                            unit_attrs['unit_code'],
-                            unit_attrs['unit_idx'],
-                            os.path.basename(file_path)
-                        )
-                        records.append(record)
+        # Streams tray/unit records without building the whole XML tree
+        filename = os.path.basename(file_path)
+        records = [row + (filename,) for row in iter_lotx_rows(file_path)]
         
         if records:
             self.db_manager.insert_lot_info_batch(records)
-            logger.info(f"Processed {len(records)} lot info records from {os.path.basename(file_path)}")
+            logger.info(f"Processed {len(records)} lot info records from {filename}")
         
         return len(records)
         
@@ -302,30 +259,16 @@ def process_lotx_file(self, file_path):
 def process_csv_file(self, file_path):
     """Process CSV file"""
     try:
-        df = pd.read_csv(file_path, low_memory=False)
+        # Column-wise load of the standard columns, tagged with the source file
+        filename = os.path.basename(file_path)
+        records = load_void_rows(file_path, filename)
         
-        if df.empty:
-            logger.warning(f"Empty CSV file: {os.path.basename(file_path)}")
+        if not records:
+            logger.warning(f"Empty CSV file: {filename}")
             return 0
         
-        # Add missing columns
-        for col in self.standard_void_headers:
-            if col not in df.columns:
-                df[col] = None
-        
-        # Reorder columns and clean data
-        df = df[self.standard_void_headers]
-        df = df.where(pd.notnull(df), None)
-        
-        # Convert to records and add source file
-        records = []
-        for _, row in df.iterrows():
-            record = tuple(row.values) + (os.path.basename(file_path),)
-            records.append(record)
-        
-        if records:
-            self.db_manager.insert_void_results_batch(records)
-            logger.info(f"Processed {len(records)} void results from {os.path.basename(file_path)}")
+        self.db_manager.insert_void_results_batch(records)
+        logger.info(f"Processed {len(records)} void results from {filename}")
         
         return len(records)
         
@@ -338,20 +281,24 @@ def process_file(self, file_path):
     filename = os.path.basename(file_path)
     
     # Calculate file hash
-    file_hash = self.calculate_file_hash(file_path)
+    file_type = os.path.splitext(filename)[1].lstrip('.')
     file_size = os.path.getsize(file_path)
+    with self.metrics.timer('read', file_type, nbytes=file_size):
+        file_hash = self.calculate_file_hash(file_path)
     
     # Check if already processed
     if self.db_manager.is_file_processed(filename, file_hash):
         logger.debug(f"File already processed: {filename}")
         return
     
-    # Process based on file type
+    # Process based on file type (parse + insert + commit)
     record_count = 0
     if filename.endswith('.lotx'):
-        record_count = self.process_lotx_file(file_path)
+        with self.metrics.timer('parse', file_type, nbytes=file_size) as sample:
+            record_count = sample['rows'] = self.process_lotx_file(file_path)
     elif filename.endswith('.csv') and fnmatch.fnmatch(filename, 'XRAY_SIC_*.csv'):
-        record_count = self.process_csv_file(file_path)
+        with self.metrics.timer('parse', file_type, nbytes=file_size) as sample:
+            record_count = sample['rows'] = self.process_csv_file(file_path)
     else:
         logger.debug(f"Skipping unsupported file: {filename}")
         return
@@ -426,28 +373,22 @@ def __init__(self, db_manager):
     self.db_manager = db_manager
 
 def create_sync_package(self):
-    """Create synchronization package"""
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    sync_file = os.path.join(CONFIG['sync_path'], f"sync_package_{timestamp}.db")
-    
-    # Copy database for sync
-    import shutil
-    shutil.copy2(self.db_manager.db_path, sync_file)
-    
-    # Create metadata
-    stats = self.db_manager.get_stats()
-    metadata = {
-        'timestamp': timestamp,
-        'stats': stats,
-        'version': 1
-    }
+    """Export the rows the laptop has not acknowledged yet as a delta package"""
+    manifest = export_delta(self.db_manager.db_path, CONFIG['sync_path'])
+    if manifest is None:
+        logger.info("No new rows since the last sync package")
+        return None
     
-    metadata_file = os.path.join(CONFIG['sync_path'], f"sync_metadata_{timestamp}.json")
-    with open(metadata_file, 'w') as f:
-        json.dump(metadata, f, indent=2)
-    
-    logger.info(f"Created sync package: {sync_file}")
-    return sync_file, metadata_file
+    logger.info(f"Created sync package: {manifest['package']} ({manifest['bytes']} bytes)")
+    return manifest
+
+def create_snapshot(self, compact=True):
+    """Write a consistent full copy of the live database (backup API, ingest keeps running)"""
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    snapshot_file = os.path.join(CONFIG['sync_path'], f"snapshot_{timestamp}.db")
+    result = snapshot_database(self.db_manager.db_path, snapshot_file, compact=compact, progress=None)
+    logger.info(f"Created snapshot: {snapshot_file} ({result['bytes']} bytes, {result['pages_per_second']:.0f} pages/s)")
+    return snapshot_file
 ```
 
 def main():
@@ -487,6 +428,10 @@ def periodic_tasks():
             sync_manager.create_sync_package()
             stats = db_manager.get_stats()
             logger.info(f"Database stats: {stats}")
+            # Per-stage timings of the last interval
+            metrics, processor.metrics = processor.metrics, IngestMetrics('edge_processor')
+            logger.info(f"Ingest metrics:\n{metrics.report()}")
+            metrics.write_jsonl(os.path.join(CONFIG['log_path'], f"edge_metrics_{time.strftime('%Y%m%d')}.jsonl"))
         except Exception as e:
             logger.error(f"Error in periodic tasks: {str(e)}")
 
@@ -3,10 +3,20 @@ import sys
 import time
 import sqlite3
 import xml.etree.ElementTree as ET
-import pandas as pd
 import logging
 import shutil
-from pandas.errors import EmptyDataError
+
+# Shared X-ray helpers: deploy them next to this script or one level up (Xray_data/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dir_scanner import SnapshotScanner, ensure_snapshot_table, filter_processed
+from file_watcher import DirectoryWatcher
+from delta_sync import export_delta
+from db_snapshot import snapshot_database
+from void_archive import VoidArchiveWriter, compact, parquet_available
+from ingest_metrics import IngestMetrics, profile_run
+from lotx_parser import read_lotx_rows
+from void_csv_loader import load_void_rows
+from void_schema import is_typed
 
 # --- EDGE PROCESSOR CONFIGURATION ---
 # IMPORTANT: These paths are relative to the X-ray machine's local file system.
@@ -14,10 +24,17 @@ SOURCE_LOT_INFO_DIR = r'C:\path\on\xray\machine\Lot-Export'
 SOURCE_VOID_RESULTS_DIR = r'C:\path\on\xray\machine\Void Result'
 DB_PATH = r'C:\path\on\xray\machine\local_xray_data.db'
 ARCHIVE_DIR = r'C:\path\on\xray\machine\processed_archive'
+# With --archive and pyarrow installed, processed CSV rows go to daily Parquet
+# partitions here instead of keeping each CSV (re-ingest: void_archive.py reingest)
+PARQUET_ARCHIVE_DIR = r'C:\path\on\xray\machine\void_archive'
+# Shared folder the laptop pulls delta packages from (db_synchronizer.py)
+SYNC_DIR = r'C:\path\on\xray\machine\sync'
 LOG_FILE = f'edge_log_{time.strftime("%Y%m%d")}.log'
+# Per-stage timings of every cycle that found files (see ingest_metrics.py)
+METRICS_FILE = f'edge_metrics_{time.strftime("%Y%m%d")}.jsonl'
 
 # Processing parameters
-CHECK_INTERVAL_SECONDS = 1800  # 30 minutes
+CHECK_INTERVAL_SECONDS = 1800  # 30 minutes, longest wait between scans when idle
 CSV_STANDARD_HEADER = [
     'BoardBarcode', 'ModuleIndex', 'JointType', 'Pin', 'TotalVoidRatio', 
     'LargestVoidRatio', 'SpreadX', 'SpreadY', 'GVMean', 'DefectCode', 
@@ -50,65 +67,35 @@ def setup_database():
             {', '.join(f'{col} TEXT' for col in CSV_STANDARD_HEADER)},
             source_filename TEXT, UNIQUE(BoardBarcode, ModuleIndex, JointType, Pin)
         )""")
+        if not is_typed(conn):  # a migrated Void_results is a view (indexed on Void_results_data)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_void_lot ON Void_results(Lot)")
         conn.execute("""
         CREATE TABLE IF NOT EXISTS processed_files (
             filepath TEXT PRIMARY KEY, mtime REAL NOT NULL, size INTEGER NOT NULL,
             status TEXT NOT NULL, processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )""")
+        ensure_snapshot_table(conn)
         conn.commit()
     logger.info("Local database setup complete.")
 
-# --- FILE SCANNING (Slightly modified for single directories) ---
-def get_files_to_process(conn, source_dir, extension):
-    """Scans a source directory and identifies new or modified files."""
-    files_to_process = []
-    processed_files = {row[0]: (row[1], row[2]) for row in conn.execute("SELECT filepath, mtime, size FROM processed_files").fetchall()}
-    
-    if not os.path.exists(source_dir):
-        logger.warning(f"Source directory not found: {source_dir}")
-        return []
-    
-    for filename in os.listdir(source_dir):
-        if filename.endswith(extension):
-            file_path = os.path.join(source_dir, filename)
-            try:
-                stat = os.stat(file_path)
-                if file_path not in processed_files or processed_files[file_path] != (stat.st_mtime, stat.st_size):
-                    files_to_process.append((file_path, stat.st_mtime, stat.st_size))
-            except FileNotFoundError:
-                continue
-    return files_to_process
-
 # --- PARSING LOGIC (Identical to previous script) ---
+# Both return None when the file cannot be read or parsed, [] when it holds no rows
 def process_lotx_file(file_path):
     try:
-        tree = ET.parse(file_path)
-        root = tree.getroot()
-        lot_attrs = {'lot_id': root.attrib.get('Id'), 'recipe': root.attrib.get('Recipe'), 'size': int(root.attrib.get('Size', 0))}
-        batch = []
-        trays = root.find('Trays') or []
-        for tray in trays:
-            tray_attrs = {'tray_id': tray.attrib.get('Id'), 'tray_state': int(tray.attrib.get('State', 0))}
-            units = tray.find('Units') or []
-            for unit in units:
-                unit_attrs = {'unit_idx': int(unit.attrib.get('Idx', 0))}
-                record = (
-                    lot_attrs['lot_id'], lot_attrs['recipe'], None, None, lot_attrs['size'], None,
-                    tray_attrs['tray_id'], tray_attrs['tray_state'], None, None, None, None, unit_attrs['unit_idx']
-                )
-                batch.append(record)
-        return batch
-    except ET.ParseError: return None
+        return read_lotx_rows(file_path) or []
+    except (ET.ParseError, OSError): return None
 
 def process_csv_file(file_path):
     try:
-        df = pd.read_csv(file_path, low_memory=False)
-        if df.empty: return None
-        missing_cols = set(CSV_STANDARD_HEADER) - set(df.columns)
-        for col in missing_cols: df[col] = None
-        df = df[CSV_STANDARD_HEADER]
-        return df.where(pd.notnull(df), None)
-    except (EmptyDataError, Exception): return None
+        return load_void_rows(file_path, os.path.basename(file_path)) or []
+    except Exception: return None
+
+def mark_failed(file_path, mtime, size, records):
+    """Records a file that gave no rows, so it is only retried once it changes."""
+    status = 'ERROR_EMPTY' if records is not None else 'ERROR_PROCESS'
+    logger.error(f"{status}: {os.path.basename(file_path)}")
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.execute("INSERT OR REPLACE INTO processed_files (filepath, mtime, size, status) VALUES (?, ?, ?, ?)", (file_path, mtime, size, status))
 
 # --- ARCHIVING ---
 def archive_file(file_path):
@@ -123,59 +110,153 @@ def archive_file(file_path):
     except Exception as e:
         logger.error(f"Failed to archive {os.path.basename(file_path)}: {e}")
 
+def stat_files(paths):
+    """Returns (file_path, mtime, size) for the paths that still exist."""
+    files = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        files.append((path, stat.st_mtime, stat.st_size))
+    return files
+
 # --- MAIN PROCESSING LOOP ---
 def main():
     """Main function to run the edge processing loop."""
     print("Starting Edge Processor...")
     logger.info("===== Starting Edge Processor =====")
     setup_database()
+
+    # Full, consistent copy for the laptop to bootstrap from (db_synchronizer.py --full)
+    if '--snapshot' in sys.argv:
+        snapshot_path = os.path.join(SYNC_DIR, f"snapshot_{time.strftime('%Y%m%d_%H%M%S')}.db")
+        os.makedirs(SYNC_DIR, exist_ok=True)
+        result = snapshot_database(DB_PATH, snapshot_path, compact='--compact' in sys.argv)
+        print(f"Snapshot written to {snapshot_path}: {result['bytes'] / 1e6:.1f} MB "
+              f"in {result['seconds']:.1f}s ({result['pages_per_second']:.0f} pages/s)")
+        return
     
     archive_processed_files = '--archive' in sys.argv
+    run_once = '--once' in sys.argv  # process what is there, export, and exit
+    archive_writer = None
+    last_compact_day = None
     if archive_processed_files:
         print("Archiving mode is ON. Processed files will be moved.")
         logger.info("Archiving mode is ON.")
+        if parquet_available():
+            archive_writer = VoidArchiveWriter(PARQUET_ARCHIVE_DIR)
+            print(f"CSV rows are archived as Parquet in {PARQUET_ARCHIVE_DIR}.")
 
+    scanner = SnapshotScanner()
+    # Wakes up on filesystem events, or polls more often while files are arriving
+    watcher = DirectoryWatcher(
+        {'.lotx': [SOURCE_LOT_INFO_DIR], '.csv': [SOURCE_VOID_RESULTS_DIR]},
+        max_poll=CHECK_INTERVAL_SECONDS, safety_rescan=CHECK_INTERVAL_SECONDS
+    )
+    watcher.start()
     while True:
-        print(f"\n[{time.ctime()}] Checking for new files...")
-        
-        with sqlite3.connect(DB_PATH) as conn:
-            lotx_files = get_files_to_process(conn, SOURCE_LOT_INFO_DIR, '.lotx')
-            csv_files = get_files_to_process(conn, SOURCE_VOID_RESULTS_DIR, '.csv')
+        metrics = IngestMetrics('edge_processor')
+        scanner.metrics = metrics
 
-        if not lotx_files and not csv_files:
-            print("No new files found.")
+        if watcher.scan_due():
+            print(f"\n[{time.ctime()}] Checking for new files...")
+            with sqlite3.connect(DB_PATH) as conn:
+                found = scanner.scan(conn, SOURCE_LOT_INFO_DIR, '.lotx') + scanner.scan(conn, SOURCE_VOID_RESULTS_DIR, '.csv')
+            # Files still being written wait in the watcher until their (mtime, size) settles
+            watcher.record_scan(found)
+            if not found:
+                print("No new files found.")
+
+        if run_once and not watcher.pending:
+            ready = []
         else:
+            if not watcher.pending:
+                print(f"Waiting for new files ({watcher.backend}, next scan in at most {watcher.next_scan - time.time():.0f}s)...")
+            ready = watcher.wait()
+        with sqlite3.connect(DB_PATH) as conn:
+            files = filter_processed(conn, stat_files(ready))
+        lotx_files = [f for f in files if f[0].endswith('.lotx')]
+        csv_files = [f for f in files if f[0].endswith('.csv')]
+
+        if lotx_files or csv_files:
             print(f"Found {len(lotx_files)} new .lotx files and {len(csv_files)} new .csv files.")
             
             # Process LOTX files
             lot_info_query = f"INSERT OR IGNORE INTO Lot_info VALUES ({','.join(['?']*14)})"
             for file_path, mtime, size in lotx_files:
-                records = process_lotx_file(file_path)
+                with metrics.timer('parse', 'lotx', nbytes=size) as sample:
+                    records = process_lotx_file(file_path)
+                    sample['rows'] = len(records or ())
                 if records:
                     filename = os.path.basename(file_path)
                     records_with_filename = [r + (filename,) for r in records]
                     with sqlite3.connect(DB_PATH) as conn:
-                        conn.executemany(lot_info_query, records_with_filename)
-                        conn.execute("INSERT OR REPLACE INTO processed_files (filepath, mtime, size, status) VALUES (?, ?, ?, ?)", (file_path, mtime, size, 'SUCCESS'))
-                        conn.commit()
+                        with metrics.timer('insert', 'lotx', rows=len(records)):
+                            conn.executemany(lot_info_query, records_with_filename)
+                            conn.execute("INSERT OR REPLACE INTO processed_files (filepath, mtime, size, status) VALUES (?, ?, ?, ?)", (file_path, mtime, size, 'SUCCESS'))
+                        with metrics.timer('commit', 'lotx', rows=len(records)):
+                            conn.commit()
                     if archive_processed_files: archive_file(file_path)
+                else:
+                    mark_failed(file_path, mtime, size, records)
 
             # Process CSV files
             void_results_query = f"INSERT OR IGNORE INTO Void_results VALUES ({','.join(['?']*(len(CSV_STANDARD_HEADER)+1))})"
             for file_path, mtime, size in csv_files:
-                df = process_csv_file(file_path)
-                if df is not None:
-                    df['source_filename'] = os.path.basename(file_path)
+                with metrics.timer('parse', 'csv', nbytes=size) as sample:
+                    rows = process_csv_file(file_path)
+                    sample['rows'] = len(rows or ())
+                if rows:
                     with sqlite3.connect(DB_PATH) as conn:
-                        df.to_sql('Void_results', conn, if_exists='append', index=False, method='multi', chunksize=1000)
-                        conn.execute("INSERT OR REPLACE INTO processed_files (filepath, mtime, size, status) VALUES (?, ?, ?, ?)", (file_path, mtime, size, 'SUCCESS'))
-                        conn.commit()
-                    if archive_processed_files: archive_file(file_path)
+                        with metrics.timer('insert', 'csv', rows=len(rows)):
+                            conn.executemany(void_results_query, rows)
+                            conn.execute("INSERT OR REPLACE INTO processed_files (filepath, mtime, size, status) VALUES (?, ?, ?, ?)", (file_path, mtime, size, 'SUCCESS'))
+                        with metrics.timer('commit', 'csv', rows=len(rows)):
+                            conn.commit()
+                    if archive_writer: archive_writer.add(rows, mtime, file_path)
+                    elif archive_processed_files: archive_file(file_path)
+                else:
+                    mark_failed(file_path, mtime, size, rows)
+
+            if archive_writer:
+                # The CSVs are removed only once their rows are in a Parquet file
+                for file_path in archive_writer.flush():
+                    try:
+                        os.remove(file_path)
+                    except OSError as e:
+                        logger.error(f"Failed to remove archived {os.path.basename(file_path)}: {e}")
+                # Once a day, merge the parts of finished days into one file per partition
+                today = time.strftime('%Y-%m-%d')
+                if last_compact_day != today:
+                    compact(PARQUET_ARCHIVE_DIR, today)
+                    last_compact_day = today
             
             print("Processing complete.")
+            logger.info(f"Ingest metrics:\n{metrics.report()}")
+            metrics.write_jsonl(METRICS_FILE)
 
-        print(f"Sleeping for {CHECK_INTERVAL_SECONDS / 60:.0f} minutes...")
-        time.sleep(CHECK_INTERVAL_SECONDS)
+        with sqlite3.connect(DB_PATH) as conn:
+            scanner.commit(conn)
+
+        # Publish the rows added since the last package (kept until the laptop acknowledges it)
+        try:
+            manifest = export_delta(DB_PATH, SYNC_DIR)
+            if manifest:
+                rows = sum(t['rows'] for t in manifest['tables'].values())
+                print(f"Exported sync package {manifest['seq']}: {rows} rows, {manifest['bytes'] / 1e6:.2f} MB.")
+        except OSError as e:
+            print(f"Could not export sync package: {e}")
+            logger.error(f"Sync export failed: {e}")
+
+        if run_once and not watcher.pending:
+            watcher.stop()
+            return
 
 if __name__ == "__main__":
-    main()
+    # --profile: profile the processing loop until Ctrl+C
+    try:
+        with profile_run('edge_processor', '--profile' in sys.argv):
+            main()
+    except KeyboardInterrupt:
+        print("\nEdge Processor stopped.")
@@ -1,8 +1,12 @@
+import os
+import sys
 import sqlite3
-import pandas as pd
 import logging
 import time
-import os
+
+# Shared X-ray helpers: deploy them next to this script or one level up (Xray_data/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from void_schema import VOID_TABLE, VOID_DATA_TABLE, decoded_select
 
 # --- DATABASE MERGE CONFIGURATION ---
 
@@ -14,6 +18,9 @@ DESTINATION_DB_PATH = r'C:\Users\zbrzyy\Documents\Onsemi VN\XrayDatabase\xray_da
 
 LOG_FILE = f'merge_log_{time.strftime("%Y%m%d")}.log'
 
+# Source rowids merged (and committed) per step
+MERGE_CHUNK_ROWS = 200000
+
 # --- LOGGING SETUP ---
 logging.basicConfig(
     filename=LOG_FILE,
@@ -22,43 +29,112 @@ logging.basicConfig(
 )
 logger = logging.getLogger()
 
-def merge_table(source_conn, dest_conn, table_name):
+def setup_watermarks(dest_conn):
+    """Creates the table holding the last merged source rowid per table."""
+    dest_conn.execute("""
+    CREATE TABLE IF NOT EXISTS merge_watermarks (
+        source_db TEXT NOT NULL,
+        table_name TEXT NOT NULL,
+        last_rowid INTEGER NOT NULL,
+        merged_at REAL NOT NULL,
+        PRIMARY KEY (source_db, table_name)
+    )""")
+    dest_conn.commit()
+
+def table_columns(conn, schema, table_name):
+    """Returns the column names of schema.table_name (empty if it does not exist)."""
+    return [row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({table_name})")]
+
+def is_view(conn, schema, table_name):
+    row = conn.execute(f"SELECT type FROM {schema}.sqlite_master WHERE name = ?", (table_name,)).fetchone()
+    return row is not None and row[0] == 'view'
+
+def merge_table(dest_conn, table_name, source_key):
     """
-    Reads all data from a table in the source database and merges it
-    into the same table in the destination database.
-    'INSERT OR IGNORE' prevents duplicate entries based on table's UNIQUE constraints.
+    Copies the rows of src.table_name added since the last merge into the
+    destination table. The source database must be ATTACHed as 'src'.
+    Runs entirely inside SQLite (INSERT OR IGNORE ... SELECT), in rowid ranges
+    of MERGE_CHUNK_ROWS, each committed together with the new watermark, so
+    memory stays flat and an interrupted merge resumes where it stopped.
+    Columns are matched by name; 'INSERT OR IGNORE' skips rows that already
+    exist per the table's UNIQUE constraints.
     """
     print(f"Merging table: {table_name}...")
     logger.info(f"Starting merge for table: {table_name}")
 
     try:
-        # Read all data from the source table into a pandas DataFrame
-        df = pd.read_sql(f'SELECT * FROM {table_name}', source_conn)
-
-        if df.empty:
+        source_cols = table_columns(dest_conn, 'src', table_name)
+        dest_cols = table_columns(dest_conn, 'main', table_name)
+        if not source_cols:
+            print(f"Source table '{table_name}' not found. Skipping.")
+            logger.warning(f"Source table '{table_name}' not found. Skipping merge.")
+            return
+        if not dest_cols:
+            print(f"Destination table '{table_name}' not found. Skipping.")
+            logger.warning(f"Destination table '{table_name}' not found. Skipping merge.")
+            return
+        columns = [col for col in source_cols if col in dest_cols]
+        col_list = ', '.join(columns)
+
+        # Rows are read (and the watermark kept) by rowid of the table holding them
+        rowid_table, source_rows = table_name, f"SELECT * FROM src.{table_name} v"
+        if is_view(dest_conn, 'src', table_name):
+            if table_name != VOID_TABLE:
+                # Other views have no stable rowid to keep a watermark on; copy everything
+                logger.warning(f"Source '{table_name}' is a view, merging without a watermark.")
+                dest_conn.execute(f"INSERT OR IGNORE INTO main.{table_name} ({col_list}) SELECT {col_list} FROM src.{table_name}")
+                dest_conn.commit()
+                print(f"Merged source view '{table_name}' in full.")
+                return
+            # Typed Void_results (void_schema.py): decode Void_results_data rows by their rowid
+            rowid_table, source_rows = VOID_DATA_TABLE, decoded_select(dest_conn, 'src')
+        # Inserts through the typed Void_results view run in its trigger and are not counted
+        count_inserts = not is_view(dest_conn, 'main', table_name)
+
+        max_rowid = dest_conn.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM src.{rowid_table}").fetchone()[0]
+        row = dest_conn.execute(
+            "SELECT last_rowid FROM merge_watermarks WHERE source_db = ? AND table_name = ?",
+            (source_key, rowid_table)
+        ).fetchone()
+        watermark = row[0] if row else 0
+        if watermark > max_rowid:
+            # The source was recreated (e.g. a fresh edge database); start over
+            print(f"Source table '{table_name}' is smaller than at the last merge. Re-merging from the start.")
+            logger.warning(f"{table_name}: watermark {watermark} > source max rowid {max_rowid}, resetting.")
+            watermark = 0
+
+        if watermark == max_rowid:
             print(f"No new records found in source table '{table_name}'. Skipping.")
-            logger.info(f"Source table '{table_name}' is empty. Nothing to merge.")
+            logger.info(f"No new rows in '{table_name}' since rowid {watermark}.")
             return
 
-        # Use DataFrame's to_sql method to append data to the destination table.
-        # The 'append' method combined with the table's UNIQUE constraint handles the merge.
-        # SQLite's 'INSERT OR IGNORE' behavior is implicitly used.
-        df.to_sql(table_name, dest_conn, if_exists='append', index=False)
-        
-        print(f"Successfully merged {len(df)} records into {table_name}.")
-        logger.info(f"Merge successful for {table_name}. {len(df)} source records processed.")
-
-    except pd.io.sql.DatabaseError as e:
-        # This can happen if the table doesn't exist in the source
-        if "no such table" in str(e):
-            print(f"Source table '{table_name}' not found. Skipping.")
-            logger.warning(f"Source table '{table_name}' not found. Skipping merge.")
-        else:
-            print(f"An error occurred during merge for table {table_name}: {e}")
-            logger.error(f"DatabaseError merging {table_name}: {e}")
-    except Exception as e:
-        print(f"An unexpected error occurred during merge for table {table_name}: {e}")
-        logger.error(f"Unexpected error merging {table_name}: {e}")
+        scanned = inserted = 0
+        while watermark < max_rowid:
+            upper = min(watermark + MERGE_CHUNK_ROWS, max_rowid)
+            cursor = dest_conn.execute(
+                f"INSERT OR IGNORE INTO main.{table_name} ({col_list}) "
+                f"SELECT {col_list} FROM ({source_rows} WHERE v.rowid > ? AND v.rowid <= ?)",
+                (watermark, upper)
+            )
+            inserted += max(cursor.rowcount, 0)
+            scanned += dest_conn.execute(
+                f"SELECT COUNT(*) FROM src.{rowid_table} WHERE rowid > ? AND rowid <= ?", (watermark, upper)
+            ).fetchone()[0]
+            dest_conn.execute(
+                "INSERT OR REPLACE INTO merge_watermarks (source_db, table_name, last_rowid, merged_at) VALUES (?, ?, ?, ?)",
+                (source_key, rowid_table, upper, time.time())
+            )
+            dest_conn.commit()
+            watermark = upper
+
+        inserted_msg = f"{inserted} new records" if count_inserts else "new records"
+        print(f"Successfully merged {inserted_msg} into {table_name} ({scanned} source rows read).")
+        logger.info(f"Merge successful for {table_name}. {scanned} source rows read, {inserted_msg} inserted, watermark {watermark}.")
+
+    except sqlite3.Error as e:
+        dest_conn.rollback()
+        print(f"An error occurred during merge for table {table_name}: {e}")
+        logger.error(f"DatabaseError merging {table_name}: {e}")
 
 
 def main():
@@ -78,17 +154,18 @@ def main():
         return
 
     try:
-        # Connect to both databases
-        source_conn = sqlite3.connect(SOURCE_DB_PATH)
+        # Attach the source so rows are copied inside SQLite, never through Python
         dest_conn = sqlite3.connect(DESTINATION_DB_PATH)
+        dest_conn.execute("ATTACH DATABASE ? AS src", (SOURCE_DB_PATH,))
+        setup_watermarks(dest_conn)
+        source_key = os.path.basename(SOURCE_DB_PATH)
 
         # Merge each table
-        merge_table(source_conn, dest_conn, 'Lot_info')
-        merge_table(source_conn, dest_conn, 'Void_results')
+        merge_table(dest_conn, 'Lot_info', source_key)
+        merge_table(dest_conn, 'Void_results', source_key)
         # We don't need to merge 'processed_files' as each DB tracks its own state.
 
-        # Close connections
-        source_conn.close()
+        dest_conn.execute("DETACH DATABASE src")
         dest_conn.close()
 
     except Exception as e:
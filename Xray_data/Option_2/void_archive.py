@@ -0,0 +1,230 @@
+"""
+Columnar archive of processed void-results rows.
+
+Instead of keeping every processed CSV (millions of small files), the edge
+processor rolls the parsed rows into zstd-compressed Parquet files,
+partitioned by test day and Lot:
+
+    <archive_dir>/date=2025-01-31/lot=<Lot>/part-<time>-<n>.parquet
+
+Parts of finished days are compacted into one file per partition, and
+reingest() rebuilds Void_results from the partitions in large batches.
+
+    python void_archive.py reingest <archive_dir> <db_path> [--from 2025-01-01] [--to 2025-01-31] [--lot LOT]
+    python void_archive.py compact <archive_dir>
+
+Needs pyarrow; without it parquet_available() is False and callers keep
+their plain file archive.
+"""
+import os
+import re
+import sys
+import time
+import sqlite3
+import logging
+import threading
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+CSV_STANDARD_HEADER = [
+    'BoardBarcode', 'ModuleIndex', 'JointType', 'Pin', 'TotalVoidRatio',
+    'LargestVoidRatio', 'SpreadX', 'SpreadY', 'GVMean', 'DefectCode',
+    'SystemDefect', 'PinStatus', 'Lot', 'ModuleStatus', 'DeviceStatus'
+]
+ARCHIVE_COLUMNS = CSV_STANDARD_HEADER + ['source_filename']
+LOT_INDEX = CSV_STANDARD_HEADER.index('Lot')
+ARCHIVE_SCHEMA = pa.schema([(col, pa.string()) for col in ARCHIVE_COLUMNS]) if pa else None
+ARCHIVE_FLUSH_ROWS = 500000  # buffered rows written out even before the caller flushes
+COMPACTED_NAME = 'compacted.parquet'
+REINGEST_BATCH_ROWS = 100000
+
+logger = logging.getLogger()
+
+
+def parquet_available():
+    return pq is not None
+
+
+def _partition_value(value):
+    """Lot value as a safe directory name."""
+    if value is None or value == '':
+        return '_none_'
+    return re.sub(r'[^A-Za-z0-9._-]', '_', str(value))
+
+
+def _write_parquet(table, path):
+    tmp_path = path + '.part'
+    pq.write_table(table, tmp_path, compression='zstd')
+    os.replace(tmp_path, path)
+
+
+class VoidArchiveWriter:
+    """
+    Buffers parsed Void_results rows (CSV_STANDARD_HEADER + source_filename)
+    per (day, Lot) partition and writes them as Parquet parts. Thread-safe.
+    flush() returns the source files whose rows are now safely archived, so
+    the caller can delete them.
+    """
+
+    def __init__(self, archive_dir, flush_rows=ARCHIVE_FLUSH_ROWS):
+        self.archive_dir = archive_dir
+        self.flush_rows = flush_rows
+        self._buffers = {}  # (day, lot dir) -> rows
+        self._pending_files = []  # sources with rows still in the buffers
+        self._archived_files = []  # sources whose rows were written by an automatic flush
+        self._rows = 0
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def add(self, rows, mtime, source_path=None):
+        """Buffers the rows of one file; mtime (the test time) selects the day partition."""
+        day = time.strftime('%Y-%m-%d', time.localtime(mtime))
+        with self._lock:
+            for row in rows:
+                self._buffers.setdefault((day, _partition_value(row[LOT_INDEX])), []).append(row)
+            self._rows += len(rows)
+            if source_path:
+                self._pending_files.append(source_path)
+            if self._rows >= self.flush_rows:
+                self._write_buffers()
+
+    def _write_buffers(self):
+        """Writes every buffered partition as a new part (lock held)."""
+        stamp = time.strftime('%H%M%S')
+        for (day, lot), rows in self._buffers.items():
+            partition_dir = os.path.join(self.archive_dir, f"date={day}", f"lot={lot}")
+            os.makedirs(partition_dir, exist_ok=True)
+            self._seq += 1
+            columns = [list(col) for col in zip(*rows)]
+            table = pa.Table.from_arrays(
+                [pa.array(values, pa.string()) for values in columns], schema=ARCHIVE_SCHEMA
+            )
+            _write_parquet(table, os.path.join(partition_dir, f"part-{stamp}-{os.getpid()}-{self._seq}.parquet"))
+        if self._buffers:
+            logger.info(f"Archived {self._rows} rows into {len(self._buffers)} Parquet partitions")
+        self._buffers = {}
+        self._rows = 0
+        self._archived_files.extend(self._pending_files)
+        self._pending_files = []
+
+    def flush(self):
+        """Writes out the buffers; returns the source files archived since the last call."""
+        with self._lock:
+            self._write_buffers()
+            archived, self._archived_files = self._archived_files, []
+        return archived
+
+
+def compact(archive_dir, before_day=None):
+    """
+    Merges the parts of each partition of days before before_day (default:
+    today) into a single compacted file. Returns the number of partitions merged.
+    """
+    before_day = before_day or time.strftime('%Y-%m-%d')
+    merged = 0
+    for day, partition_dir, files in _iter_partitions(archive_dir):
+        if day >= before_day or len(files) < 2:
+            continue
+        paths = [os.path.join(partition_dir, name) for name in files]
+        table = pa.concat_tables([pq.read_table(path) for path in paths])
+        _write_parquet(table, os.path.join(partition_dir, COMPACTED_NAME))
+        for path in paths:
+            if os.path.basename(path) != COMPACTED_NAME:
+                os.remove(path)
+        merged += 1
+    if merged:
+        logger.info(f"Compacted {merged} archive partitions")
+    return merged
+
+
+def _iter_partitions(archive_dir, date_from=None, date_to=None, lots=None):
+    """Yields (day, partition_dir, sorted parquet file names), oldest day first."""
+    if not os.path.isdir(archive_dir):
+        return
+    lot_dirs = {f"lot={_partition_value(lot)}" for lot in lots} if lots else None
+    for date_dir in sorted(os.listdir(archive_dir)):
+        if not date_dir.startswith('date='):
+            continue
+        day = date_dir[len('date='):]
+        if (date_from and day < date_from) or (date_to and day > date_to):
+            continue
+        for lot_dir in sorted(os.listdir(os.path.join(archive_dir, date_dir))):
+            if lot_dirs is not None and lot_dir not in lot_dirs:
+                continue
+            partition_dir = os.path.join(archive_dir, date_dir, lot_dir)
+            files = sorted(name for name in os.listdir(partition_dir) if name.endswith('.parquet'))
+            if files:
+                yield day, partition_dir, files
+
+
+def reingest(archive_dir, db_path, date_from=None, date_to=None, lots=None, batch_rows=REINGEST_BATCH_ROWS):
+    """
+    Inserts the archived rows of the selected partitions into Void_results of
+    db_path (created with the edge schema if missing). Columns are matched by
+    name and existing rows are kept (INSERT OR IGNORE).
+    Returns (files read, rows read, seconds).
+    """
+    start_time = time.time()
+    conn = sqlite3.connect(db_path)
+    files = rows = 0
+    try:
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS Void_results (
+            {', '.join(f'{col} TEXT' for col in CSV_STANDARD_HEADER)},
+            source_filename TEXT, UNIQUE(BoardBarcode, ModuleIndex, JointType, Pin)
+        )""")
+        table_cols = {row[1] for row in conn.execute("PRAGMA table_info(Void_results)")}
+        columns = [col for col in ARCHIVE_COLUMNS if col in table_cols]
+        query = (f"INSERT OR IGNORE INTO Void_results ({', '.join(columns)}) "
+                 f"VALUES ({', '.join('?' * len(columns))})")
+
+        for day, partition_dir, names in _iter_partitions(archive_dir, date_from, date_to, lots):
+            for name in names:
+                parquet_file = pq.ParquetFile(os.path.join(partition_dir, name))
+                for batch in parquet_file.iter_batches(batch_size=batch_rows, columns=columns):
+                    conn.executemany(query, zip(*(batch.column(i).to_pylist() for i in range(len(columns)))))
+                    rows += batch.num_rows
+                conn.commit()
+                files += 1
+            print(f"\rRe-ingested {files} archive files, {rows} rows ({day})", end='', flush=True)
+    finally:
+        conn.close()
+    print()
+    seconds = time.time() - start_time
+    logger.info(f"Re-ingested {rows} rows from {files} archive files in {seconds:.1f}s")
+    return files, rows, seconds
+
+
+def _option(name):
+    if name in sys.argv:
+        index = sys.argv.index(name)
+        if index + 1 < len(sys.argv):
+            return sys.argv[index + 1]
+    return None
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if not parquet_available():
+        print("pyarrow is not installed; the Parquet archive is not available.")
+        return
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command == 'reingest' and len(sys.argv) >= 4:
+        lot = _option('--lot')
+        files, rows, seconds = reingest(sys.argv[2], sys.argv[3], _option('--from'), _option('--to'),
+                                        [lot] if lot else None)
+        print(f"Re-ingested {rows} rows from {files} files in {seconds:.1f}s "
+              f"({rows / seconds if seconds > 0 else 0:.0f} rows/s)")
+    elif command == 'compact' and len(sys.argv) >= 3:
+        print(f"Compacted {compact(sys.argv[2])} partitions.")
+    else:
+        print(__doc__)
+
+
+if __name__ == '__main__':
+    main()
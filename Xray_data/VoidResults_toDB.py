@@ -1,9 +1,13 @@
 import os
-import fnmatch
+import sys
 import sqlite3
+from itertools import chain
 import pandas as pd
 from tqdm import tqdm
-from pandas.errors import EmptyDataError
+from void_csv_loader import load_void_rows, read_void_columns, iter_void_rows
+from raw_cache import RawFileCache, scan_share_files
+from void_partitions import PartitionRouter
+from void_schema import is_typed
 
 # Configuration
 csv_folder = r'C:\Users\zbrzyy\Documents\Onsemi VN\XrayDatabase\Void_results'
@@ -16,17 +20,32 @@ standard_header = [
 batch_size = 5000
 file_pattern = 'XRAY_SIC_*.csv'
 
-def setup_database(conn):
-    """Initialize database structure"""
+# Direct-from-share mode (--from-share): parse the MIPS exports in one pass,
+# without the AutoCopy.py step and its local copy
+share_folders = [r'\\10.240.39.111\mips\Void Result', r'\\10.240.39.195\mips\Void Result']
+raw_cache_dir = r'C:\Users\zbrzyy\Documents\Onsemi VN\XrayDatabase\raw_cache\Void_results'
+raw_cache_max_bytes = 0  # default: no local copy, each file is read once and never written to disk
+raw_cache_opt_in_bytes = 2 * 1024 ** 3  # with --raw-cache: keep raw files for re-processing, LRU-evicted
+
+# Partitioned mode (--partitioned): one database per work-week plus a catalog
+# (void_catalog.db, also holding processed_files); see void_partitions.py
+partition_dir = r'C:\Users\zbrzyy\Documents\Onsemi VN\XrayDatabase\Void_results_partitions'
+
+def setup_database(conn, data_table=True):
+    """Initialize database structure (data_table=False for the partition catalog)"""
     conn.execute("PRAGMA journal_mode = WAL")
     conn.execute("PRAGMA synchronous = OFF")
     
-    conn.execute(f"""
-    CREATE TABLE IF NOT EXISTS Void_results (
-        {', '.join(f'{col} TEXT' for col in standard_header)},
-        UNIQUE(BoardBarcode, ModuleIndex, JointType, Pin)
-    )
-    """)
+    if data_table:
+        conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS Void_results (
+            {', '.join(f'{col} TEXT' for col in standard_header)},
+            UNIQUE(BoardBarcode, ModuleIndex, JointType, Pin)
+        )
+        """)
+        # Lot lookups (GUI_APP/lot_lookup.py) join on this index; the typed layout has its own
+        if not is_typed(conn):
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_void_lot ON Void_results(Lot)")
     
     conn.execute("""
     CREATE TABLE IF NOT EXISTS processed_files (
@@ -35,71 +54,94 @@ def setup_database(conn):
     )
     """)
 
-def process_files():
-    with sqlite3.connect(db_path) as conn:
-        setup_database(conn)
+def process_files(from_share=False, partitioned=False, raw_cache=False):
+    """
+    from_share=True reads the CSVs straight from share_folders, each network
+    read going directly to the parser; raw_cache=True also keeps a local
+    copy of each file (raw_cache_opt_in_bytes).
+    partitioned=True appends each file's rows to the work-week partition of
+    its mtime in partition_dir instead of the single db_path table.
+    """
+    cache_bytes = raw_cache_opt_in_bytes if raw_cache else raw_cache_max_bytes
+    cache = RawFileCache(raw_cache_dir, cache_bytes) if from_share else None
+    router = PartitionRouter(partition_dir) if partitioned else None
+    with router.catalog if router else sqlite3.connect(db_path) as conn:
+        setup_database(conn, data_table=router is None)
         processed = set(pd.read_sql("SELECT filename FROM processed_files", conn)['filename'])
         
-        all_files = [f for f in os.listdir(csv_folder) 
-                    if fnmatch.fnmatch(f, file_pattern) and f not in processed]
+        folders = share_folders if from_share else [csv_folder]
+        all_files = [entry for entry in scan_share_files(folders, file_pattern)
+                     if entry[0] not in processed]
         
         with tqdm(total=len(all_files), desc="Processing files") as pbar:
             for i in range(0, len(all_files), batch_size):
                 batch_files = all_files[i:i+batch_size]
-                batch_data = []
+                batch_data = []  # (rows, mtime) per file
                 processed_files = []
 
-                for filename in batch_files:
-                    file_path = os.path.join(csv_folder, filename)
+                if cache:
+                    reads = cache.read_many(batch_files)
+                else:
+                    reads = ((entry, None, None) for entry in batch_files)
+
+                for (filename, file_path, mtime, size), data, error in reads:
                     try:
-                        # Attempt to read CSV file
-                        df = pd.read_csv(file_path, low_memory=False)
+                        if error:
+                            raise error
+                        # Read the standard columns straight into row tuples
+                        if data is not None:
+                            columns = read_void_columns(data, filename)
+                            rows = list(iter_void_rows(columns)) if columns else None
+                        else:
+                            rows = load_void_rows(file_path)
                         
-                        # Skip empty files
-                        if df.empty:
-                            print(f"Skipping empty file: {filename}")
+                        # Skip empty files and files without standard columns
+                        if rows is None:
+                            print(f"Skipping empty file or file with no standard columns: {filename}")
                             continue
-                            
-                        # Check for required columns
-                        if not set(df.columns).intersection(set(standard_header)):
-                            print(f"Skipping file with no standard columns: {filename}")
-                            continue
-
-                        # Add missing columns and reorder
-                        missing_cols = set(standard_header) - set(df.columns)
-                        for col in missing_cols:
-                            df[col] = None
-                        df = df[standard_header]
 
-                        # Clean data and add to batch
-                        df = df.where(pd.notnull(df), None)
-                        batch_data.extend(df.to_dict('records'))
+                        batch_data.append((rows, mtime))
                         processed_files.append(filename)
 
-                    except EmptyDataError:
-                        print(f"Skipping empty file: {filename}")
                     except Exception as e:
                         print(f"Error processing {filename}: {str(e)}")
 
                 # Bulk insert valid data
                 if batch_data:
                     try:
-                        conn.executemany(
-                            f"INSERT OR IGNORE INTO Void_results ({','.join(standard_header)}) VALUES ({','.join(['?']*len(standard_header))})",
-                            [tuple(record.values()) for record in batch_data]
-                        )
+                        if router:
+                            for rows, mtime in batch_data:
+                                router.insert(rows, mtime)
+                        else:
+                            conn.executemany(
+                                f"INSERT OR IGNORE INTO Void_results ({','.join(standard_header)}) VALUES ({','.join(['?']*len(standard_header))})",
+                                chain.from_iterable(rows for rows, _ in batch_data)
+                            )
                         # Mark files as processed
                         if processed_files:
                             conn.executemany(
                                 "INSERT OR IGNORE INTO processed_files (filename) VALUES (?)",
                                 [(f,) for f in processed_files]
                             )
-                        conn.commit()
+                        if router:
+                            router.commit()
+                        else:
+                            conn.commit()
                     except Exception as e:
-                        conn.rollback()
+                        if router:
+                            router.rollback()
+                        else:
+                            conn.rollback()
                         print(f"Error inserting batch {i//batch_size}: {str(e)}")
                 
                 pbar.update(len(batch_files))
 
+    if router:
+        router.close()
+    if cache:
+        cache.close()
+        print(cache.report())
+
 if __name__ == "__main__":
-    process_files()
+    process_files(from_share='--from-share' in sys.argv, partitioned='--partitioned' in sys.argv,
+                  raw_cache='--raw-cache' in sys.argv)
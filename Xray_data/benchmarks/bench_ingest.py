@@ -0,0 +1,262 @@
+"""
+End-to-end ingest benchmark of the X-ray pipelines on synthetic data.
+
+Generates a synthetic source tree (synthetic_data.py), then runs each
+pipeline against it in its own process, with a fresh database in its own
+work folder, and reports wall time, files/s, rows/s, peak RSS and database
+size:
+
+    unified_pipeline     Option_1/unified_pipeline.py (--workers N)
+    option1              Option_1/option1_combinefile.py UnifiedPipeline
+    lotinfo_todb         LotInfo_toDB.py (.lotx only)
+    voidresults_todb     VoidResults_toDB.py (XRAY_SIC_*.csv only)
+    edge_processor       Option_2/edge_processor.py --once
+
+    python Xray_data/benchmarks/bench_ingest.py [--lots 20] [--workers 2] [--only unified_pipeline,option1]
+        [--data DIR] [--keep DIR] [--save results.jsonl] [--baseline results.jsonl]
+
+--save appends the results as JSON lines; --baseline compares files/s with
+the last saved run of each pipeline and exits with status 1 when one is more
+than REGRESSION_TOLERANCE slower.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import sqlite3
+import tempfile
+import subprocess
+import importlib.util
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+XRAY_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+from synthetic_data import DEFAULTS, generate_dataset
+
+PIPELINES = ['unified_pipeline', 'option1', 'lotinfo_todb', 'voidresults_todb', 'edge_processor']
+REGRESSION_TOLERANCE = 0.15  # files/s drop against the baseline that counts as a regression
+RESULT_PREFIX = 'BENCH_RESULT '
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process and its finished children (None when unknown)."""
+    try:
+        import resource
+    except ImportError:
+        resource = None
+    if resource is not None:
+        peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                   resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+        return peak if sys.platform == 'darwin' else peak * 1024  # Linux reports KiB
+    try:
+        import psutil
+    except ImportError:
+        return None
+    memory = psutil.Process().memory_info()
+    return getattr(memory, 'peak_wset', memory.rss)  # Windows keeps the peak working set
+
+
+def _load(name, path):
+    """Imports a pipeline script by path (they are scripts, not packages)."""
+    sys.path.insert(0, os.path.dirname(path))
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module  # process-pool workers unpickle functions by module name
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_target(target, data_dir, work_dir, workers):
+    """Runs one pipeline on data_dir with its databases in work_dir (the current directory)."""
+    lotx_dir = os.path.join(data_dir, 'Lot-Export')
+    csv_dir = os.path.join(data_dir, 'Void Result')
+    if target == 'unified_pipeline':
+        module = _load('unified_pipeline', os.path.join(XRAY_DIR, 'Option_1', 'unified_pipeline.py'))
+        module.DB_PATH = os.path.join(work_dir, 'xray_data.db')
+        module.SOURCE_LOT_INFO_DIRS = [lotx_dir]
+        module.SOURCE_VOID_RESULTS_DIRS = [csv_dir]
+        sys.argv = [module.__file__, '--workers', str(workers)]
+        module.main()
+    elif target == 'option1':
+        module = _load('option1_combinefile', os.path.join(XRAY_DIR, 'Option_1', 'option1_combinefile.py'))
+        module.CONFIG.update(
+            source_1=[lotx_dir], source_2=[csv_dir],
+            lot_info_db=os.path.join(work_dir, 'Lot_Info_database.db'),
+            void_results_db=os.path.join(work_dir, 'Void_results_database.db'),
+            tracker_db=os.path.join(work_dir, 'file_tracker.db'),
+        )
+        sys.argv = [module.__file__]
+        module.UnifiedPipeline().run_pipeline()
+    elif target == 'lotinfo_todb':
+        module = _load('LotInfo_toDB', os.path.join(XRAY_DIR, 'LotInfo_toDB.py'))
+        module.lotx_folder = lotx_dir
+        module.db_path = os.path.join(work_dir, 'Lot_Info_database.db')
+        module.process_lotx_files()
+    elif target == 'voidresults_todb':
+        module = _load('VoidResults_toDB', os.path.join(XRAY_DIR, 'VoidResults_toDB.py'))
+        module.csv_folder = csv_dir
+        module.db_path = os.path.join(work_dir, 'Void_results_database.db')
+        module.process_files()
+    elif target == 'edge_processor':
+        module = _load('edge_processor', os.path.join(XRAY_DIR, 'Option_2', 'edge_processor.py'))
+        module.SOURCE_LOT_INFO_DIR = lotx_dir
+        module.SOURCE_VOID_RESULTS_DIR = csv_dir
+        module.DB_PATH = os.path.join(work_dir, 'local_xray_data.db')
+        module.SYNC_DIR = os.path.join(work_dir, 'sync')
+        sys.argv = [module.__file__, '--once']
+        module.main()
+    else:
+        raise ValueError(f"Unknown pipeline: {target}")
+
+
+def database_totals(work_dir):
+    """(Lot_info rows, Void_results rows, bytes) over the databases a pipeline left in work_dir."""
+    lot_rows = void_rows = size = 0
+    for name in os.listdir(work_dir):
+        path = os.path.join(work_dir, name)
+        if name.endswith(('.db', '.db-wal')):
+            size += os.path.getsize(path)
+        if not name.endswith('.db'):
+            continue
+        with sqlite3.connect(path) as conn:
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view')")}
+            if 'Lot_info' in tables:
+                lot_rows += conn.execute("SELECT COUNT(*) FROM Lot_info").fetchone()[0]
+            if 'Void_results' in tables:
+                void_rows += conn.execute("SELECT COUNT(*) FROM Void_results").fetchone()[0]
+    return lot_rows, void_rows, size
+
+
+def child_main():
+    """--run <pipeline> <data_dir> <work_dir> <workers>: runs one pipeline and prints its result line."""
+    target, data_dir, work_dir, workers = sys.argv[2:6]
+    os.chdir(work_dir)  # log files and Logs/ land in the work folder
+    started = time.perf_counter()
+    run_target(target, data_dir, work_dir, int(workers))
+    seconds = time.perf_counter() - started
+    peak = peak_rss_bytes()
+    print(RESULT_PREFIX + json.dumps({'seconds': seconds, 'peak_rss': peak}), flush=True)
+
+
+def run_benchmark(target, data_dir, work_dir, workers, files):
+    """Runs one pipeline in a child process; returns its result dict (or None on failure)."""
+    os.makedirs(work_dir, exist_ok=True)
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--run', target, data_dir, work_dir, str(workers)],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+    )
+    lines = [line for line in proc.stdout.splitlines() if line.startswith(RESULT_PREFIX)]
+    if proc.returncode != 0 or not lines:
+        print(f"{target} failed (exit code {proc.returncode}):\n{proc.stderr[-2000:]}")
+        return None
+    child = json.loads(lines[-1][len(RESULT_PREFIX):])
+    lot_rows, void_rows, db_bytes = database_totals(work_dir)
+    seconds = child['seconds']
+    rows = lot_rows + void_rows
+    return {
+        'pipeline': target,
+        'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'workers': workers,
+        'files': files,
+        'lot_rows': lot_rows,
+        'void_rows': void_rows,
+        'seconds': round(seconds, 3),
+        'files_per_s': round(files / seconds, 1) if seconds > 0 else 0.0,
+        'rows_per_s': round(rows / seconds, 1) if seconds > 0 else 0.0,
+        'peak_rss_mb': round(child['peak_rss'] / 1e6, 1) if child['peak_rss'] else None,
+        'db_mb': round(db_bytes / 1e6, 2),
+    }
+
+
+def load_baseline(path):
+    """Last saved result per pipeline from a --save file."""
+    baseline = {}
+    if path and os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    result = json.loads(line)
+                    baseline[result['pipeline']] = result
+    return baseline
+
+
+def _option(name, default=None):
+    if name in sys.argv:
+        index = sys.argv.index(name)
+        if index + 1 < len(sys.argv):
+            return sys.argv[index + 1]
+    return default
+
+
+def main():
+    if '--run' in sys.argv:
+        child_main()
+        return
+
+    workers = int(_option('--workers', 2))
+    targets = _option('--only', ','.join(PIPELINES)).split(',')
+    data_dir = _option('--data')
+    keep_dir = _option('--keep')
+    baseline = load_baseline(_option('--baseline'))
+    root = keep_dir or tempfile.mkdtemp(prefix='xray_bench_')
+
+    try:
+        if data_dir is None:
+            data_dir = os.path.join(root, 'source')
+            options = {}
+            for name, default in DEFAULTS.items():
+                value = _option(f"--{name.replace('_', '-')}")
+                if value is not None:
+                    options[name] = type(default)(value)
+            summary = generate_dataset(data_dir, **options)
+            print(f"Synthetic data: {summary['lotx_files']} .lotx + {summary['csv_files']} .csv files, "
+                  f"{summary['lot_rows']} units, {summary['void_rows']} void rows, {summary['bytes'] / 1e6:.1f} MB")
+        counts = {
+            'lotx': len([n for n in os.listdir(os.path.join(data_dir, 'Lot-Export')) if n.endswith('.lotx')]),
+            'csv': len([n for n in os.listdir(os.path.join(data_dir, 'Void Result')) if n.endswith('.csv')]),
+            'xray_csv': len([n for n in os.listdir(os.path.join(data_dir, 'Void Result')) if n.startswith('XRAY_SIC_')]),
+        }
+        input_files = {
+            'lotinfo_todb': counts['lotx'],
+            'voidresults_todb': counts['xray_csv'],
+        }
+
+        results = []
+        print(f"\n{'pipeline':<18} {'seconds':>8} {'files/s':>9} {'rows/s':>10} {'lot rows':>9} {'void rows':>10} "
+              f"{'peak MB':>8} {'DB MB':>7}")
+        for target in targets:
+            files = input_files.get(target, counts['lotx'] + counts['csv'])
+            result = run_benchmark(target, data_dir, os.path.join(root, target), workers, files)
+            if result is None:
+                continue
+            results.append(result)
+            print(f"{target:<18} {result['seconds']:>8.2f} {result['files_per_s']:>9.1f} {result['rows_per_s']:>10.0f} "
+                  f"{result['lot_rows']:>9} {result['void_rows']:>10} {result['peak_rss_mb'] or 0:>8.1f} "
+                  f"{result['db_mb']:>7.1f}")
+    finally:
+        if keep_dir is None:
+            shutil.rmtree(root, ignore_errors=True)
+
+    save_path = _option('--save')
+    if save_path:
+        with open(save_path, 'a', encoding='utf-8') as f:
+            for result in results:
+                f.write(json.dumps(result) + '\n')
+        print(f"\nResults appended to {save_path}")
+
+    regressions = []
+    for result in results:
+        previous = baseline.get(result['pipeline'])
+        if previous and previous['files_per_s'] > 0:
+            change = result['files_per_s'] / previous['files_per_s'] - 1
+            print(f"{result['pipeline']:<18} {change:+.1%} files/s vs. baseline ({previous['recorded_at']})")
+            if change < -REGRESSION_TOLERANCE:
+                regressions.append(result['pipeline'])
+    if regressions:
+        print(f"Regression: {', '.join(regressions)} slower than the baseline by more than {REGRESSION_TOLERANCE:.0%}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark: streaming LOTX parser (lotx_parser.iter_lotx_rows) vs. the old ET.parse parser.
+
+Generates synthetic .lotx files with 10k+ units in a temp folder and reports
+the best-of-N parse time and peak Python memory (tracemalloc) for both.
+
+    python Xray_data/benchmarks/bench_lotx_parser.py [--repeat 5]
+"""
+import os
+import sys
+import time
+import tempfile
+import tracemalloc
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from lotx_parser import iter_lotx_rows
+from synthetic_data import write_lotx
+
+# (trays, units per tray) for each synthetic file
+SIZES = [(50, 200), (200, 250), (500, 400)]
+
+
+def legacy_parse(file_path):
+    """The ET.parse based parser previously copied into every pipeline."""
+    root = ET.parse(file_path).getroot()
+    lot_attrs = {
+        'lot_id': root.attrib.get('Id'), 'recipe': root.attrib.get('Recipe'),
+        'allow_size_null': root.attrib.get('AllowSizeNull'),
+        'count_unique_barcodes_only': root.attrib.get('CountUniqueBarcodesOnly'),
+        'size': int(root.attrib.get('Size', 0)), 'carrier_index': int(root.attrib.get('CarrierIndex', 0))
+    }
+    batch = []
+    trays = root.find('Trays')
+    for tray in trays if trays is not None else []:
+        tray_attrs = {'tray_id': tray.attrib.get('Id'), 'tray_state': int(tray.attrib.get('State', 0)), 'tray_code': tray.attrib.get('Code')}
+        units = tray.find('Units')
+        for unit in units if units is not None else []:
+            unit_attrs = {'unit_id': unit.attrib.get('Id'), 'unit_state': int(unit.attrib.get('State', 0)), 'unit_code': unit.attrib.get('Code'), 'unit_idx': int(unit.attrib.get('Idx', 0))}
+            batch.append((
+                lot_attrs['lot_id'], lot_attrs['recipe'], lot_attrs['allow_size_null'], lot_attrs['count_unique_barcodes_only'],
+                lot_attrs['size'], lot_attrs['carrier_index'], tray_attrs['tray_id'], tray_attrs['tray_state'], tray_attrs['tray_code'],
+                unit_attrs['unit_id'], unit_attrs['unit_state'], unit_attrs['unit_code'], unit_attrs['unit_idx']
+            ))
+    return batch
+
+
+def consume_legacy(path):
+    return len(legacy_parse(path))
+
+
+def consume_streaming(path):
+    # Rows are consumed one at a time, as a batched executemany would
+    return sum(1 for _ in iter_lotx_rows(path))
+
+
+def measure(func, path, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = func(path)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    func(path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return count, best, peak
+
+
+def main():
+    repeat = int(sys.argv[sys.argv.index('--repeat') + 1]) if '--repeat' in sys.argv else 5
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'units':>8} {'file MB':>8} | {'legacy s':>9} {'peak MB':>8} | {'stream s':>9} {'peak MB':>8} | speedup")
+        for trays, units in SIZES:
+            path = os.path.join(tmp, f'synthetic_{trays}x{units}.lotx')
+            write_lotx(path, 'LVT31A06J', trays, units)
+            assert legacy_parse(path) == list(iter_lotx_rows(path)), "parsers disagree"
+
+            n_old, t_old, m_old = measure(consume_legacy, path, repeat)
+            n_new, t_new, m_new = measure(consume_streaming, path, repeat)
+            assert n_old == n_new
+            print(f"{n_new:>8} {os.path.getsize(path) / 1e6:>8.1f} | {t_old:>9.3f} {m_old / 1e6:>8.1f} | "
+                  f"{t_new:>9.3f} {m_new / 1e6:>8.2f} | {t_old / t_new:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
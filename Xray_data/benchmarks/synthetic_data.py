@@ -0,0 +1,153 @@
+"""
+Synthetic MIPS X-ray exports for benchmarks.
+
+Writes a source tree shaped like the X-ray machine shares:
+
+    <out_dir>/Lot-Export/<Lot>.lotx               one per lot (trays x units)
+    <out_dir>/Void Result/XRAY_SIC_<Lot>_<n>.csv  void results per board
+    <out_dir>/Void Result/B1T_SIC_<Lot>_<n>.csv   (every b1t_every-th file, other column order)
+
+Output is deterministic for a given seed. Some CSVs carry extra vendor
+columns, and every missing_every-th CSV drops some standard columns, like the
+older machine exports, so the usecols / missing-column paths get exercised too.
+
+    python Xray_data/benchmarks/synthetic_data.py <out_dir> [--lots 20] [--trays 10] [--units 100] [--pins 20]
+"""
+import os
+import sys
+import random
+
+CSV_STANDARD_HEADER = [
+    'BoardBarcode', 'ModuleIndex', 'JointType', 'Pin', 'TotalVoidRatio',
+    'LargestVoidRatio', 'SpreadX', 'SpreadY', 'GVMean', 'DefectCode',
+    'SystemDefect', 'PinStatus', 'Lot', 'ModuleStatus', 'DeviceStatus'
+]
+EXTRA_COLUMNS = ['ImagePath', 'InspectTime']  # present in real exports, not ingested
+MISSING_COLUMNS = ['SpreadX', 'SpreadY', 'DefectCode', 'DeviceStatus']  # absent from old-format files
+JOINT_TYPES = ['DA', 'WB1', 'WB2', 'CLIP']
+
+# Defaults for generate_dataset() and the command line
+DEFAULTS = {
+    'lots': 20,
+    'trays': 10,             # trays per lot
+    'units': 100,            # units per tray
+    'boards_per_csv': 25,    # boards per void-results file
+    'modules': 4,            # modules per board
+    'pins': 20,              # pins per module
+    'missing_every': 7,      # every n-th CSV drops MISSING_COLUMNS (0 = never)
+    'b1t_every': 5,          # every n-th CSV is a B1T_SIC file (0 = never)
+    'seed': 0,
+}
+
+
+def write_lotx(path, lot_id, trays, units_per_tray, rng=None):
+    """Writes a .lotx file shaped like the MIPS Lot-Export output."""
+    rng = rng or random.Random(0)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="utf-8"?>\n')
+        f.write(f'<Lot Id="{lot_id}" Recipe="SIC_L2" AllowSizeNull="False" '
+                f'CountUniqueBarcodesOnly="True" Size="{trays * units_per_tray}" CarrierIndex="1">\n<Trays>\n')
+        for t in range(trays):
+            f.write(f'  <Tray Id="M{t:02d}-SFT{lot_id[-5:]}{t:03d}" State="2" Code="GD">\n    <Units>\n')
+            for u in range(units_per_tray):
+                code = 'RV' if rng.random() < 0.06 else 'GD'
+                f.write(f'      <Unit Id="R{u // 10 + 1:02d}C{u % 10 + 1:02d}" State="1" Code="{code}" Idx="{u}" />\n')
+            f.write('    </Units>\n  </Tray>\n')
+        f.write('</Trays>\n</Lot>\n')
+    return trays * units_per_tray
+
+
+def write_void_csv(path, lot_id, boards, modules, pins, columns=None, rng=None):
+    """
+    Writes a void-results CSV with one row per (board, module, pin). columns
+    sets the header (default CSV_STANDARD_HEADER); non-standard columns get
+    filler values. Returns the number of rows.
+    """
+    rng = rng or random.Random(0)
+    columns = columns or CSV_STANDARD_HEADER
+    rows = 0
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write(','.join(columns) + '\n')
+        for _ in range(boards):
+            barcode = f"{lot_id}{rng.getrandbits(40):010X}"
+            for module in range(modules):
+                failed = rng.random() < 0.03
+                for pin in range(pins):
+                    total = rng.uniform(0.5, 30.0 if failed else 12.0)
+                    values = {
+                        'BoardBarcode': barcode, 'ModuleIndex': str(module),
+                        'JointType': JOINT_TYPES[pin % len(JOINT_TYPES)], 'Pin': str(pin),
+                        'TotalVoidRatio': f"{total:.2f}", 'LargestVoidRatio': f"{total * rng.uniform(0.2, 0.9):.2f}",
+                        'SpreadX': str(rng.randint(0, 5)), 'SpreadY': str(rng.randint(0, 5)),
+                        'GVMean': f"{rng.uniform(80, 160):.1f}", 'DefectCode': 'VOID' if failed else '',
+                        'SystemDefect': '0', 'PinStatus': 'NG' if failed and total > 25 else 'OK', 'Lot': lot_id,
+                        'ModuleStatus': 'NG' if failed else 'GD', 'DeviceStatus': 'NG' if failed else 'GD',
+                        'ImagePath': f"D:\\Images\\{barcode}_{module}.png", 'InspectTime': '2025-01-31 08:00:00',
+                    }
+                    f.write(','.join(values.get(col, '') for col in columns) + '\n')
+                    rows += 1
+    return rows
+
+
+def generate_dataset(out_dir, **options):
+    """
+    Writes a full synthetic source tree (see DEFAULTS for the options) and
+    returns a summary: folders, file counts, expected rows and bytes written.
+    """
+    config = dict(DEFAULTS, **options)
+    rng = random.Random(config['seed'])
+    lotx_dir = os.path.join(out_dir, 'Lot-Export')
+    csv_dir = os.path.join(out_dir, 'Void Result')
+    os.makedirs(lotx_dir, exist_ok=True)
+    os.makedirs(csv_dir, exist_ok=True)
+
+    summary = {'lotx_dir': lotx_dir, 'csv_dir': csv_dir, 'lotx_files': 0, 'csv_files': 0,
+               'b1t_files': 0, 'lot_rows': 0, 'void_rows': 0, 'bytes': 0}
+    units_per_lot = config['trays'] * config['units']
+    csv_per_lot = max(1, units_per_lot // max(1, config['boards_per_csv'] * config['modules']))
+    csv_index = 0
+    for lot in range(config['lots']):
+        lot_id = f"LVT{lot:05d}J"
+        path = os.path.join(lotx_dir, f"{lot_id}.lotx")
+        summary['lot_rows'] += write_lotx(path, lot_id, config['trays'], config['units'], rng)
+        summary['lotx_files'] += 1
+        summary['bytes'] += os.path.getsize(path)
+
+        for n in range(csv_per_lot):
+            csv_index += 1
+            columns = list(CSV_STANDARD_HEADER)
+            if config['missing_every'] and csv_index % config['missing_every'] == 0:
+                columns = [col for col in columns if col not in MISSING_COLUMNS]
+            if csv_index % 2 == 0:
+                columns += EXTRA_COLUMNS
+            if config['b1t_every'] and csv_index % config['b1t_every'] == 0:
+                columns = columns[::-1]  # B1T exports list the columns in another order
+                name = f"B1T_SIC_{lot_id}_{n}.csv"
+                summary['b1t_files'] += 1
+            else:
+                name = f"XRAY_SIC_{lot_id}_{n}.csv"
+            path = os.path.join(csv_dir, name)
+            summary['void_rows'] += write_void_csv(
+                path, lot_id, config['boards_per_csv'], config['modules'], config['pins'], columns, rng)
+            summary['csv_files'] += 1
+            summary['bytes'] += os.path.getsize(path)
+    return summary
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1].startswith('--'):
+        print(__doc__)
+        return
+    options = {}
+    for name, default in DEFAULTS.items():
+        flag = f"--{name.replace('_', '-')}"
+        if flag in sys.argv:
+            options[name] = type(default)(sys.argv[sys.argv.index(flag) + 1])
+    summary = generate_dataset(sys.argv[1], **options)
+    print(f"{summary['lotx_files']} .lotx files ({summary['lot_rows']} units), "
+          f"{summary['csv_files']} .csv files ({summary['b1t_files']} B1T, {summary['void_rows']} rows), "
+          f"{summary['bytes'] / 1e6:.1f} MB in {sys.argv[1]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+import os
+import time
+import logging
+
+# Entries older than the stored high-water mtime minus this slack are skipped.
+# The slack covers coarse SMB timestamps and files still being written at scan time.
+MTIME_SLACK_SECONDS = 300
+# Force a scan without the mtime cutoff this often (catches files copied with old mtimes)
+FULL_RESCAN_HOURS = 24
+# processed_files lookups are batched to stay below SQLite's parameter limit
+LOOKUP_CHUNK = 500
+
+logger = logging.getLogger()
+
+
+def ensure_snapshot_table(conn):
+    """Creates the per-directory scan snapshot table."""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS scan_snapshots (
+        directory TEXT NOT NULL,
+        extension TEXT NOT NULL,
+        last_scan REAL NOT NULL,
+        last_full_scan REAL NOT NULL,
+        high_water_mtime REAL NOT NULL,
+        PRIMARY KEY (directory, extension)
+    )""")
+
+
+def filter_processed(conn, candidates):
+    """Keeps (file_path, mtime, size) candidates whose (mtime, size) differs from processed_files."""
+    changed = []
+    for i in range(0, len(candidates), LOOKUP_CHUNK):
+        chunk = candidates[i:i + LOOKUP_CHUNK]
+        placeholders = ','.join('?' * len(chunk))
+        known = {
+            row[0]: (row[1], row[2]) for row in conn.execute(
+                f"SELECT filepath, mtime, size FROM processed_files WHERE filepath IN ({placeholders})",
+                [c[0] for c in chunk]
+            )
+        }
+        changed.extend(c for c in chunk if known.get(c[0]) != (c[1], c[2]))
+    return changed
+
+
+class SnapshotScanner:
+    """
+    Incremental directory scanner built on os.scandir.
+
+    Stat data comes from the directory listing itself, so there is no extra
+    round-trip per file on SMB shares. A snapshot per (directory, extension)
+    keeps the high-water mtime of the last scan; later scans only look up
+    entries newer than it in processed_files instead of reloading the table.
+    Snapshots are staged by scan() and only persisted by commit(), which should
+    be called once the returned files have been processed.
+    With an IngestMetrics, each directory's listing, stat calls and
+    processed_files lookup are recorded as the list/stat/lookup stages.
+    """
+
+    def __init__(self, mtime_slack=MTIME_SLACK_SECONDS, full_rescan_hours=FULL_RESCAN_HOURS, metrics=None):
+        self.mtime_slack = mtime_slack
+        self.full_rescan_seconds = full_rescan_hours * 3600
+        self.metrics = metrics
+        self._pending = {}
+        self.stats = {'listed': 0, 'candidates': 0, 'new_or_modified': 0}
+
+    def scan(self, conn, source_dirs, extension):
+        """Returns (file_path, mtime, size) for new or modified files in source_dirs."""
+        if isinstance(source_dirs, str):
+            source_dirs = [source_dirs]
+
+        files_to_process = []
+        for src_dir in source_dirs:
+            scan_started = time.time()
+            snapshot = conn.execute(
+                "SELECT last_full_scan, high_water_mtime FROM scan_snapshots WHERE directory = ? AND extension = ?",
+                (src_dir, extension)
+            ).fetchone()
+
+            full_scan = snapshot is None or scan_started - snapshot[0] >= self.full_rescan_seconds
+            cutoff = None if full_scan else snapshot[1] - self.mtime_slack
+            high_water = 0.0 if snapshot is None else snapshot[1]
+
+            candidates = []
+            listed = 0
+            stat_seconds = 0.0
+            list_started = time.perf_counter()
+            try:
+                with os.scandir(src_dir) as entries:
+                    for entry in entries:
+                        if not entry.name.endswith(extension):
+                            continue
+                        try:
+                            if not entry.is_file():
+                                continue
+                            stat_started = time.perf_counter()
+                            stat = entry.stat()
+                            stat_seconds += time.perf_counter() - stat_started
+                        except FileNotFoundError:
+                            logger.warning(f"File not found during scan: {entry.path}")
+                            continue
+                        listed += 1
+                        high_water = max(high_water, stat.st_mtime)
+                        if cutoff is not None and stat.st_mtime < cutoff:
+                            continue
+                        candidates.append((entry.path, stat.st_mtime, stat.st_size))
+            except FileNotFoundError:
+                logger.warning(f"Source directory not found: {src_dir}")
+                continue
+            except OSError as e:
+                logger.error(f"Cannot access directory {src_dir}: {e}")
+                continue
+
+            list_seconds = time.perf_counter() - list_started - stat_seconds
+            lookup_started = time.perf_counter()
+            self.stats['listed'] += listed
+            self.stats['candidates'] += len(candidates)
+            changed = filter_processed(conn, candidates)
+            self.stats['new_or_modified'] += len(changed)
+            if self.metrics is not None:
+                file_type = extension.lstrip('.')
+                self.metrics.record('list', list_seconds, file_type, files=listed)
+                self.metrics.record('stat', stat_seconds, file_type, files=listed)
+                self.metrics.record('lookup', time.perf_counter() - lookup_started, file_type, files=len(candidates))
+            files_to_process.extend(changed)
+
+            last_full_scan = scan_started if full_scan else snapshot[0]
+            self._pending[(src_dir, extension)] = (scan_started, last_full_scan, high_water)
+            logger.info(
+                f"Scanned {src_dir} ({'full' if full_scan else 'incremental'}): "
+                f"{len(candidates)} candidates, {len(changed)} new/modified"
+            )
+        return files_to_process
+
+    def commit(self, conn):
+        """Persists the snapshots staged by previous scan() calls."""
+        if not self._pending:
+            return
+        conn.executemany(
+            "INSERT OR REPLACE INTO scan_snapshots (directory, extension, last_scan, last_full_scan, high_water_mtime) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [key + value for key, value in self._pending.items()]
+        )
+        conn.commit()
+        self._pending.clear()
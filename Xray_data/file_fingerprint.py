@@ -0,0 +1,192 @@
+import hashlib
+import logging
+import concurrent.futures
+
+# Prefer xxhash for full-content hashes when installed; blake2b is in the stdlib
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+# Bytes hashed from the start and the end of each file for the quick fingerprint
+SAMPLE_BYTES = 64 * 1024
+FULL_HASH_CHUNK = 1024 * 1024
+# Fingerprinting is I/O bound (SMB round-trips), so a few threads overlap the waits
+FINGERPRINT_THREADS = 8
+# file_fingerprints lookups are batched to stay below SQLite's parameter limit
+LOOKUP_CHUNK = 500
+
+logger = logging.getLogger()
+
+
+def ensure_fingerprint_table(conn):
+    """Creates the content fingerprint table used to skip byte-identical files."""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS file_fingerprints (
+        filepath TEXT PRIMARY KEY,
+        quick_hash TEXT NOT NULL,
+        full_hash TEXT
+    )""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_file_fingerprints_quick ON file_fingerprints(quick_hash)")
+
+
+def quick_fingerprint(file_path, size, sample_bytes=SAMPLE_BYTES):
+    """
+    Hashes the size plus the first and last sample_bytes of a file. For files
+    up to 2 * sample_bytes this covers the whole content, so a match is exact.
+    """
+    h = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(file_path, 'rb') as f:
+        h.update(f.read(sample_bytes))
+        if size > 2 * sample_bytes:
+            f.seek(size - sample_bytes)
+            h.update(f.read(sample_bytes))
+        elif size > sample_bytes:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def full_fingerprint(file_path):
+    """Hashes the whole file (xxh3_128 if xxhash is installed, else blake2b)."""
+    h = xxhash.xxh3_128() if xxhash is not None else hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(FULL_HASH_CHUNK), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _path_and_size(item):
+    return item[0], item[2]
+
+
+class ContentDeduper:
+    """
+    Skips files whose content was already ingested under another path, or under
+    the same path with a new mtime. A cheap head/tail fingerprint is compared
+    first; only on a tie is the full content hashed. Fingerprints are staged by
+    filter() and only persisted by commit(), once the files have been written.
+    """
+
+    def __init__(self, sample_bytes=SAMPLE_BYTES, threads=FINGERPRINT_THREADS):
+        self.sample_bytes = sample_bytes
+        self.threads = threads
+        self._pending = {}
+        self._backfilled = set()  # stored entries whose full hash was filled in
+        self.stats = {'checked': 0, 'duplicates': 0, 'full_hashes': 0, 'unreadable': 0}
+
+    def _quick(self, path, size):
+        try:
+            return quick_fingerprint(path, size, self.sample_bytes)
+        except OSError as e:
+            logger.warning(f"Cannot fingerprint {path}: {e}")
+            return None
+
+    def _full(self, path):
+        self.stats['full_hashes'] += 1
+        try:
+            return full_fingerprint(path)
+        except OSError:
+            return None
+
+    def filter(self, conn, files, key=_path_and_size):
+        """
+        Splits files into (unique, duplicates). `key(item)` returns
+        (file_path, size); the default fits (path, mtime, size) tuples.
+        duplicates is a list of (item, original_path).
+        """
+        if not files:
+            return [], []
+        paths_sizes = [key(item) for item in files]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.threads) as pool:
+            quick_hashes = list(pool.map(lambda ps: self._quick(*ps), paths_sizes))
+
+        known = self._lookup(conn, {h for h in quick_hashes if h is not None})
+        unique, duplicates = [], []
+        for item, (path, size), quick in zip(files, paths_sizes, quick_hashes):
+            self.stats['checked'] += 1
+            if quick is None:
+                self.stats['unreadable'] += 1
+                unique.append(item)  # let the parser report the error
+                continue
+
+            original, full = self._match(path, size, quick, known.get(quick, []))
+            if original is not None:
+                duplicates.append((item, original))
+                self.stats['duplicates'] += 1
+                continue
+
+            entry = [path, full]
+            known.setdefault(quick, []).append(entry)
+            self._pending[path] = (quick, entry)
+            unique.append(item)
+
+        if duplicates:
+            logger.info(f"Skipping {len(duplicates)} duplicate file(s) out of {len(files)}")
+        return unique, duplicates
+
+    def _match(self, path, size, quick, entries):
+        """
+        Returns (path of an entry with identical content or None, full hash of
+        the file if it had to be computed). Entries are [filepath, full_hash].
+        """
+        if not entries:
+            return None, None
+        if size <= 2 * self.sample_bytes:
+            return entries[0][0], None  # the quick hash already covered every byte
+
+        full = self._full(path)
+        if full is None:
+            return None, None
+        for entry in entries:
+            if entry[1] is None:
+                if entry[0] == path:
+                    continue  # the old content of this path is gone; re-reading it proves nothing
+                entry[1] = self._full(entry[0])
+                if entry[0] not in self._pending and entry[1] is not None:
+                    self._pending[entry[0]] = (quick, entry)
+                    self._backfilled.add(entry[0])
+            if entry[1] == full:
+                return entry[0], full
+        return None, full
+
+    @staticmethod
+    def _lookup(conn, quick_hashes):
+        """Loads [filepath, full_hash] entries for the given quick hashes."""
+        known = {}
+        hashes = list(quick_hashes)
+        for i in range(0, len(hashes), LOOKUP_CHUNK):
+            chunk = hashes[i:i + LOOKUP_CHUNK]
+            placeholders = ','.join('?' * len(chunk))
+            for filepath, quick, full in conn.execute(
+                f"SELECT filepath, quick_hash, full_hash FROM file_fingerprints WHERE quick_hash IN ({placeholders})",
+                chunk
+            ):
+                known.setdefault(quick, []).append([filepath, full])
+        return known
+
+    def commit(self, conn, paths=None):
+        """
+        Persists the fingerprints staged by previous filter() calls. With paths,
+        only those files (the ones actually ingested) are persisted; the others
+        are dropped so a failed read or parse is retried on the next run instead
+        of matching its own stale fingerprint.
+        """
+        pending = self._pending
+        if paths is not None:
+            paths = set(paths)
+            pending = {path: staged for path, staged in pending.items()
+                       if path in paths or path in self._backfilled}
+        if pending:
+            conn.executemany(
+                "INSERT OR REPLACE INTO file_fingerprints (filepath, quick_hash, full_hash) VALUES (?, ?, ?)",
+                [(path, quick, entry[1]) for path, (quick, entry) in pending.items()]
+            )
+            conn.commit()
+        self._pending.clear()
+        self._backfilled.clear()
+
+    def report(self):
+        """One-line summary of the dedup pass."""
+        s = self.stats
+        return (f"Dedup: {s['checked']} files fingerprinted, {s['duplicates']} duplicates skipped, "
+                f"{s['full_hashes']} full hashes, {s['unreadable']} unreadable")
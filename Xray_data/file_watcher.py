@@ -0,0 +1,180 @@
+import os
+import time
+import logging
+import threading
+
+# Filesystem notifications when watchdog is installed, adaptive polling otherwise
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+# A file is handed out once its (mtime, size) has not changed for this long
+DEBOUNCE_SECONDS = 2.0
+# Scanned files older than this are treated as complete without a second stat
+SETTLED_AGE_SECONDS = 60.0
+# Polling interval bounds; the interval halves when files arrive and grows by
+# POLL_BACKOFF on every empty poll
+MIN_POLL_SECONDS = 2.0
+MAX_POLL_SECONDS = 300.0
+POLL_BACKOFF = 1.5
+# With notifications a rescan still runs this often, since events on network
+# shares can be dropped
+SAFETY_RESCAN_SECONDS = 900.0
+
+logger = logging.getLogger()
+
+
+class _EventHandler(FileSystemEventHandler):
+    """Forwards created/modified/moved files with a watched extension to the watcher."""
+
+    def __init__(self, watcher, extension):
+        self.watcher = watcher
+        self.extension = extension
+
+    def on_any_event(self, event):
+        if event.is_directory or event.event_type not in ('created', 'modified', 'moved'):
+            return
+        path = getattr(event, 'dest_path', None) or event.src_path
+        if path.endswith(self.extension):
+            self.watcher.touch(path)
+
+
+class DirectoryWatcher:
+    """
+    Debounced change queue over a set of source directories.
+
+    Paths reported by filesystem events (touch) or by the caller's own scans
+    (record_scan) are held until their (mtime, size) has been stable for
+    debounce_seconds, so files still being written are never handed out.
+    wait() blocks until such paths are ready or the next scan is due. Without
+    watchdog the scan interval adapts to the arrival rate: short while files
+    keep coming, backing off towards max_poll when the source is idle.
+    """
+
+    def __init__(self, dir_map, debounce_seconds=DEBOUNCE_SECONDS, min_poll=MIN_POLL_SECONDS,
+                 max_poll=MAX_POLL_SECONDS, safety_rescan=SAFETY_RESCAN_SECONDS, use_notifications=True):
+        self.dir_map = dir_map  # extension -> list of directories
+        self.debounce_seconds = debounce_seconds
+        self.min_poll = min_poll
+        self.max_poll = max_poll
+        self.safety_rescan = safety_rescan
+        self.use_notifications = use_notifications and Observer is not None
+        self.interval = min_poll
+        self.next_scan = 0.0
+        self._pending = {}  # path -> ((mtime, size), time the signature was last seen changing)
+        self._ready = []
+        self._cond = threading.Condition()
+        self._observer = None
+
+    @property
+    def backend(self):
+        return 'watchdog' if self._observer is not None else 'polling'
+
+    def start(self):
+        """Starts the notification observer when available."""
+        if not self.use_notifications:
+            logger.info("Watch mode: watchdog not available, using adaptive polling")
+            return
+        observer = Observer()
+        for extension, dirs in self.dir_map.items():
+            for directory in dirs:
+                try:
+                    observer.schedule(_EventHandler(self, extension), directory, recursive=False)
+                except OSError as e:
+                    logger.warning(f"Cannot watch {directory}, relying on rescans: {e}")
+        observer.start()
+        self._observer = observer
+        logger.info("Watch mode: using filesystem notifications")
+
+    def stop(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+
+    def touch(self, path):
+        """Queues a path for a debounced check (called from observer threads)."""
+        with self._cond:
+            if path not in self._pending:
+                self._pending[path] = (None, time.time())
+            self._cond.notify()
+
+    @property
+    def pending(self):
+        """Number of queued paths not handed out by wait() yet."""
+        with self._cond:
+            return len(self._pending) + len(self._ready)
+
+    def scan_due(self):
+        return time.time() >= self.next_scan
+
+    def record_scan(self, files):
+        """
+        Queues the (file_path, mtime, size) entries found by a scan and
+        schedules the next one. Old files are ready at once, recent ones go
+        through the debounce check. The polling interval shrinks while new
+        files keep arriving and backs off when a scan finds nothing new
+        (paths already queued do not count).
+        """
+        now = time.time()
+        queued = 0
+        with self._cond:
+            for path, mtime, size in files:
+                if path in self._pending or path in self._ready:
+                    continue
+                if now - mtime >= SETTLED_AGE_SECONDS:
+                    self._ready.append(path)
+                else:
+                    self._pending[path] = ((mtime, size), now)
+                queued += 1
+            self._cond.notify()
+        self.schedule_next(queued > 0)
+
+    def schedule_next(self, found):
+        """Schedules the next scan, adapting the polling interval to whether the last one found files."""
+        if self._observer is not None:
+            self.next_scan = time.time() + self.safety_rescan
+            return
+        if found:
+            self.interval = max(self.min_poll, self.interval / 2)
+        else:
+            self.interval = min(self.max_poll, self.interval * POLL_BACKOFF)
+        self.next_scan = time.time() + self.interval
+
+    def _collect_ready(self):
+        """Returns pending paths whose (mtime, size) has settled; drops vanished files."""
+        now = time.time()
+        ready, self._ready = self._ready, []
+        for path, (signature, changed_at) in list(self._pending.items()):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                del self._pending[path]
+                continue
+            except OSError:
+                continue
+            current = (stat.st_mtime, stat.st_size)
+            if current != signature:
+                self._pending[path] = (current, now)
+            elif now - changed_at >= self.debounce_seconds:
+                ready.append(path)
+                del self._pending[path]
+        return ready
+
+    def wait(self):
+        """
+        Blocks until debounced paths are ready or the next scan is due.
+        Returns the ready paths (possibly empty when a scan is due).
+        """
+        with self._cond:
+            while True:
+                ready = self._collect_ready()
+                if ready or self.scan_due():
+                    return ready
+                timeout = self.next_scan - time.time()
+                if self._pending:
+                    timeout = min(timeout, self.debounce_seconds / 2)
+                self._cond.wait(timeout=max(0.05, timeout))
@@ -0,0 +1,234 @@
+"""
+Per-stage timing for the X-ray ingest pipelines.
+
+Each pipeline run records how long its stages take, per file type:
+
+    list    directory listing (os.scandir) of the source shares
+    stat    stat calls on the listed entries
+    lookup  processed-file checks against the database
+    read    reading file bytes
+    parse   parsing one file into rows
+    insert  executemany of a batch of rows
+    commit  one SQLite commit
+    mark    recording files as processed
+
+For every (stage, file type) the summary holds calls, files, rows, bytes,
+busy seconds, files/s and rows/s per busy second and p50/p95/max latency.
+It is appended to a JSON-lines file or to an `ingest_metrics` table.
+
+    metrics = IngestMetrics('unified_pipeline')
+    with metrics.timer('parse', 'csv', nbytes=size) as sample:
+        rows = parse(path)
+        sample['rows'] = len(rows)
+    print(metrics.report())
+    metrics.write_jsonl('ingest_metrics.jsonl')
+
+profile_run() wraps a whole run in pyinstrument (when installed) or cProfile;
+both only sample the calling thread. Threaded pipelines wrap their worker
+functions with ThreadProfiles.wrap() instead and dump() one merged profile.
+"""
+import os
+import json
+import pstats
+import cProfile
+import time
+import uuid
+import random
+import logging
+import threading
+from contextlib import contextmanager
+
+MAX_SAMPLES = 10000  # latencies kept per (stage, file type) for the percentiles (reservoir)
+
+logger = logging.getLogger()
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))]
+
+
+class IngestMetrics:
+    """Thread-safe accumulator of stage timings for one pipeline run."""
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+        self.run_id = uuid.uuid4().hex[:12]
+        self.started = time.time()
+        self._stages = {}  # (stage, file_type) -> counters and latency samples
+        self._lock = threading.Lock()
+        self._random = random.Random(0)
+
+    def record(self, stage, seconds, file_type=None, files=0, rows=0, nbytes=0):
+        """Adds one timed call of a stage."""
+        with self._lock:
+            entry = self._stages.get((stage, file_type))
+            if entry is None:
+                entry = {'calls': 0, 'files': 0, 'rows': 0, 'bytes': 0, 'seconds': 0.0, 'samples': []}
+                self._stages[(stage, file_type)] = entry
+            entry['calls'] += 1
+            entry['files'] += files
+            entry['rows'] += rows
+            entry['bytes'] += nbytes
+            entry['seconds'] += seconds
+            samples = entry['samples']
+            if len(samples) < MAX_SAMPLES:
+                samples.append(seconds)
+            else:
+                slot = self._random.randrange(entry['calls'])
+                if slot < MAX_SAMPLES:
+                    samples[slot] = seconds
+
+    @contextmanager
+    def timer(self, stage, file_type=None, files=1, rows=0, nbytes=0):
+        """
+        Times the enclosed block as one call of `stage`. The yielded dict can
+        update files/rows/nbytes once they are known.
+        """
+        sample = {'files': files, 'rows': rows, 'nbytes': nbytes}
+        start = time.perf_counter()
+        try:
+            yield sample
+        finally:
+            self.record(stage, time.perf_counter() - start, file_type, **sample)
+
+    def summary(self):
+        """One dict per (stage, file type), in recording order."""
+        wall = time.time() - self.started
+        with self._lock:
+            items = [(key, dict(entry, samples=sorted(entry['samples']))) for key, entry in self._stages.items()]
+        summary = []
+        for (stage, file_type), entry in items:
+            busy = entry['seconds']
+            samples = entry['samples']
+            summary.append({
+                'run_id': self.run_id,
+                'pipeline': self.pipeline,
+                'stage': stage,
+                'file_type': file_type,
+                'calls': entry['calls'],
+                'files': entry['files'],
+                'rows': entry['rows'],
+                'bytes': entry['bytes'],
+                'seconds': round(busy, 4),
+                'wall_seconds': round(wall, 2),
+                'files_per_s': round(entry['files'] / busy, 1) if busy > 0 else 0.0,
+                'rows_per_s': round(entry['rows'] / busy, 1) if busy > 0 else 0.0,
+                'p50_ms': round(_percentile(samples, 0.50) * 1000, 2),
+                'p95_ms': round(_percentile(samples, 0.95) * 1000, 2),
+                'max_ms': round(samples[-1] * 1000, 2) if samples else 0.0,
+            })
+        return summary
+
+    def report(self):
+        """Console table of the summary."""
+        lines = [f"{'stage':<8} {'type':<5} {'calls':>7} {'files':>7} {'rows':>10} {'MB':>8} "
+                 f"{'busy s':>8} {'files/s':>9} {'rows/s':>10} {'p50 ms':>8} {'p95 ms':>8}"]
+        for s in self.summary():
+            lines.append(
+                f"{s['stage']:<8} {s['file_type'] or '-':<5} {s['calls']:>7} {s['files']:>7} {s['rows']:>10} "
+                f"{s['bytes'] / 1e6:>8.1f} {s['seconds']:>8.2f} {s['files_per_s']:>9.1f} {s['rows_per_s']:>10.0f} "
+                f"{s['p50_ms']:>8.2f} {s['p95_ms']:>8.2f}"
+            )
+        return '\n'.join(lines)
+
+    def write_jsonl(self, path):
+        """Appends one JSON object per (stage, file type) to path."""
+        recorded_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+        with open(path, 'a', encoding='utf-8') as f:
+            for entry in self.summary():
+                f.write(json.dumps(dict(entry, recorded_at=recorded_at)) + '\n')
+        logger.info(f"Ingest metrics written to {path} (run {self.run_id})")
+
+    def write_table(self, conn):
+        """Inserts the summary into the ingest_metrics table of conn and commits."""
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS ingest_metrics (
+            run_id TEXT NOT NULL, pipeline TEXT NOT NULL, stage TEXT NOT NULL, file_type TEXT,
+            calls INTEGER, files INTEGER, rows INTEGER, bytes INTEGER, seconds REAL, wall_seconds REAL,
+            files_per_s REAL, rows_per_s REAL, p50_ms REAL, p95_ms REAL, max_ms REAL,
+            recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )""")
+        summary = self.summary()
+        if summary:
+            columns = list(summary[0])
+            conn.executemany(
+                f"INSERT INTO ingest_metrics ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                [[entry[col] for col in columns] for entry in summary]
+            )
+        conn.commit()
+        logger.info(f"Ingest metrics written to ingest_metrics (run {self.run_id})")
+
+
+@contextmanager
+def profile_run(name, enabled=True, out_dir='.'):
+    """
+    Profiles the enclosed block: pyinstrument HTML report when installed,
+    otherwise a cProfile .prof file (open with snakeviz or pstats).
+    """
+    if not enabled:
+        yield
+        return
+    stamp = time.strftime('%Y%m%d_%H%M%S')
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        Profiler = None
+
+    if Profiler is not None:
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            path = os.path.join(out_dir, f'profile_{name}_{stamp}.html')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(profiler.output_html())
+            print(f"Profile written to {path}")
+    else:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            path = os.path.join(out_dir, f'profile_{name}_{stamp}.prof')
+            profiler.dump_stats(path)
+            print(f"Profile written to {path}")
+            pstats.Stats(profiler).sort_stats('cumulative').print_stats(15)
+
+
+class ThreadProfiles:
+    """cProfile per worker thread, merged into one .prof file by dump()."""
+
+    def __init__(self):
+        self._profiles = []
+        self._lock = threading.Lock()
+
+    def wrap(self, func):
+        """Returns func running under its own profiler (use as a Thread target)."""
+        def profiled(*args, **kwargs):
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.disable()
+                with self._lock:
+                    self._profiles.append(profiler)
+        return profiled
+
+    def dump(self, name, out_dir='.'):
+        """Writes the merged profile of all finished threads; returns its path."""
+        with self._lock:
+            profiles = list(self._profiles)
+        if not profiles:
+            return None
+        path = os.path.join(out_dir, f"profile_{name}_{time.strftime('%Y%m%d_%H%M%S')}.prof")
+        stats = pstats.Stats(*profiles)
+        stats.dump_stats(path)
+        print(f"Profile of {len(profiles)} threads written to {path}")
+        stats.sort_stats('cumulative').print_stats(15)
+        return path
@@ -0,0 +1,85 @@
+import os
+import xml.etree.ElementTree as ET
+
+# Column order of the tuples produced by iter_lotx_rows (Lot_info without source_filename)
+LOT_INFO_COLUMNS = (
+    'LotId', 'Recipe', 'AllowSizeNull', 'CountUniqueBarcodesOnly', 'Size', 'CarrierIndex',
+    'TrayId', 'TrayState', 'TrayCode', 'UnitId', 'UnitState', 'UnitCode', 'UnitIdx'
+)
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class _LotxRowTarget:
+    """
+    XMLParser target that turns <Lot><Trays><Tray><Units><Unit/> start events
+    straight into Lot_info tuples. Only the open tag path is kept, so no
+    element tree is ever built and memory does not grow with the file.
+    """
+
+    def __init__(self):
+        self.rows = []
+        self.path = []
+        self.lot = None
+        self.tray = None
+
+    def start(self, tag, attrib):
+        depth = len(self.path)
+        if depth == 4:
+            if self.path[3] == 'Units' and self.path[1] == 'Trays' and self.tray is not None:
+                self.rows.append(self.lot + self.tray + (
+                    attrib.get('Id'), int(attrib.get('State', 0)), attrib.get('Code'), int(attrib.get('Idx', 0))
+                ))
+        elif depth == 2:
+            if self.path[1] == 'Trays':
+                self.tray = (attrib.get('Id'), int(attrib.get('State', 0)), attrib.get('Code'))
+        elif depth == 0:
+            self.lot = (
+                attrib.get('Id'), attrib.get('Recipe'), attrib.get('AllowSizeNull'),
+                attrib.get('CountUniqueBarcodesOnly'), int(attrib.get('Size', 0)), int(attrib.get('CarrierIndex', 0))
+            )
+        self.path.append(tag)
+
+    def end(self, tag):
+        self.path.pop()
+
+    def close(self):
+        return None
+
+
+def iter_lotx_rows(source, chunk_size=READ_CHUNK_SIZE):
+    """
+    Streams Lot_info row tuples (see LOT_INFO_COLUMNS) from a .lotx file.
+    `source` is a path or a binary file object. The file is fed to the C
+    XMLParser in chunks and rows are yielded as soon as each chunk is parsed.
+    Raises xml.etree.ElementTree.ParseError on malformed XML.
+    """
+    target = _LotxRowTarget()
+    parser = ET.XMLParser(target=target)
+    rows = target.rows
+
+    if isinstance(source, (str, bytes, os.PathLike)):
+        stream = open(source, 'rb')
+        owns_stream = True
+    else:
+        stream, owns_stream = source, False
+
+    try:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            parser.feed(chunk)
+            if rows:
+                yield from rows
+                rows.clear()
+        parser.close()
+        yield from rows
+        rows.clear()
+    finally:
+        if owns_stream:
+            stream.close()
+
+
+def read_lotx_rows(source):
+    """Returns all Lot_info row tuples of a .lotx file as a list."""
+    return list(iter_lotx_rows(source))
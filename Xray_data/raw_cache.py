@@ -0,0 +1,178 @@
+"""
+Direct-from-share reads with an optional local raw-file cache.
+
+Each remote file is read over the network once, into memory, and handed
+straight to the parser; nothing is staged in a local copy first. When a
+cache directory is configured the bytes are also kept there (size-capped,
+least recently used files evicted first), so files can be re-processed
+without going back to the share.
+"""
+import os
+import time
+import fnmatch
+import sqlite3
+import hashlib
+import logging
+import threading
+import concurrent.futures
+
+CACHE_INDEX = 'raw_cache_index.db'
+SHARE_READ_THREADS = 8  # remote files read concurrently
+
+logger = logging.getLogger()
+
+
+def scan_share_files(folders, pattern):
+    """
+    Lists matching files in the share folders as (filename, path, mtime, size).
+    The scandir listing carries mtime and size, so there is no per-file stat
+    round trip on Windows shares. Missing folders are logged and skipped.
+    """
+    files = []
+    for folder in folders:
+        try:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if fnmatch.fnmatch(entry.name, pattern) and entry.is_file():
+                        stat = entry.stat()
+                        files.append((entry.name, entry.path, stat.st_mtime, stat.st_size))
+        except OSError as e:
+            logger.warning(f"Share folder not reachable: {folder} ({e})")
+    return files
+
+
+class RawFileCache:
+    """
+    Size-capped LRU cache of raw source files, keyed by (path, mtime, size).
+
+    With cache_dir=None it is a pass-through reader. The index lives in a
+    small SQLite database inside cache_dir; last-used times are kept in
+    memory and written back by close().
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=0):
+        self.cache_dir = cache_dir if max_bytes else None
+        self.max_bytes = max_bytes
+        self.hits = self.misses = 0
+        self.bytes_read = 0
+        self._lock = threading.Lock()
+        self._entries = {}  # cache_name -> [src_path, mtime, size, last_used]
+        self._total = 0
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._conn = sqlite3.connect(os.path.join(self.cache_dir, CACHE_INDEX), check_same_thread=False)
+            self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS raw_cache (
+                cache_name TEXT PRIMARY KEY,
+                src_path TEXT NOT NULL,
+                mtime REAL NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )""")
+            for name, src_path, mtime, size, last_used in self._conn.execute("SELECT * FROM raw_cache"):
+                if os.path.exists(os.path.join(self.cache_dir, name)):
+                    self._entries[name] = [src_path, mtime, size, last_used]
+                    self._total += size
+
+    @staticmethod
+    def _cache_name(src_path):
+        digest = hashlib.blake2b(os.path.normpath(src_path).encode('utf-8'), digest_size=8).hexdigest()
+        return f"{digest}_{os.path.basename(src_path)}"
+
+    def read(self, src_path, mtime, size):
+        """Returns the file's bytes, from the cache when the (mtime, size) still match."""
+        name = self._cache_name(src_path)
+        if self.cache_dir:
+            with self._lock:
+                entry = self._entries.get(name)
+                if entry and entry[1] == mtime and entry[2] == size:
+                    entry[3] = time.time()
+                    self.hits += 1
+                    hit = True
+                else:
+                    hit = False
+            if hit:
+                try:
+                    with open(os.path.join(self.cache_dir, name), 'rb') as f:
+                        return f.read()
+                except OSError:
+                    pass  # evicted or removed meanwhile; fall back to the share
+
+        with open(src_path, 'rb') as f:
+            data = f.read()
+        with self._lock:
+            self.misses += 1
+            self.bytes_read += len(data)
+        if self.cache_dir:
+            self._store(name, src_path, mtime, data)
+        return data
+
+    def _store(self, name, src_path, mtime, data):
+        path = os.path.join(self.cache_dir, name)
+        tmp_path = f"{path}.{threading.get_ident()}.part"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not cache {src_path}: {e}")
+            return
+        with self._lock:
+            old = self._entries.get(name)
+            if old:
+                self._total -= old[2]
+            self._entries[name] = [src_path, mtime, len(data), time.time()]
+            self._total += len(data)
+            self._evict()
+
+    def _evict(self):
+        """Removes least recently used files until the cache fits max_bytes (lock held)."""
+        if self._total <= self.max_bytes:
+            return
+        for name, entry in sorted(self._entries.items(), key=lambda item: item[1][3]):
+            if self._total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+            except OSError:
+                continue
+            self._total -= entry[2]
+            del self._entries[name]
+
+    def read_many(self, files, threads=SHARE_READ_THREADS):
+        """
+        Reads (filename, path, mtime, size) entries concurrently and yields
+        (entry, data, error) in the input order. At most 2 * threads files
+        are held in memory at a time.
+        """
+        def read_one(entry):
+            try:
+                return entry, self.read(entry[1], entry[2], entry[3]), None
+            except OSError as e:
+                return entry, None, e
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+            window = []
+            for entry in files:
+                window.append(executor.submit(read_one, entry))
+                if len(window) >= 2 * threads:
+                    yield window.pop(0).result()
+            for future in window:
+                yield future.result()
+
+    def report(self):
+        return (f"{self.misses} files read from the share ({self.bytes_read / 1e6:.1f} MB), "
+                f"{self.hits} from the local cache")
+
+    def close(self):
+        """Writes the index (entries and last-used times) back."""
+        if not self.cache_dir:
+            return
+        with self._lock:
+            rows = [(name, *entry) for name, entry in self._entries.items()]
+        self._conn.execute("DELETE FROM raw_cache")
+        self._conn.executemany("INSERT INTO raw_cache VALUES (?, ?, ?, ?, ?)", rows)
+        self._conn.commit()
+        self._conn.close()
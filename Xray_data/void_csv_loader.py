@@ -0,0 +1,95 @@
+import io
+import os
+import logging
+from itertools import repeat
+
+import pandas as pd
+from pandas.errors import EmptyDataError
+
+CSV_STANDARD_HEADER = [
+    'BoardBarcode', 'ModuleIndex', 'JointType', 'Pin', 'TotalVoidRatio',
+    'LargestVoidRatio', 'SpreadX', 'SpreadY', 'GVMean', 'DefectCode',
+    'SystemDefect', 'PinStatus', 'Lot', 'ModuleStatus', 'DeviceStatus'
+]
+# Every Void_results column is read as text: no per-file dtype inference,
+# and values reach SQLite exactly as written in the CSV.
+VOID_RESULTS_DTYPES = {col: str for col in CSV_STANDARD_HEADER}
+
+# Prefer the multithreaded Arrow reader when pyarrow is installed
+try:
+    import pyarrow  # noqa: F401
+    CSV_ENGINE = 'pyarrow'
+except ImportError:
+    CSV_ENGINE = 'c'
+
+logger = logging.getLogger()
+
+
+def _open_source(source):
+    """Returns a seekable binary buffer; paths are read in one pass (one SMB open)."""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            return io.BytesIO(f.read())
+    if isinstance(source, bytes):
+        return io.BytesIO(source)
+    return source
+
+
+def read_void_columns(source, name=None):
+    """
+    Reads a void-results CSV (path, bytes or binary file object) into column
+    lists in CSV_STANDARD_HEADER order. Only the standard columns present in
+    the header are parsed (usecols); missing ones become all-None columns.
+    Returns (columns, row_count), or None for empty files and files without
+    any standard column. `name` labels in-memory sources in log messages.
+    """
+    buffer = _open_source(source)
+    name = name or getattr(source, 'name', source if isinstance(source, str) else 'buffer')
+    try:
+        header = pd.read_csv(buffer, nrows=0, engine='c').columns
+        present = [col for col in CSV_STANDARD_HEADER if col in header]
+        if not present:
+            logger.warning(f"No standard columns found in {name}")
+            return None
+        buffer.seek(0)
+        df = pd.read_csv(
+            buffer,
+            usecols=present,
+            dtype={col: VOID_RESULTS_DTYPES[col] for col in present},
+            engine=CSV_ENGINE,
+        )
+    except EmptyDataError:
+        return None
+
+    row_count = len(df)
+    if row_count == 0:
+        return None
+
+    columns = []
+    for col in CSV_STANDARD_HEADER:
+        if col in df.columns:
+            series = df[col].astype(object)
+            columns.append(series.where(series.notna(), None).tolist())
+        else:
+            columns.append([None] * row_count)
+    return columns, row_count
+
+
+def iter_void_rows(columns, source_filename=None):
+    """Zips column lists into insertable row tuples, optionally tagged with source_filename."""
+    data, row_count = columns
+    if source_filename is not None:
+        return zip(*data, repeat(source_filename, row_count))
+    return zip(*data)
+
+
+def load_void_rows(source, source_filename=None):
+    """
+    Returns the rows of a void-results CSV as a list of tuples ready for
+    executemany (CSV_STANDARD_HEADER order, plus source_filename if given),
+    or None when the file is empty or has no standard columns.
+    """
+    columns = read_void_columns(source, source_filename)
+    if columns is None:
+        return None
+    return list(iter_void_rows(columns, source_filename))
@@ -0,0 +1,226 @@
+"""
+Work-week partitioned storage for Void_results.
+
+Rows are appended to one SQLite file per ISO work-week of the source file's
+mtime (void_2025W05.db), so each insert only maintains the UNIQUE index of a
+small, recent table. A catalog database next to them (void_catalog.db)
+lists the partitions and which Lots each one holds; readers (GUI_APP's
+Void_data_fromDB.py) look up the Lots there and only open the partitions
+that can contain them.
+
+An existing monolithic database can be registered as a partition as-is:
+
+    python Xray_data/void_partitions.py register <partition_dir> <Void_results_database.db>
+    python Xray_data/void_partitions.py list <partition_dir>
+
+The UNIQUE key is enforced per partition; rows of one file always land in
+the same week, so re-ingesting a file stays idempotent.
+"""
+import os
+import sys
+import time
+import sqlite3
+import logging
+import datetime
+from collections import OrderedDict
+
+CATALOG_NAME = 'void_catalog.db'
+STANDARD_HEADER = [
+    'BoardBarcode', 'ModuleIndex', 'JointType', 'Pin', 'TotalVoidRatio',
+    'LargestVoidRatio', 'SpreadX', 'SpreadY', 'GVMean', 'DefectCode',
+    'SystemDefect', 'PinStatus', 'Lot', 'ModuleStatus', 'DeviceStatus'
+]
+LOT_INDEX = STANDARD_HEADER.index('Lot')
+MAX_OPEN_PARTITIONS = 8  # connections kept open while ingesting into several weeks
+
+logger = logging.getLogger()
+
+
+def week_key(mtime):
+    """ISO work-week of a timestamp, e.g. '2025W05'."""
+    year, week, _ = datetime.date.fromtimestamp(mtime).isocalendar()
+    return f"{year}W{week:02d}"
+
+
+def setup_catalog(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS partitions (
+        name TEXT PRIMARY KEY,
+        path TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        created_at REAL NOT NULL
+    )""")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS partition_lots (
+        Lot TEXT NOT NULL,
+        partition TEXT NOT NULL,
+        PRIMARY KEY (Lot, partition)
+    ) WITHOUT ROWID""")
+    conn.commit()
+
+
+def is_catalog(conn):
+    """True when conn is a partition catalog rather than a database holding Void_results."""
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'partition_lots'").fetchone()
+    return row is not None
+
+
+def resolve_partition_path(catalog_path, path):
+    """Partition paths are stored relative to the catalog folder when they live inside it."""
+    return path if os.path.isabs(path) else os.path.join(os.path.dirname(os.path.abspath(catalog_path)), path)
+
+
+def partitions_for_lots(catalog_conn, catalog_path, patterns):
+    """
+    Paths of the partitions holding a Lot that matches any of the LIKE
+    patterns, oldest first. The catalog has one row per (Lot, week), so even
+    '%name%' patterns only scan a small table.
+    """
+    if not patterns:
+        return []
+    where = " OR ".join("l.Lot LIKE ?" for _ in patterns)
+    rows = catalog_conn.execute(f"""
+        SELECT DISTINCT p.name, p.path FROM partition_lots l
+        JOIN partitions p ON p.name = l.partition
+        WHERE {where} ORDER BY p.name
+    """, list(patterns)).fetchall()
+    return [resolve_partition_path(catalog_path, path) for _, path in rows]
+
+
+class PartitionRouter:
+    """
+    Appends Void_results rows to their work-week partition and keeps the
+    catalog up to date. Rows are STANDARD_HEADER tuples; call commit()
+    after each batch and close() at the end.
+    """
+
+    def __init__(self, partition_dir):
+        self.partition_dir = partition_dir
+        os.makedirs(partition_dir, exist_ok=True)
+        self.catalog_path = os.path.join(partition_dir, CATALOG_NAME)
+        self.catalog = sqlite3.connect(self.catalog_path)
+        setup_catalog(self.catalog)
+        self._known = {name for (name,) in self.catalog.execute("SELECT name FROM partitions")}
+        self._lots = set()  # (Lot, partition) pairs already in the catalog this run
+        self._open = OrderedDict()  # partition name -> connection, least recently used first
+        self._insert_query = (
+            f"INSERT OR IGNORE INTO Void_results ({', '.join(STANDARD_HEADER)}) "
+            f"VALUES ({', '.join('?' * len(STANDARD_HEADER))})"
+        )
+
+    def _connection(self, name):
+        conn = self._open.get(name)
+        if conn is not None:
+            self._open.move_to_end(name)
+            return conn
+        if len(self._open) >= MAX_OPEN_PARTITIONS:
+            _, oldest = self._open.popitem(last=False)
+            oldest.commit()
+            oldest.close()
+
+        file_name = f"void_{name}.db"
+        conn = sqlite3.connect(os.path.join(self.partition_dir, file_name))
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS Void_results (
+            {', '.join(f'{col} TEXT' for col in STANDARD_HEADER)},
+            UNIQUE(BoardBarcode, ModuleIndex, JointType, Pin)
+        )""")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_void_lot ON Void_results(Lot)")
+        if name not in self._known:
+            self.catalog.execute(
+                "INSERT OR IGNORE INTO partitions (name, path, kind, created_at) VALUES (?, ?, 'week', ?)",
+                (name, file_name, time.time())
+            )
+            self._known.add(name)
+        self._open[name] = conn
+        return conn
+
+    def insert(self, rows, mtime):
+        """Appends the rows of one source file to the partition of its week."""
+        if not rows:
+            return
+        name = week_key(mtime)
+        self._connection(name).executemany(self._insert_query, rows)
+        new_lots = {(row[LOT_INDEX], name) for row in rows if row[LOT_INDEX] is not None} - self._lots
+        if new_lots:
+            self.catalog.executemany("INSERT OR IGNORE INTO partition_lots (Lot, partition) VALUES (?, ?)", new_lots)
+            self._lots |= new_lots
+
+    def commit(self):
+        """Commits the partitions first, then the catalog that points at them."""
+        for conn in self._open.values():
+            conn.commit()
+        self.catalog.commit()
+
+    def rollback(self):
+        for conn in self._open.values():
+            conn.rollback()
+        self.catalog.rollback()
+
+    def close(self):
+        self.commit()
+        for conn in self._open.values():
+            conn.close()
+        self._open.clear()
+        self.catalog.close()
+
+
+def register_partition(partition_dir, db_path, name=None):
+    """
+    Adds an existing database with a Void_results table (e.g. the monolithic
+    history) to the catalog as a partition and indexes its Lots.
+    Returns the number of distinct Lots found.
+    """
+    catalog_path = os.path.join(partition_dir, CATALOG_NAME)
+    os.makedirs(partition_dir, exist_ok=True)
+    name = name or os.path.splitext(os.path.basename(db_path))[0]
+    db_path = os.path.abspath(db_path)
+    inside = os.path.dirname(db_path) == os.path.abspath(partition_dir)
+    path = os.path.basename(db_path) if inside else db_path
+
+    with sqlite3.connect(catalog_path) as catalog:
+        setup_catalog(catalog)
+        catalog.execute("ATTACH DATABASE ? AS part", (db_path,))
+        catalog.execute(
+            "INSERT OR REPLACE INTO partitions (name, path, kind, created_at) VALUES (?, ?, 'registered', ?)",
+            (name, path, time.time())
+        )
+        catalog.execute(
+            "INSERT OR IGNORE INTO partition_lots (Lot, partition) "
+            "SELECT DISTINCT Lot, ? FROM part.Void_results WHERE Lot IS NOT NULL",
+            (name,)
+        )
+        lots = catalog.execute("SELECT COUNT(*) FROM partition_lots WHERE partition = ?", (name,)).fetchone()[0]
+        catalog.commit()
+        catalog.execute("DETACH DATABASE part")
+    logger.info(f"Registered {db_path} as partition {name} ({lots} Lots)")
+    return lots
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command == 'register' and len(sys.argv) >= 4:
+        for db_path in sys.argv[3:]:
+            lots = register_partition(sys.argv[2], db_path)
+            print(f"Registered {db_path}: {lots} Lots")
+    elif command == 'list' and len(sys.argv) >= 3:
+        catalog_path = os.path.join(sys.argv[2], CATALOG_NAME)
+        with sqlite3.connect(catalog_path) as catalog:
+            rows = catalog.execute("""
+                SELECT p.name, p.kind, p.path, COUNT(l.Lot) FROM partitions p
+                LEFT JOIN partition_lots l ON l.partition = p.name
+                GROUP BY p.name ORDER BY p.name
+            """).fetchall()
+        for name, kind, path, lots in rows:
+            path = resolve_partition_path(catalog_path, path)
+            size = os.path.getsize(path) / 1e6 if os.path.exists(path) else 0.0
+            print(f"{name:<32} {kind:<11} {lots:>7} Lots {size:>10.1f} MB  {path}")
+    else:
+        print(__doc__)
+
+
+if __name__ == '__main__':
+    main()
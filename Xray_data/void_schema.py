@@ -0,0 +1,259 @@
+"""
+Typed, dictionary-encoded storage for Void_results.
+
+After migration the data lives in Void_results_data:
+  - ModuleIndex / Pin are INTEGER, the ratios / Spread / GVMean are REAL
+  - BoardBarcode, JointType, DefectCode, the status columns, Lot and
+    source_filename are small integer keys into the dict_* lookup tables
+    (they repeat on every pin row, and REAL saves little on short decimals)
+and `Void_results` becomes a read-side VIEW with the original column names,
+so existing queries (GUI_APP, exports) keep working. An INSTEAD OF INSERT
+trigger on the view keeps the old `INSERT [OR IGNORE] INTO Void_results`
+statements working; TypedVoidInserter is the faster ingest path.
+
+    python Xray_data/void_schema.py <database.db> [...]   # migrate in place
+"""
+import os
+import sys
+import time
+import sqlite3
+import logging
+
+VOID_TABLE = 'Void_results'
+VOID_DATA_TABLE = 'Void_results_data'
+LEGACY_TABLE = 'Void_results_legacy'
+
+INTEGER_COLUMNS = ('ModuleIndex', 'Pin')
+REAL_COLUMNS = ('TotalVoidRatio', 'LargestVoidRatio', 'SpreadX', 'SpreadY', 'GVMean')
+# Dictionary-encoded column -> lookup table; the data table stores <column>_id
+DICTIONARY_COLUMNS = {
+    'BoardBarcode': 'dict_board_barcode',
+    'JointType': 'dict_joint_type',
+    'DefectCode': 'dict_defect_code',
+    'SystemDefect': 'dict_system_defect',
+    'PinStatus': 'dict_pin_status',
+    'ModuleStatus': 'dict_module_status',
+    'DeviceStatus': 'dict_device_status',
+    'Lot': 'dict_lot',
+    'source_filename': 'dict_source_file',
+}
+UNIQUE_KEY = ('BoardBarcode', 'ModuleIndex', 'JointType', 'Pin')
+
+logger = logging.getLogger()
+
+
+def _data_column(col):
+    return f'{col}_id' if col in DICTIONARY_COLUMNS else col
+
+
+def _column_type(col):
+    if col in DICTIONARY_COLUMNS or col in INTEGER_COLUMNS:
+        return 'INTEGER'
+    if col in REAL_COLUMNS:
+        return 'REAL'
+    if col == 'processed_at':
+        return "INTEGER DEFAULT (CAST(strftime('%s', 'now') AS INTEGER))"
+    return 'TEXT'
+
+
+def is_typed(conn):
+    """True once Void_results has been migrated to the typed view layout."""
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name = ?", (VOID_TABLE,)).fetchone()
+    return row is not None and row[0] == 'view'
+
+
+def view_columns(conn, schema='main'):
+    """Column names exposed by Void_results (table or view), in order."""
+    return [row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({VOID_TABLE})")]
+
+
+def _view_select(columns, prefix=''):
+    """SELECT decoding Void_results_data (alias v) back to the view columns."""
+    select_cols, joins = [], []
+    for col in columns:
+        if col in DICTIONARY_COLUMNS:
+            alias = f'd_{col}'
+            select_cols.append(f'{alias}.value AS {col}')
+            joins.append(f'LEFT JOIN {prefix}{DICTIONARY_COLUMNS[col]} {alias} ON {alias}.id = v.{col}_id')
+        elif col == 'processed_at':
+            select_cols.append("datetime(v.processed_at, 'unixepoch') AS processed_at")
+        else:
+            select_cols.append(f'v.{col} AS {col}')
+    return f"SELECT {', '.join(select_cols)} FROM {prefix}{VOID_DATA_TABLE} v {' '.join(joins)}"
+
+
+def decoded_select(conn, schema='main'):
+    """
+    The Void_results view query over Void_results_data (alias v), so callers
+    can add conditions on v.rowid, e.g. to read the rows added since a watermark.
+    schema qualifies the tables (an ATTACHed database).
+    """
+    return _view_select(view_columns(conn, schema), f'{schema}.')
+
+
+def create_typed_schema(conn, columns):
+    """
+    Creates the lookup tables, Void_results_data, the Void_results view and
+    its INSTEAD OF INSERT trigger. `columns` is the list of view columns
+    (CSV_STANDARD_HEADER plus optional source_filename / processed_at).
+    """
+    for col in columns:
+        if col in DICTIONARY_COLUMNS:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {DICTIONARY_COLUMNS[col]} "
+                         f"(id INTEGER PRIMARY KEY, value TEXT NOT NULL UNIQUE)")
+
+    data_cols = ', '.join(f'{_data_column(col)} {_column_type(col)}' for col in columns)
+    unique_cols = ', '.join(_data_column(col) for col in UNIQUE_KEY)
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {VOID_DATA_TABLE} ({data_cols}, UNIQUE({unique_cols}))")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_void_data_total_void ON {VOID_DATA_TABLE}(TotalVoidRatio)")
+    if 'Lot' in columns:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_void_data_lot ON {VOID_DATA_TABLE}(Lot_id)")
+
+    conn.execute(f"CREATE VIEW IF NOT EXISTS {VOID_TABLE} AS {_view_select(columns)}")
+
+    # Keeps plain INSERT [OR IGNORE] INTO Void_results working; the outer
+    # conflict clause applies to the statements inside the trigger.
+    dict_inserts = ''.join(
+        f"INSERT OR IGNORE INTO {DICTIONARY_COLUMNS[col]}(value) SELECT NEW.{col} WHERE NEW.{col} IS NOT NULL;\n"
+        for col in columns if col in DICTIONARY_COLUMNS
+    )
+    values = []
+    for col in columns:
+        if col in DICTIONARY_COLUMNS:
+            values.append(f"(SELECT id FROM {DICTIONARY_COLUMNS[col]} WHERE value = NEW.{col})")
+        elif col == 'processed_at':
+            values.append("COALESCE(CAST(strftime('%s', NEW.processed_at) AS INTEGER), CAST(strftime('%s', 'now') AS INTEGER))")
+        else:
+            values.append(f'NEW.{col}')
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_void_results_insert INSTEAD OF INSERT ON {VOID_TABLE}
+    BEGIN
+    {dict_inserts}INSERT INTO {VOID_DATA_TABLE} ({', '.join(_data_column(c) for c in columns)})
+    VALUES ({', '.join(values)});
+    END""")
+
+
+def migrate_to_typed(conn, vacuum=True):
+    """
+    Converts an all-TEXT Void_results table into the typed layout in place.
+    Values that do not convert to INTEGER/REAL are kept as-is by SQLite's
+    column affinity, so nothing is lost. Returns the number of rows migrated.
+    """
+    if is_typed(conn):
+        logger.info("Void_results is already typed; nothing to migrate.")
+        return 0
+
+    columns = view_columns(conn)
+    if not columns:
+        raise RuntimeError("Void_results table not found")
+
+    conn.commit()
+    conn.execute("BEGIN")
+    try:
+        conn.execute(f"ALTER TABLE {VOID_TABLE} RENAME TO {LEGACY_TABLE}")
+        for col in columns:
+            if col in DICTIONARY_COLUMNS:
+                table = DICTIONARY_COLUMNS[col]
+                conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY, value TEXT NOT NULL UNIQUE)")
+                conn.execute(f"INSERT OR IGNORE INTO {table}(value) "
+                             f"SELECT DISTINCT {col} FROM {LEGACY_TABLE} WHERE {col} IS NOT NULL ORDER BY {col}")
+        create_typed_schema(conn, columns)
+
+        select_cols, joins = [], []
+        for col in columns:
+            if col in DICTIONARY_COLUMNS:
+                alias = f'd_{col}'
+                select_cols.append(f'{alias}.id')
+                joins.append(f'LEFT JOIN {DICTIONARY_COLUMNS[col]} {alias} ON {alias}.value = l.{col}')
+            elif col == 'processed_at':
+                select_cols.append("CAST(strftime('%s', l.processed_at) AS INTEGER)")
+            else:
+                select_cols.append(f'l.{col}')
+        cursor = conn.execute(
+            f"INSERT OR IGNORE INTO {VOID_DATA_TABLE} ({', '.join(_data_column(c) for c in columns)}) "
+            f"SELECT {', '.join(select_cols)} FROM {LEGACY_TABLE} l {' '.join(joins)} "
+            f"ORDER BY {', '.join('l.' + c for c in UNIQUE_KEY)}"
+        )
+        migrated = cursor.rowcount
+        conn.execute(f"DROP TABLE {LEGACY_TABLE}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    if vacuum:
+        conn.execute("VACUUM")
+    conn.execute(f"ANALYZE {VOID_DATA_TABLE}")
+    conn.commit()
+    return migrated
+
+
+class TypedVoidInserter:
+    """
+    Fast ingest path for the typed layout: encodes the dictionary columns with
+    in-memory caches and inserts straight into Void_results_data, skipping the
+    per-row trigger. Rows are in `columns` order, as for the legacy table.
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.insert_sql = (
+            f"INSERT OR IGNORE INTO {VOID_DATA_TABLE} ({', '.join(_data_column(c) for c in self.columns)}) "
+            f"VALUES ({', '.join('?' * len(self.columns))})"
+        )
+        self.dict_positions = [(i, DICTIONARY_COLUMNS[c]) for i, c in enumerate(self.columns) if c in DICTIONARY_COLUMNS]
+        self.caches = {}
+
+    def _encoder(self, conn, table):
+        cache = self.caches.get(table)
+        if cache is None:
+            cache = dict(conn.execute(f"SELECT value, id FROM {table}"))
+            self.caches[table] = cache
+
+        def encode(value):
+            if value is None:
+                return None
+            key = cache.get(value)
+            if key is None:
+                conn.execute(f"INSERT OR IGNORE INTO {table}(value) VALUES (?)", (value,))
+                key = conn.execute(f"SELECT id FROM {table} WHERE value = ?", (value,)).fetchone()[0]
+                cache[value] = key
+            return key
+        return encode
+
+    def insert(self, conn, rows):
+        """Encodes and inserts rows; returns the number of rows handed to SQLite."""
+        if not rows:
+            return 0
+        data = [list(col) for col in zip(*rows)]
+        for pos, table in self.dict_positions:
+            encode = self._encoder(conn, table)
+            data[pos] = [encode(v) for v in data[pos]]
+        conn.executemany(self.insert_sql, zip(*data))
+        return len(rows)
+
+
+def migrate_database(db_path):
+    """Migrates the Void_results table of db_path and reports the size change."""
+    size_before = os.path.getsize(db_path)
+    start_time = time.time()
+    with sqlite3.connect(db_path) as conn:
+        migrated = migrate_to_typed(conn)
+    size_after = os.path.getsize(db_path)
+    msg = (f"{os.path.basename(db_path)}: migrated {migrated} Void_results rows in {time.time() - start_time:.1f}s, "
+           f"{size_before / 1e6:.1f} MB -> {size_after / 1e6:.1f} MB")
+    print(msg)
+    logger.info(msg)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if len(sys.argv) < 2:
+        print("Usage: python void_schema.py <database.db> [...]")
+        return
+    for db_path in sys.argv[1:]:
+        migrate_database(db_path)
+
+
+if __name__ == '__main__':
+    main()
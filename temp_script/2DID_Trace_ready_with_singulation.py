@@ -9,6 +9,14 @@ import os
 import json
 from pathlib import Path
 import re
+import sys
+
+from trace_index import search_rows, lookup_pairs
+
+# Bảng kết quả ảo + task runner dùng chung với GUI_APP
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "GUI_APP"))
+from virtual_table import VirtualTable
+from task_runner import TaskRunner
 
 # =========================
 # CẤU HÌNH & LƯU TRẠNG THÁI
@@ -198,19 +206,21 @@ query_results = []
 current_columns = ["internal2did_id", "Lot", "leadframe_id", "LF_POS", "singulation_id"]  # mặc định cho Tab 1
 
 def set_tree_columns(cols):
-    """Cấu hình lại cột Treeview theo danh sách cột 'cols'."""
-    global current_columns, tree
+    """Cấu hình lại cột bảng kết quả theo danh sách cột 'cols' (xóa dữ liệu cũ)."""
+    global current_columns
     current_columns = list(cols)
-    # Xóa toàn bộ dòng cũ
-    for row in tree.get_children():
-        tree.delete(row)
-    # Đặt lại danh sách cột
-    tree["columns"] = cols
-    # Cập nhật heading/width
-    for col in cols:
-        tree.heading(col, text=col)
+    show_results([])
+
+def show_results(rows):
+    """Đổ kết quả vào bảng ảo; sort/lọc trên dữ liệu, không tạo item cho từng dòng."""
+    tree.set_rows(current_columns, rows)
+    for col in current_columns:
         w = 120 if len(col) <= 18 else 160
-        tree.column(col, width=w, stretch=True)
+        tree.tree.column(col, width=w, stretch=True)
+
+def shown_results():
+    """Kết quả theo thứ tự/lọc đang hiển thị trên bảng."""
+    return [query_results[i] for i in tree.view_indices()]
 
 def get_table_columns(conn, table_name="lot_traceback"):
     cur = conn.cursor()
@@ -219,83 +229,107 @@ def get_table_columns(conn, table_name="lot_traceback"):
     # PRAGMA table_info: (cid, name, type, notnull, dflt_value, pk)
     return [row[1] for row in info]
 
-def _connect_resolved_db():
-    user_input_path = entry_db_path.get()
-    resolved_db = resolve_db_path(user_input_path)
-    conn = sqlite3.connect(resolved_db)
-    # Lưu lại DB path sau cùng (chỉ khi kết nối thành công)
+DEFAULT_COLUMNS = ["internal2did_id", "Lot", "leadframe_id", "LF_POS", "singulation_id"]
+
+def _resolved_db_path():
+    """DB path từ ô nhập (có thể mở dialog chọn file → phải gọi trên Tk thread)."""
+    return resolve_db_path(entry_db_path.get())
+
+def _remember_db_path(resolved_db):
+    # Lưu lại DB path sau cùng (chỉ khi truy vấn thành công)
     settings = load_settings()
     settings["last_db_path"] = resolved_db
     save_settings(settings)
     entry_db_path.delete(0, tk.END)
     entry_db_path.insert(0, resolved_db)
-    return conn
 
-def query_database():  # Tab 1
-    raw_text = text_input_tab1.get("1.0", tk.END)
-    progress_label.config(text="Processing...")
-    root.update_idletasks()
+def _connect(task, db_path):
+    """Kết nối trong worker thread; Cancel sẽ ngắt câu lệnh đang chạy."""
+    conn = sqlite3.connect(db_path)
+    task.on_cancel(conn.interrupt)
+    return conn
 
+def _submit_query(work, args, key, on_done):
+    """Chạy truy vấn nền (task_runner); cùng input đang chạy → dùng chung, input mới → hủy cái cũ."""
     try:
-        pairs, parse_warnings = parse_input_text(raw_text)
+        db_path = _resolved_db_path()
     except Exception as e:
         progress_label.config(text="")
-        messagebox.showerror("Input Error", str(e))
+        messagebox.showerror("Database Error", f"Không thể kết nối database:{e}")
         return
 
-    try:
-        conn = _connect_resolved_db()
-        cursor = conn.cursor()
-    except Exception as e:
+    def done(result):
+        _remember_db_path(db_path)
+        on_done(result)
+
+    def failed(error):
         progress_label.config(text="")
-        messagebox.showerror("Database Error", f"Không thể kết nối database:{e}")
-        return
+        messagebox.showerror("Query Error", str(error))
 
-    global query_results
-    query_results = []
+    runner.submit(work, db_path, *args, key=(key, db_path, args), group="query",
+                  on_done=done, on_error=failed,
+                  on_cancelled=lambda: progress_label.config(text="Đã hủy truy vấn."))
 
-    # Đảm bảo cột chuẩn 5 cột cho truy vấn kiểu LF_ID/LF_POS (bỏ qua Lot input)
-    default_cols = ["internal2did_id", "Lot", "leadframe_id", "LF_POS", "singulation_id"]
-    set_tree_columns(default_cols)
+def cancel_query():
+    runner.cancel(group="query")
 
-    # Kiểm tra xem bảng có cột 'singulation_id' không
-    try:
-        available_cols = set(get_table_columns(conn, "lot_traceback"))
-    except Exception:
-        available_cols = set()
+# ----- Worker thread: không chạm widget -----
 
-    if "singulation_id" in available_cols:
-        query = (
-            "SELECT internal2did_id, Lot, leadframe_id, LF_POS, singulation_id "
-            "FROM lot_traceback WHERE leadframe_id = ? AND LF_POS = ?"
-        )
-    else:
-        # Fallback: vẫn trả ra 5 cột, với cột singulation_id = NULL
-        query = (
-            "SELECT internal2did_id, Lot, leadframe_id, LF_POS, NULL AS singulation_id "
-            "FROM lot_traceback WHERE leadframe_id = ? AND LF_POS = ?"
-        )
+def run_pair_lookup(task, db_path, pairs):
+    conn = _connect(task, db_path)
+    try:
+        return lookup_pairs(conn, list(pairs), DEFAULT_COLUMNS)
+    finally:
+        conn.close()
 
+def run_search(task, db_path, column, terms):
+    conn = _connect(task, db_path)
     try:
-        for lf_id, lf_pos in pairs:
-            cursor.execute(query, (lf_id, lf_pos))
-            query_results.extend(cursor.fetchall())
-    except Exception as e:
-        messagebox.showerror("Query Error", str(e))
+        # Lấy danh sách cột động
+        try:
+            cols = get_table_columns(conn, "lot_traceback") or DEFAULT_COLUMNS
+        except sqlite3.DatabaseError:
+            cols = DEFAULT_COLUMNS
+        # Khớp chính xác trước, còn lại tìm chuỗi con qua index trigram (xem trace_index.py)
+        return cols, search_rows(conn, column, list(terms), cols)
     finally:
         conn.close()
 
-    # Cập nhật bảng kết quả
-    for result in query_results:
-        tree.insert("", tk.END, values=result)
+# ----- Tk thread -----
+
+def query_database():  # Tab 1
+    raw_text = text_input_tab1.get("1.0", tk.END)
+
+    try:
+        pairs, parse_warnings = parse_input_text(raw_text)
+    except Exception as e:
+        progress_label.config(text="")
+        messagebox.showerror("Input Error", str(e))
+        return
+
+    progress_label.config(text="Processing...")
+
+    def done(result):
+        global query_results
+        query_results, unmatched = result
+        # Đảm bảo cột chuẩn 5 cột cho truy vấn kiểu LF_ID/LF_POS (bỏ qua Lot input)
+        set_tree_columns(DEFAULT_COLUMNS)
+        show_results(query_results)
 
-    status = f"Done! Input: {len(pairs)} dòng — Kết quả: {len(query_results)} dòng"
-    if parse_warnings:
-        status += f" | Cảnh báo bỏ qua: {len(parse_warnings)} dòng"
-    progress_label.config(text=status)
+        status = f"Done! Input: {len(pairs)} dòng — Kết quả: {len(query_results)} dòng"
+        if unmatched:
+            shown = ", ".join(f"{lf_id}/{lf_pos}" for lf_id, lf_pos in unmatched[:5])
+            status += f" | Không tìm thấy: {len(unmatched)} cặp ({shown}{', ...' if len(unmatched) > 5 else ''})"
+        if parse_warnings:
+            status += f" | Cảnh báo bỏ qua: {len(parse_warnings)} dòng"
+        progress_label.config(text=status)
 
+    # Nạp các cặp vào bảng tạm, JOIN một lần qua index (leadframe_id, LF_POS);
+    # thiếu cột singulation_id → trả NULL (xem trace_index.lookup_pairs)
+    _submit_query(run_pair_lookup, (tuple(pairs),), "pairs", done)
 
-def reverse_query_database():  # Tab 2 (LIKE, NOCASE)
+
+def reverse_query_database():  # Tab 2 (chính xác → trigram, NOCASE)
     ids_raw = text_input_tab2.get("1.0", tk.END).strip()
     if not ids_raw:
         messagebox.showerror("Input Error", "Vui lòng nhập ít nhất 1 internal2did_id.")
@@ -310,59 +344,21 @@ def reverse_query_database():  # Tab 2 (LIKE, NOCASE)
         return
 
     progress_label.config(text="Processing (Reverse Query)...")
-    root.update_idletasks()
-
-    try:
-        conn = _connect_resolved_db()
-    except Exception as e:
-        progress_label.config(text="")
-        messagebox.showerror("Database Error", f"Không thể kết nối database:{e}")
-        return
-
-    # Lấy danh sách cột động
-    try:
-        cols = get_table_columns(conn, "lot_traceback")
-        if not cols:
-            cols = ["internal2did_id", "Lot", "leadframe_id", "LF_POS", "singulation_id"]
-    except Exception:
-        cols = ["internal2did_id", "Lot", "leadframe_id", "LF_POS", "singulation_id"]
-
-    # Cập nhật Treeview theo full columns
-    set_tree_columns(cols)
 
-    # Dựng truy vấn SELECT trả về toàn bộ cột + LIKE theo batches
-    quoted_cols = ",".join([f"[{c}]" for c in cols])  # bao cột tránh ký tự đặc biệt
-    batch_size = 500  # an toàn < 999 (giới hạn tham số mặc định của SQLite)
-
-    global query_results
-    query_results = []
-    try:
-        cur = conn.cursor()
-        for i in range(0, len(ids), batch_size):
-            batch = ids[i:i + batch_size]
-            # WHERE internal2did_id LIKE ? OR internal2did_id LIKE ? ...
-            or_parts = ["internal2did_id LIKE ? COLLATE NOCASE" for _ in batch]
-            sql = f"SELECT {quoted_cols} FROM lot_traceback WHERE " + " OR ".join(or_parts)
-            params = [f"%{x}%" for x in batch]
-            cur.execute(sql, params)
-            query_results.extend(cur.fetchall())
-    except Exception as e:
-        messagebox.showerror("Query Error", str(e))
-    finally:
-        conn.close()
+    def done(result):
+        global query_results
+        cols, query_results = result
+        # Cập nhật bảng theo full columns
+        set_tree_columns(cols)
+        show_results(query_results)
+        progress_label.config(
+            text=f"Reverse Query xong. ID nhập: {len(ids)} — Kết quả: {len(query_results)} dòng."
+        )
 
-    # Cập nhật bảng kết quả
-    for row in tree.get_children():
-        tree.delete(row)
-    for result in query_results:
-        tree.insert("", tk.END, values=result)
+    _submit_query(run_search, ("internal2did_id", tuple(ids)), "reverse", done)
 
-    progress_label.config(
-        text=f"Reverse Query xong. ID nhập: {len(ids)} — Kết quả: {len(query_results)} dòng."
-    )
 
-
-def query_by_lot_database():  # Tab 3 (LIKE, NOCASE)
+def query_by_lot_database():  # Tab 3 (chính xác → trigram, NOCASE)
     lots_raw = text_input_tab3.get("1.0", tk.END).strip()
     if not lots_raw:
         messagebox.showerror("Input Error", "Vui lòng nhập ít nhất 1 Lot.")
@@ -376,54 +372,18 @@ def query_by_lot_database():  # Tab 3 (LIKE, NOCASE)
         return
 
     progress_label.config(text="Processing (Query theo Lot)...")
-    root.update_idletasks()
 
-    try:
-        conn = _connect_resolved_db()
-    except Exception as e:
-        progress_label.config(text="")
-        messagebox.showerror("Database Error", f"Không thể kết nối database:{e}")
-        return
-
-    # Lấy danh sách cột động
-    try:
-        cols = get_table_columns(conn, "lot_traceback")
-        if not cols:
-            cols = ["internal2did_id", "Lot", "leadframe_id", "LF_POS", "singulation_id"]
-    except Exception:
-        cols = ["internal2did_id", "Lot", "leadframe_id", "LF_POS", "singulation_id"]
-
-    # Hiển thị full cột
-    set_tree_columns(cols)
-
-    quoted_cols = ",".join([f"[{c}]" for c in cols])
-    batch_size = 500
-
-    global query_results
-    query_results = []
-    try:
-        cur = conn.cursor()
-        for i in range(0, len(lots), batch_size):
-            batch = lots[i:i + batch_size]
-            or_parts = ["[Lot] LIKE ? COLLATE NOCASE" for _ in batch]
-            sql = f"SELECT {quoted_cols} FROM lot_traceback WHERE " + " OR ".join(or_parts)
-            params = [f"%{x}%" for x in batch]
-            cur.execute(sql, params)
-            query_results.extend(cur.fetchall())
-    except Exception as e:
-        messagebox.showerror("Query Error", str(e))
-    finally:
-        conn.close()
-
-    # Đổ dữ liệu ra bảng
-    for row in tree.get_children():
-        tree.delete(row)
-    for result in query_results:
-        tree.insert("", tk.END, values=result)
+    def done(result):
+        global query_results
+        cols, query_results = result
+        # Hiển thị full cột
+        set_tree_columns(cols)
+        show_results(query_results)
+        progress_label.config(
+            text=f"Query theo Lot xong. Số Lot nhập: {len(lots)} — Kết quả: {len(query_results)} dòng."
+        )
 
-    progress_label.config(
-        text=f"Query theo Lot xong. Số Lot nhập: {len(lots)} — Kết quả: {len(query_results)} dòng."
-    )
+    _submit_query(run_search, ("Lot", tuple(lots)), "lot", done)
 
 
 def copy_to_clipboard():
@@ -432,7 +392,7 @@ def copy_to_clipboard():
         return
     header = ",".join(current_columns)
     lines = [header]
-    for row in query_results:
+    for row in shown_results():
         lines.append(",".join("" if v is None else str(v) for v in row))
     text = "\n".join(lines)
     root.clipboard_clear()
@@ -445,7 +405,7 @@ def export_to_csv():
     if not query_results:
         messagebox.showinfo("No Data", "Không có dữ liệu để xuất.")
         return
-    df = pd.DataFrame(query_results, columns=current_columns)
+    df = pd.DataFrame(shown_results(), columns=current_columns)
     file_path = filedialog.asksaveasfilename(defaultextension=".csv",
                                              filetypes=[("CSV files", "*.csv")])
     if file_path:
@@ -457,6 +417,7 @@ def export_to_csv():
 
 
 def clear_all():
+    cancel_query()
     # Xóa input ở cả ba tab
     try:
         text_input_tab1.delete("1.0", tk.END)
@@ -471,10 +432,6 @@ def clear_all():
     except Exception:
         pass
 
-    # Xóa bảng
-    for row in tree.get_children():
-        tree.delete(row)
-
     global query_results
     query_results = []
     progress_label.config(text="")
@@ -525,6 +482,7 @@ def browse_db_folder():
 # =========================
 root = tk.Tk()
 root.title("2DID Lot Traceback Query")
+runner = TaskRunner(root)
 try:
     root.state('zoomed')  # Fullscreen
 except Exception:
@@ -628,21 +586,9 @@ progress_label.grid(row=2, column=0, columnspan=4, sticky="w", padx=5)
 # Hàng 5: Result table with scrollbars
 tree_frame = tk.Frame(root)
 tree_frame.grid(row=3, column=0, columnspan=4, sticky="nsew", padx=5, pady=5)
-tree_scroll_y = tk.Scrollbar(tree_frame, orient=tk.VERTICAL)
-tree_scroll_x = tk.Scrollbar(tree_frame, orient=tk.HORIZONTAL)
-columns = tuple(current_columns)
-tree = ttk.Treeview(
-    tree_frame, columns=columns, show="headings",
-    yscrollcommand=tree_scroll_y.set, xscrollcommand=tree_scroll_x.set
-)
-for col in columns:
-    tree.heading(col, text=col)
-    tree.column(col, width=150)
-tree_scroll_y.config(command=tree.yview)
-tree_scroll_x.config(command=tree.xview)
-tree_scroll_y.pack(side=tk.RIGHT, fill=tk.Y)
-tree_scroll_x.pack(side=tk.BOTTOM, fill=tk.X)
+tree = VirtualTable(tree_frame, column_width=150)
 tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+set_tree_columns(current_columns)
 
 # Hàng 6: Hàng nút chung (Copy/Export/Clear)
 button_frame_common = tk.Frame(root)
@@ -650,6 +596,7 @@ button_frame_common.grid(row=4, column=0, columnspan=4, pady=(0, 10), sticky="w"
 tk.Button(button_frame_common, text="Copy to Clipboard", command=copy_to_clipboard).pack(side=tk.LEFT, padx=5)
 tk.Button(button_frame_common, text="Export to CSV", command=export_to_csv).pack(side=tk.LEFT, padx=5)
 tk.Button(button_frame_common, text="Clear All", command=clear_all).pack(side=tk.LEFT, padx=5)
+tk.Button(button_frame_common, text="Cancel Query", command=cancel_query).pack(side=tk.LEFT, padx=5)
 
 # Layout expansion
 root.grid_rowconfigure(1, weight=1)  # notebook
@@ -16,6 +16,8 @@ from pathlib import Path
 
 import pandas as pd
 
+from trace_index import ensure_trace_index, rebuild_trace_index
+
 # =============== THAM SỐ ===============
 file_path   = r"C:\Users\zbrzyy\Desktop\Logcheck\ceramic crack\Lot_Traceback\Die Trace_ww31-34.csv"
 sqlite_path = r"C:\Users\zbrzyy\Desktop\Logcheck\ceramic crack\Lot_Traceback\lotfrom21-31.sqlite"
@@ -29,6 +31,7 @@ COMMIT_INTERVAL = 5            # commit mỗi N chunk để nhanh hơn
 DEDUP_FIRST     = True         # dọn dữ liệu trùng sẵn có trước khi import
 VACUUM_AFTER_DEDUP = True      # VACUUM sau dọn trùng để thu gọn DB
 LF_POS_FORMULA_OFFSET = 10     # LF_POS = 10 - leadframe_x (chỉnh nếu cần)
+TRIGRAM_INDEX   = True         # index trigram (FTS5) cho tìm chuỗi con internal2did_id/Lot/singulation_id
 
 # =============== LOGGING ===============
 def setup_logging():
@@ -80,6 +83,7 @@ def ensure_table(con: sqlite3.Connection, table: str):
     cur.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_lot ON {table}(Lot);")
     cur.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_i2d ON {table}(internal2did_id);")
     cur.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_lf ON {table}(leadframe_id);")
+    cur.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_lf_pos ON {table}(leadframe_id, LF_POS);")
     con.commit()
 
 def create_unique_index(con: sqlite3.Connection, table: str, index_name: str):
@@ -103,7 +107,6 @@ def dedup_existing_rows(con: sqlite3.Connection, table: str) -> int:
     theo khóa chuẩn hoá (IFNULL ...). Trả về số dòng đã xoá.
     """
     cur = con.cursor()
-    prev_changes = con.total_changes
     log.info(f"Dọn dữ liệu trùng hiện có trong '{table}' (có thể mất thời gian nếu bảng lớn)...")
     cur.execute("BEGIN;")
     try:
@@ -122,11 +125,11 @@ def dedup_existing_rows(con: sqlite3.Connection, table: str) -> int:
                   IFNULL(LF_POS,-1)
             );
         """)
+        deleted = cur.rowcount  # total_changes còn đếm cả ghi của trigger index trigram
         con.commit()
     except Exception:
         con.rollback()
         raise
-    deleted = con.total_changes - prev_changes
     log.info(f"Dọn trùng xong: đã xoá {deleted:,} dòng.")
     return deleted
 
@@ -169,7 +172,6 @@ def import_csv_append(
 
     total_read = 0
     total_inserted = 0
-    prev_changes = con.total_changes
 
     cur = con.cursor()
     cur.execute("BEGIN;")
@@ -224,8 +226,8 @@ def import_csv_append(
                 rows
             )
 
-            inserted = con.total_changes - prev_changes
-            prev_changes = con.total_changes
+            # rowcount không tính dòng bị IGNORE và ghi của trigger (index trigram)
+            inserted = max(cur.rowcount, 0)
             total_inserted += inserted
 
             dt = time.time() - t0
@@ -275,6 +277,8 @@ def main():
                 log.info("VACUUM để thu gọn file DB...")
                 con.execute("VACUUM;")
                 con.commit()
+                # VACUUM có thể đánh số lại rowid → index trigram phải nạp lại
+                rebuild_trace_index(con, TABLE_NAME)
         except Exception:
             log.exception("Lỗi khi dọn dữ liệu trùng hiện có")
             con.close()
@@ -291,9 +295,16 @@ def main():
         con.close()
         sys.exit(3)
 
+    # 4) Index trigram + trigger đồng bộ (lần đầu nạp dữ liệu hiện có; sau đó tự cập nhật khi import)
+    if TRIGRAM_INDEX:
+        try:
+            ensure_trace_index(con, TABLE_NAME)
+        except Exception:
+            log.exception("Tạo index trigram thất bại (tìm chuỗi con sẽ dùng LIKE)")
+
     con.close()
 
-    # 4) Append CSV và bỏ qua trùng
+    # 5) Append CSV và bỏ qua trùng
     try:
         import_csv_append(
             file_path=file_path,
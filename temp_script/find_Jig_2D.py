@@ -2,60 +2,76 @@ import tkinter as tk
 from tkinter import scrolledtext, messagebox, filedialog
 import sqlite3
 import pandas as pd
-import threading
+import sys
+from pathlib import Path
 
-def query_database():
-    try:
-        status_var.set("Querying database...")
-        output_text.delete(1.0, tk.END)
+# Shared task runner from GUI_APP (background queries with Cancel)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "GUI_APP"))
+from task_runner import TaskRunner
 
-        results = input_text.get(1.0, tk.END).strip().split('\n')
-        results = [r.strip() for r in results if r.strip()]
-
-        if not results:
-            messagebox.showwarning("Input Error", "Please enter at least one 2D_RESULT.")
-            return
+# Runs on a worker thread: no widget access here
+def read_results(task, results):
+    conn = sqlite3.connect(r"C:\Users\zbrzyy\Documents\Onsemi VN\XrayDatabase\LF_Info_database.db")
+    task.on_cancel(conn.interrupt)  # Cancel aborts the running LIKE scan
 
-        conn = sqlite3.connect(r"C:\Users\zbrzyy\Documents\Onsemi VN\XrayDatabase\LF_Info_database.db")
-
-        all_data = []
-        for r in results:
+    all_data = []
+    try:
+        for i, r in enumerate(results, 1):
+            task.progress(i, len(results), f"Querying {i}/{len(results)}: {r}")
             query = 'SELECT * FROM LF_Info WHERE "2D_RESULT" LIKE ?'
             like_pattern = f"%{r}%"
             df = pd.read_sql_query(query, conn, params=(like_pattern,))
             all_data.append(df)
-
+    finally:
         conn.close()
 
-        if not all_data:
-            messagebox.showinfo("No Results", "No matching data found.")
-            return
+    if not all_data:
+        return None
 
-        df_combined = pd.concat(all_data, ignore_index=True)
+    df_combined = pd.concat(all_data, ignore_index=True)
 
-        # Debug: Show actual column names
-        print("Columns in DataFrame:", df_combined.columns.tolist())
+    # Debug: Show actual column names
+    print("Columns in DataFrame:", df_combined.columns.tolist())
 
-        # Convert Date to datetime for sorting
-        df_combined['Date'] = pd.to_datetime(df_combined['Date'], format="%d/%m/%Y %I:%M:%S %p", errors='coerce')
-        df_combined = df_combined.dropna(subset=['Date'])
+    # Convert Date to datetime for sorting
+    df_combined['Date'] = pd.to_datetime(df_combined['Date'], format="%d/%m/%Y %I:%M:%S %p", errors='coerce')
+    df_combined = df_combined.dropna(subset=['Date'])
 
-        # Sort and get latest entry per 2D_RESULT
-        df_sorted = df_combined.sort_values('Date', ascending=False)
-        latest_df = df_sorted.groupby('2D_RESULT', as_index=False).first()
+    # Sort and get latest entry per 2D_RESULT
+    df_sorted = df_combined.sort_values('Date', ascending=False)
+    latest_df = df_sorted.groupby('2D_RESULT', as_index=False).first()
 
-        result_df = latest_df[['Date', 'Lotname', 'JIG_ID', 'LF_ID', '2D_RESULT']]
+    return latest_df[['Date', 'Lotname', 'JIG_ID', 'LF_ID', '2D_RESULT']]
 
-        global final_df
-        final_df = result_df
-        output_text.insert(tk.END, result_df.to_string(index=False))
-        status_var.set("Query completed.")
-    except Exception as e:
-        status_var.set("Error occurred.")
-        messagebox.showerror("Error", str(e))
+def show_result(result_df):
+    if result_df is None:
+        status_var.set("")
+        messagebox.showinfo("No Results", "No matching data found.")
+        return
+    global final_df
+    final_df = result_df
+    output_text.insert(tk.END, result_df.to_string(index=False))
+    status_var.set("Query completed.")
+
+def show_error(error):
+    status_var.set("Error occurred.")
+    messagebox.showerror("Error", str(error))
+
+def query_database():
+    results = input_text.get(1.0, tk.END).strip().split('\n')
+    results = [r.strip() for r in results if r.strip()]
+
+    if not results:
+        messagebox.showwarning("Input Error", "Please enter at least one 2D_RESULT.")
+        return
 
-def threaded_query():
-    threading.Thread(target=query_database).start()
+    status_var.set("Querying database...")
+    output_text.delete(1.0, tk.END)
+    # Same input again while it runs joins it; new input cancels the old query
+    runner.submit(read_results, results, key=tuple(results), group="query",
+                  on_done=show_result, on_error=show_error,
+                  on_progress=lambda done, total, text: status_var.set(text),
+                  on_cancelled=lambda: status_var.set("Cancelled."))
 
 def export_to_csv():
     try:
@@ -83,6 +99,7 @@ def copy_to_clipboard():
 app = tk.Tk()
 app.title("Leadframe History by 2D_RESULT")
 app.geometry("800x600")
+runner = TaskRunner(app)
 
 tk.Label(app, text="Enter 2D_RESULT values (one per line):").pack(pady=5)
 input_text = scrolledtext.ScrolledText(app, width=60, height=10)
@@ -93,9 +110,10 @@ tk.Label(app, textvariable=status_var, fg="blue").pack(pady=5)
 
 button_frame = tk.Frame(app)
 button_frame.pack(pady=10)
-tk.Button(button_frame, text="Get Data", command=threaded_query).grid(row=0, column=0, padx=10)
-tk.Button(button_frame, text="Export to CSV", command=export_to_csv).grid(row=0, column=1, padx=10)
-tk.Button(button_frame, text="Copy to Clipboard", command=copy_to_clipboard).grid(row=0, column=2, padx=10)
+tk.Button(button_frame, text="Get Data", command=query_database).grid(row=0, column=0, padx=10)
+tk.Button(button_frame, text="Cancel", command=lambda: runner.cancel(group="query")).grid(row=0, column=1, padx=10)
+tk.Button(button_frame, text="Export to CSV", command=export_to_csv).grid(row=0, column=2, padx=10)
+tk.Button(button_frame, text="Copy to Clipboard", command=copy_to_clipboard).grid(row=0, column=3, padx=10)
 
 output_text = scrolledtext.ScrolledText(app, width=90, height=20)
 output_text.pack(padx=10, pady=5)
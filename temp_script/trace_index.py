@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""
+Index trigram (FTS5) cho tìm kiếm chuỗi con trên lot_traceback.
+
+Bảng phụ lot_traceback_fts (external content, tokenize='trigram') chứa
+internal2did_id, Lot, singulation_id và được giữ đồng bộ bằng trigger
+AFTER INSERT/UPDATE/DELETE, nên import (INSERT OR IGNORE) và dọn trùng
+tự cập nhật index. VACUUM có thể đánh số lại rowid → gọi rebuild_trace_index.
+
+Tìm kiếm (search_rows):
+  1. Khớp chính xác trước: IN (...) trên index thường của cột (nhanh nhất).
+  2. Giá trị chưa khớp → chuỗi con qua MATCH trigram (không phân biệt hoa/thường).
+  3. Giá trị < 3 ký tự hoặc SQLite không có trigram (< 3.34) → LIKE như cũ.
+
+Tra cặp (leadframe_id, LF_POS) (lookup_pairs): nạp các cặp vào bảng tạm rồi
+JOIN một lần qua index ghép (leadframe_id, LF_POS), kèm danh sách cặp không thấy.
+
+Dùng không cần GUI:
+    python trace_index.py <db> [--rebuild]   # tạo index cho DB có sẵn / nạp lại
+    rows = search_rows(con, "internal2did_id", ["A1B2C3"], cols)
+    rows, unmatched = lookup_pairs(con, [("LF000123", 4)], cols)
+"""
+
+import sys
+import time
+import sqlite3
+import logging
+
+TABLE_NAME = "lot_traceback"
+FTS_COLUMNS = ["internal2did_id", "Lot", "singulation_id"]
+MIN_TRIGRAM_LEN = 3   # trigram cần ít nhất 3 ký tự
+BATCH_SIZE = 500      # an toàn < 999 (giới hạn tham số mặc định của SQLite)
+
+log = logging.getLogger("die_trace")
+
+
+def fts_name(table: str = TABLE_NAME) -> str:
+    return f"{table}_fts"
+
+
+def trigram_available(con: sqlite3.Connection) -> bool:
+    """SQLite có FTS5 + tokenizer trigram (>= 3.34) hay không."""
+    try:
+        con.execute("CREATE VIRTUAL TABLE temp.trigram_probe USING fts5(x, tokenize='trigram')")
+        con.execute("DROP TABLE temp.trigram_probe")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def has_trace_index(con: sqlite3.Connection, table: str = TABLE_NAME) -> bool:
+    row = con.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (fts_name(table),)).fetchone()
+    return row is not None
+
+
+def _indexed_columns(con: sqlite3.Connection, table: str):
+    # DB cũ có thể chưa có cột singulation_id
+    existing = {r[1] for r in con.execute(f"PRAGMA table_info({table})")}
+    return [c for c in FTS_COLUMNS if c in existing]
+
+
+def ensure_trace_index(con: sqlite3.Connection, table: str = TABLE_NAME) -> bool:
+    """
+    Tạo bảng FTS + trigger đồng bộ nếu chưa có; lần đầu nạp toàn bộ dữ liệu
+    hiện có ('rebuild'). Trả về False nếu SQLite không hỗ trợ trigram.
+    """
+    if has_trace_index(con, table):
+        return True
+    if not trigram_available(con):
+        log.warning("SQLite không hỗ trợ FTS5 trigram (cần >= 3.34) → tìm chuỗi con dùng LIKE.")
+        return False
+
+    fts = fts_name(table)
+    cols = _indexed_columns(con, table)
+    col_list = ", ".join(cols)
+    new_vals = ", ".join(f"new.{c}" for c in cols)
+    old_vals = ", ".join(f"old.{c}" for c in cols)
+
+    t0 = time.time()
+    con.execute(f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+        {col_list}, content='{table}', content_rowid='rowid', tokenize='trigram', columnsize=0
+    );
+    """)
+    con.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+        INSERT INTO {fts}(rowid, {col_list}) VALUES (new.rowid, {new_vals});
+    END;
+    """)
+    con.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+        INSERT INTO {fts}({fts}, rowid, {col_list}) VALUES ('delete', old.rowid, {old_vals});
+    END;
+    """)
+    con.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN
+        INSERT INTO {fts}({fts}, rowid, {col_list}) VALUES ('delete', old.rowid, {old_vals});
+        INSERT INTO {fts}(rowid, {col_list}) VALUES (new.rowid, {new_vals});
+    END;
+    """)
+    con.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild');")
+    con.commit()
+    log.info(f"Đã tạo index trigram '{fts}' ({', '.join(cols)}) trong {time.time() - t0:,.1f}s")
+    return True
+
+
+def rebuild_trace_index(con: sqlite3.Connection, table: str = TABLE_NAME):
+    """Nạp lại toàn bộ index (sau VACUUM hoặc khi nghi ngờ lệch dữ liệu)."""
+    if not has_trace_index(con, table):
+        return
+    fts = fts_name(table)
+    t0 = time.time()
+    con.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild');")
+    con.commit()
+    log.info(f"Rebuild index trigram '{fts}' xong trong {time.time() - t0:,.1f}s")
+
+
+def _phrase(term: str) -> str:
+    # Chuỗi trong ngoặc kép = phrase trigram liên tiếp = khớp chuỗi con
+    return '"' + term.replace('"', '""') + '"'
+
+
+def search_rowids(con: sqlite3.Connection, column: str, terms, table: str = TABLE_NAME):
+    """
+    rowid của các dòng có `column` khớp một trong các giá trị `terms`:
+    khớp chính xác nếu có, nếu không thì chứa giá trị đó (không phân biệt hoa/thường).
+    """
+    terms = list(dict.fromkeys(t for t in terms if t))
+    rowids = set()
+
+    # 1) Khớp chính xác qua index thường (giá trị gốc + chữ hoa)
+    found = set()
+    for i in range(0, len(terms), BATCH_SIZE // 2):
+        batch = terms[i:i + BATCH_SIZE // 2]
+        keys = list(dict.fromkeys(batch + [t.upper() for t in batch]))
+        sql = f"SELECT rowid, [{column}] FROM {table} WHERE [{column}] IN ({','.join('?' * len(keys))})"
+        for rowid, value in con.execute(sql, keys):
+            rowids.add(rowid)
+            found.add(value.upper())
+    pending = [t for t in terms if t.upper() not in found]
+
+    # 2) Chuỗi con qua trigram
+    use_fts = column in FTS_COLUMNS and has_trace_index(con, table) and column in _indexed_columns(con, table)
+    if use_fts:
+        fts = fts_name(table)
+        long_terms = [t for t in pending if len(t) >= MIN_TRIGRAM_LEN]
+        for i in range(0, len(long_terms), BATCH_SIZE):
+            batch = long_terms[i:i + BATCH_SIZE]
+            query = " OR ".join(f"{column} : {_phrase(t)}" for t in batch)
+            rowids.update(r[0] for r in con.execute(f"SELECT rowid FROM {fts} WHERE {fts} MATCH ?", (query,)))
+        pending = [t for t in pending if len(t) < MIN_TRIGRAM_LEN]
+
+    # 3) Còn lại (ngắn hoặc không có index) → LIKE như cũ
+    for i in range(0, len(pending), BATCH_SIZE):
+        batch = pending[i:i + BATCH_SIZE]
+        or_parts = " OR ".join(f"[{column}] LIKE ? COLLATE NOCASE" for _ in batch)
+        sql = f"SELECT rowid FROM {table} WHERE {or_parts}"
+        rowids.update(r[0] for r in con.execute(sql, [f"%{t}%" for t in batch]))
+    return rowids
+
+
+def search_rows(con: sqlite3.Connection, column: str, terms, cols, table: str = TABLE_NAME):
+    """Các dòng (theo thứ tự rowid) với các cột `cols` khớp `terms` (xem search_rowids)."""
+    rowids = search_rowids(con, column, terms, table)
+    con.execute("CREATE TEMP TABLE IF NOT EXISTS trace_rowids (id INTEGER PRIMARY KEY)")
+    con.execute("DELETE FROM temp.trace_rowids")
+    con.executemany("INSERT INTO temp.trace_rowids VALUES (?)", [(r,) for r in rowids])
+    quoted_cols = ",".join(f"t.[{c}]" for c in cols)
+    return con.execute(
+        f"SELECT {quoted_cols} FROM temp.trace_rowids r CROSS JOIN {table} t ON t.rowid = r.id ORDER BY r.id"
+    ).fetchall()
+
+
+def ensure_pair_index(con: sqlite3.Connection, table: str = TABLE_NAME):
+    """Index ghép (leadframe_id, LF_POS) cho tra cặp (tạo 1 lần; bỏ qua nếu DB chỉ đọc)."""
+    try:
+        con.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_lf_pos ON {table}(leadframe_id, LF_POS);")
+        con.commit()
+    except sqlite3.OperationalError as e:
+        log.warning(f"Không tạo được index (leadframe_id, LF_POS) ({e}); tra cặp sẽ dùng index leadframe_id")
+
+
+def lookup_pairs(con: sqlite3.Connection, pairs, cols, table: str = TABLE_NAME):
+    """
+    Tra nhiều cặp (leadframe_id, LF_POS) trong một truy vấn JOIN.
+    Trả về (rows, unmatched): rows theo thứ tự cặp nhập với các cột `cols`
+    (cột không có trong bảng → NULL), unmatched là các cặp không có dòng nào.
+    """
+    ensure_pair_index(con, table)
+    existing = {r[1] for r in con.execute(f"PRAGMA table_info({table})")}
+    select_cols = ", ".join(f"t.[{c}]" if c in existing else f"NULL AS [{c}]" for c in cols)
+
+    con.execute("CREATE TEMP TABLE IF NOT EXISTS lookup_pairs "
+                "(seq INTEGER PRIMARY KEY, leadframe_id TEXT, LF_POS INTEGER)")
+    con.execute("DELETE FROM temp.lookup_pairs")
+    con.executemany("INSERT INTO temp.lookup_pairs (leadframe_id, LF_POS) VALUES (?, ?)", pairs)
+
+    # LEFT JOIN: cặp không khớp vẫn ra 1 dòng với t.rowid NULL → danh sách unmatched
+    rows, unmatched = [], []
+    cur = con.execute(f"""
+        SELECT p.leadframe_id, p.LF_POS, t.rowid IS NULL, {select_cols}
+        FROM temp.lookup_pairs p
+        LEFT JOIN {table} t ON t.leadframe_id = p.leadframe_id AND t.LF_POS = p.LF_POS
+        ORDER BY p.seq, t.rowid
+    """)
+    for lf_id, lf_pos, missing, *values in cur:
+        if missing:
+            unmatched.append((lf_id, lf_pos))
+        else:
+            rows.append(tuple(values))
+    return rows, unmatched
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s | %(message)s", datefmt="%H:%M:%S")
+    con = sqlite3.connect(sys.argv[1])
+    try:
+        if has_trace_index(con) and "--rebuild" in sys.argv:
+            rebuild_trace_index(con)
+        else:
+            ensure_trace_index(con)
+    finally:
+        con.close()